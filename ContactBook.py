@@ -1,7 +1,39 @@
+import abc
+import argparse
+import array
+import atexit
+import bisect
+import collections.abc
+import contextlib
+import csv
 import datetime
+import functools
+import gc
+import gzip
+import heapq
+import itertools
+import locale
+import mmap
 import os
 import pathlib
 import json
+import lzma
+import queue
+import re
+import reprlib
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import types
+import weakref
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, files are not locked there
+    fcntl = None
 
 
 def get_tuning_value(tuning_name: str) -> (str, int):
@@ -10,9 +42,41 @@ def get_tuning_value(tuning_name: str) -> (str, int):
                              welcome_text='Welcome to you contact book!',
                              num_of_lines=10,
                              mark_print=100,
+                             read_buffer_size=1 << 20,
+                             version_dbase=2,
+                             encoding_dbase='utf-8',
+                             storage='text',
+                             contacts_store='dict',
+                             name_dbase='contact-book',
+                             backup_compression=None,
+                             restore_batch_size=10000,
+                             restore_processes=0,
+                             import_chunk_size=20000,
+                             import_processes=0,
+                             dedupe_threshold=0.8,
+                             dedupe_auto_merge=0.95,
+                             dedupe_phone_digits=7,
+                             dedupe_max_block=100,
+                             name_index_gram_size=3,
+                             index_memory_budget=0,
+                             sorted_block_size=1000,
+                             phone_country_code='7',
+                             phone_trunk_prefix='8',
+                             phone_national_length=10,
+                             journal_compact_size=64 << 20,
+                             journal_compact_ratio=0.5,
+                             dbase_shards=0,
+                             dbase_processes=0,
+                             snapshot_enabled=True,
                              path_to_dbase=os.path.expanduser('~'),
                              path_to_dir='contact_book',
-                             name_log='contact-book.log')
+                             name_log='contact-book.log',
+                             log_flush_interval=0.5,
+                             log_batch_size=1000,
+                             metrics_enabled=True,
+                             server_host='127.0.0.1',
+                             server_port=8765,
+                             server_flush_interval=0.01)
 
     if tuning_name == 'path_to_dbase':
         path_to_dir = f'{tuning_dict[tuning_name]}{os.sep}{tuning_dict["path_to_dir"]}'
@@ -24,6 +88,11 @@ def get_tuning_value(tuning_name: str) -> (str, int):
     return tuning_dict[tuning_name]
 
 
+def get_path_to_file(name_file: str) -> pathlib.Path:
+    """path to file in directory of contact book, directory is created on first call"""
+    return pathlib.Path(get_tuning_value('path_to_dbase') + os.sep + name_file)
+
+
 class ExceptionContactBook(Exception):
     pass
 
@@ -71,7 +140,11 @@ class DirBaseNotCreated(ExceptionContactBook):
     pass
 
 
-class FileLogNotFound(ExceptionContactBook):
+class FileBaseCorrupted(ExceptionContactBook):
+    pass
+
+
+class FileBaseVersionNotSupported(ExceptionContactBook):
     pass
 
 
@@ -86,6 +159,7 @@ class ContactExistInFileDBase(ExceptionContactBook):
 class Contact(object):
     __count_objects = 0
     __mask_date_time_creation = '%d.%m.%Y %H:%M:%S'
+    __phone_number_pattern = re.compile(r'\+?[0-9]*')
 
     @classmethod
     def mask_date_time_creation(cls) -> str:
@@ -127,10 +201,7 @@ class Contact(object):
             if not phone_number:
                 raise NoVerifiedPhoneNumber
 
-            phone_number_without_plus = phone_number[1:] if phone_number.startswith('+') else phone_number
-
-            import string
-            if tuple(filter(lambda i: not (i in string.digits), phone_number_without_plus)):
+            if Contact.__phone_number_pattern.fullmatch(phone_number) is None:
                 raise NoVerifiedPhoneNumberOnOnlyDigits
             return True
 
@@ -143,13 +214,14 @@ class Contact(object):
 
     __slots__ = ('__phone_number',
                  '__contact_name',
+                 '__search_key',
                  '__date_time_creation_contact',
                  '__count',)
 
     def __init__(self,
                  phone_number: str,
                  contact_name: str,
-                 date_time_creation_contact=datetime.datetime.now(),
+                 date_time_creation_contact: datetime.datetime = None,
                  validate=True):
 
         if validate:
@@ -158,7 +230,9 @@ class Contact(object):
 
         self.__phone_number = phone_number
         self.__contact_name = contact_name
-        self.__date_time_creation_contact = date_time_creation_contact
+        self.__search_key = get_search_key(contact_name)
+        self.__date_time_creation_contact = (datetime.datetime.now() if date_time_creation_contact is None
+                                             else date_time_creation_contact)
         self.__count = 0
 
         Contact.__count_objects += 1
@@ -176,6 +250,16 @@ class Contact(object):
     def __eq__(self, other):
         return self.phone_number == other.phone_number
 
+    def __getstate__(self):
+        return self.__phone_number, self.__contact_name, self.__search_key, self.__date_time_creation_contact
+
+    def __setstate__(self, state):
+        """contact from snapshot is restored without validation and folding of name"""
+        self.__phone_number, self.__contact_name, self.__search_key, self.__date_time_creation_contact = state
+        self.__count = 0
+
+        Contact.__count_objects += 1
+
     @property
     def contact_name(self):
         return self.__contact_name
@@ -184,6 +268,11 @@ class Contact(object):
     def phone_number(self):
         return self.__phone_number
 
+    @property
+    def search_key(self) -> str:
+        """contact name folded by case and look-alike latin/cyrillic symbols"""
+        return self.__search_key
+
     @property
     def date_time_creation_contact(self) -> datetime.datetime:
         return self.__date_time_creation_contact
@@ -194,7 +283,7 @@ class Contact(object):
 
     @property
     def format_to_dbase(self) -> str:
-        return (f'{self.phone_number};{self.contact_name};'
+        return (f'{self.phone_number};{escape_field(self.contact_name)};'
                 f'{self.str_date_time_creation_contact}')
 
     @property
@@ -261,32 +350,225 @@ class ContactMs(Contact):
                          )
 
 
+EQ_SYM_TABLE = str.maketrans({'ё': 'е',
+                              't': 'т',
+                              'e': 'е',
+                              'k': 'к',
+                              'a': 'а',
+                              'm': 'м',
+                              'b': 'в',
+                              'c': 'с',
+                              'h': 'н',
+                              'p': 'р',
+                              'o': 'о',
+                              'x': 'х',
+                              'y': 'у'})
+
+
+def get_search_key(value: str) -> str:
+    """fold case and look-alike latin/cyrillic symbols of value for search"""
+    return value.lower().translate(EQ_SYM_TABLE)
+
+
 def get_eq(val1: str, val2: str):
     """case-insensitive search"""
-    result = True if val1.lower() == val2.lower() else False
+    return val1 == val2 or get_search_key(val1) == get_search_key(val2)
+
+
+PHONE_SEPARATORS_TABLE = str.maketrans('', '', ' -().\t')
+
+
+def normalize_phone_number(phone_number: str,
+                           country_code: str = get_tuning_value('phone_country_code'),
+                           trunk_prefix: str = get_tuning_value('phone_trunk_prefix'),
+                           national_length: int = get_tuning_value('phone_national_length')) -> str:
+    """E.164-like form +<country code><national number> of phone number,
+    short and unknown numbers are only cleared of separators"""
+    if phone_number[:1] == '+' and phone_number[1:].isdigit():
+        return phone_number
+
+    phone_number = phone_number.strip().translate(PHONE_SEPARATORS_TABLE)
+    if phone_number[:2] == '00':  # international call prefix
+        return f'+{phone_number[2:]}'
+    if phone_number[:1] == '+' or not phone_number.isdigit():
+        return phone_number
+
+    if len(phone_number) == national_length:
+        return f'+{country_code}{phone_number}'
+    if len(phone_number) == len(trunk_prefix) + national_length and phone_number.startswith(trunk_prefix):
+        return f'+{country_code}{phone_number[len(trunk_prefix):]}'
+    if len(phone_number) == len(country_code) + national_length and phone_number.startswith(country_code):
+        return f'+{phone_number}'
+    return phone_number
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def datetime2epoch(date_time: datetime.datetime) -> int:
+    """seconds from epoch for naive date and time"""
+    return (date_time - EPOCH) // datetime.timedelta(seconds=1)
+
+
+def epoch2datetime(seconds: int) -> datetime.datetime:
+    return EPOCH + datetime.timedelta(seconds=seconds)
+
+
+def parse_date_time_creation(date_time_creation: str) -> datetime.datetime:
+    """parse date and time of creation contact, fast path for fixed-width mask '%d.%m.%Y %H:%M:%S'"""
+    if (len(date_time_creation) == 19
+            and date_time_creation[2] == '.' and date_time_creation[5] == '.' and date_time_creation[10] == ' '
+            and date_time_creation[13] == ':' and date_time_creation[16] == ':'):
+        try:
+            return datetime.datetime(int(date_time_creation[6:10]),
+                                     int(date_time_creation[3:5]),
+                                     int(date_time_creation[0:2]),
+                                     int(date_time_creation[11:13]),
+                                     int(date_time_creation[14:16]),
+                                     int(date_time_creation[17:19]))
+        except ValueError:
+            pass
+
+    return datetime.datetime.strptime(date_time_creation, Contact.mask_date_time_creation())
+
+
+ESCAPE_TABLE = str.maketrans({'\\': '\\\\',
+                              ';': '\\;',
+                              '\n': '\\n',
+                              '\r': '\\r'})
+UNESCAPE_SYM = {'n': '\n',
+                'r': '\r'}
+
+
+def escape_field(value: str) -> str:
+    """escape separator, backslash and line breaks in field of record dbase"""
+    return value.translate(ESCAPE_TABLE)
+
+
+def unescape_field(value: str) -> str:
+    return re.sub(r'\\(.)', lambda m: UNESCAPE_SYM.get(m.group(1), m.group(1)), value, flags=re.DOTALL)
+
+
+def split_record_dbase(rec: str, sep: str, escaped=True) -> tuple:
+    """split record of dbase to phone number, contact name and date time creation contact"""
+    phone_number, _, rec = rec.partition(sep)
+    contact_name, _, date_time_creation = rec.rpartition(sep)
+    if escaped and '\\' in contact_name:
+        contact_name = unescape_field(contact_name)
+
+    return phone_number, contact_name, date_time_creation
+
+
+def checksum_record_dbase(rec: str, encoding: str) -> bytes:
+    """encoded record of dbase with crc32 checksum"""
+    rec = rec.encode(encoding)
+    return b'%s;%08x\n' % (rec, zlib.crc32(rec))
+
+
+def verify_record_dbase(rec: bytes) -> bytes:
+    """check crc32 checksum of encoded record and return record without checksum"""
+    if rec[-9:-8] != b';' or zlib.crc32(rec[:-9]) != int(rec[-8:], 16):
+        raise FileBaseCorrupted
+
+    return rec[:-9]
+
+
+def header_dbase(version: int, encoding: str) -> bytes:
+    return f'#contact-book;{version};{encoding}\n'.encode('ascii')
+
 
-    if not result:
-        eq_sym = {'ё': 'е',
-                  't': 'т',
-                  'e': 'е',
-                  'k': 'к',
-                  'a': 'а',
-                  'm': 'м',
-                  'b': 'в',
-                  'c': 'с',
-                  'h': 'н',
-                  'p': 'р',
-                  'o': 'о'}
+def parse_header_dbase(rec: bytes) -> tuple:
+    """version and encoding of file dbase by its first row, legacy file has not header"""
+    if not rec.startswith(b'#contact-book;'):
+        return 1, locale.getpreferredencoding(False)
 
-        if ''.join([eq_sym.get(i, i) for i in val1.lower()]) == ''.join([eq_sym.get(i, i) for i in val2.lower()]):
-            result = True
+    _, version, encoding = rec.decode('ascii').split(';')
+    if int(version) > get_tuning_value('version_dbase'):
+        raise FileBaseVersionNotSupported(f'version {version} of file dbase is not supported')
 
-    return result
+    return int(version), encoding
 
 
-def sorted_dict_contacts(dict_contacts: dict) -> list:
-    list_contacts = sorted(dict_contacts.items(), key=lambda i: i[1].contact_name)
-    return list_contacts
+def replace_file(path_to_file_tmp: pathlib.Path, path_to_file: pathlib.Path) -> None:
+    """atomic replace file by written and synced temporary file"""
+    os.replace(path_to_file_tmp, path_to_file)
+
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(pathlib.Path(path_to_file).parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def create_process_pool(processes: int):
+    """process pool when processes > 1, it is imported on demand because import of
+    concurrent.futures takes more time than start of application"""
+    if processes <= 1:
+        return None
+
+    import concurrent.futures
+    return concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+
+
+def map_in_pool(executor, func, iterable, window: int):
+    """results of func for items of iterable in their order, by process pool when executor is not None;
+    unlike executor.map, only window items are taken from iterable ahead of results, so large inputs
+    are streamed through the pool"""
+    if executor is None:
+        yield from map(func, iterable)
+        return
+
+    futures = collections.deque()
+    for item in iterable:
+        futures.append(executor.submit(func, item))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """collections are paused while millions of long-lived objects are unpickled, they take more time than
+    unpickling itself; the objects are frozen out of next collections until next load, objects frozen by
+    previous load are unfrozen before it, because they are garbage after reload"""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    gc.unfreeze()
+    try:
+        yield
+        gc.freeze()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def stat_file(path_to_file: pathlib.Path) -> None | tuple:
+    """version of file as inode, size and time of modification, None when file is absent"""
+    try:
+        stat = os.stat(path_to_file)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+@contextlib.contextmanager
+def lock_dbase(path_to_file_dbase: pathlib.Path, shared: bool = False):
+    """advisory lock of file dbase between processes by lock file next to it, exclusive for writers
+    and shared for readers; it is not reentrant, so it is taken only by public methods of storages"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(pathlib.Path(path_to_file_dbase).with_suffix('.lock'), 'a') as fl:
+        start = time.perf_counter_ns()
+        fcntl.flock(fl.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        METRICS.observe('lock.wait', time.perf_counter_ns() - start)
+        try:
+            yield
+        finally:
+            fcntl.flock(fl.fileno(), fcntl.LOCK_UN)
 
 
 def obj2json(obj):
@@ -296,92 +578,1002 @@ def obj2json(obj):
         return str(obj)
 
 
-def decorator_time_lost(func):
-    def wrapper(*args, **kwargs):
-        path_to_file_log = pathlib.Path(get_tuning_value('path_to_dbase') + os.sep + get_tuning_value('name_log'))
+class LogWriter(object):
+    """json lines log written by background thread from in-process queue through one file handle"""
+    __instance = None
+    __path_to_file_log = None
+
+    @classmethod
+    def locate(cls, path_to_file_dbase: pathlib.Path) -> None:
+        """log of application is written next to dbase, writer of log of other dbase is closed"""
+        path_to_file_log = pathlib.Path(path_to_file_dbase).with_name(get_tuning_value('name_log'))
+        if path_to_file_log == cls.__path_to_file_log:
+            return
+        cls.__path_to_file_log = path_to_file_log
+        cls.shutdown()
+
+    @classmethod
+    def instance(cls):
+        """log writer of application, created on first use in directory of contact book
+        unless it is located next to dbase"""
+        if cls.__instance is None:
+            if cls.__path_to_file_log is None:
+                cls.__path_to_file_log = get_path_to_file(get_tuning_value('name_log'))
+            cls.__instance = cls(path_to_file_log=cls.__path_to_file_log)
+            atexit.register(cls.__instance.close)
+        return cls.__instance
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """close log writer of application, it is opened again by next record"""
+        if cls.__instance is not None:
+            cls.__instance.close()
+            cls.__instance = None
+
+    def __init__(self,
+                 path_to_file_log: pathlib.Path,
+                 flush_interval: float = get_tuning_value('log_flush_interval'),
+                 batch_size: int = get_tuning_value('log_batch_size')):
+        try:
+            self.__file_log = open(path_to_file_log, 'a', encoding='utf-8')
+        except OSError:
+            raise FileLogNotCreated
+
+        self.__flush_interval = flush_interval
+        self.__batch_size = batch_size
+        self.__queue = queue.SimpleQueue()
+        self.__thread = threading.Thread(target=self.__run, name='contact-book-log', daemon=True)
+        self.__thread.start()
+
+    def write(self, record: dict) -> None:
+        """put record to queue without waiting of disk"""
+        self.__queue.put(record)
+
+    def __run(self) -> None:
+        dirty = False
+        while True:
+            try:
+                record = self.__queue.get(timeout=self.__flush_interval)
+            except queue.Empty:
+                if dirty:
+                    self.__file_log.flush()
+                    dirty = False
+                continue
+
+            batch = [record]
+            while record is not None and len(batch) < self.__batch_size:
+                try:
+                    record = self.__queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(record)
+
+            self.__file_log.write(''.join(f'{json.dumps(LogWriter.__format(i), default=str)}\n'
+                                          for i in batch if i is not None))
+            dirty = True
+
+            if batch[-1] is None:
+                self.__file_log.flush()
+                return
+
+    @staticmethod
+    def __repr(value) -> str:
         try:
-            if not pathlib.Path(path_to_file_log).exists():
-                raise FileLogNotFound
-        except FileLogNotFound:
-            if not create_file_log(path_to_file_log=path_to_file_log):
-                raise FileLogNotCreated
+            return reprlib.repr(value)
+        except RuntimeError:  # value was changed by another thread
+            return f'<{type(value).__name__}>'
+
+    @staticmethod
+    def __format(record: dict) -> dict:
+        """values are formatted here, not in caller, to keep logging cheap for caller"""
+        time_ns = record.pop('time_ns')
+        if 'args' in record:
+            record['args'] = [LogWriter.__repr(i) for i in record['args']]
+            record['kwargs'] = {i: LogWriter.__repr(j) for i, j in record['kwargs'].items()}
+        if 'result' in record:  # there is no result when function raised error
+            record['result'] = LogWriter.__repr(record['result'])
+        return {'time': datetime.datetime.fromtimestamp(time_ns / 1e9).isoformat(timespec='microseconds'), **record}
+
+    def close(self) -> None:
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+        self.__file_log.close()
 
-        with open(path_to_file_log, 'a') as fl:
-            fl.write(f'start function: {func.__name__}'
-                     f'{datetime.datetime.now().strftime(Contact.mask_date_time_creation())}\n')
-            ret = func(*args, **kwargs)
-            fl.write(f'stop function {func.__name__}'
-                     f'{datetime.datetime.now().strftime(Contact.mask_date_time_creation())}\n')
 
-        return ret
+def decorator_time_lost(func):
+    """call is logged when it raised error too, name of error is in record"""
+    def wrapper(*args, **kwargs):
+        record = {'function': func.__name__}
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        except BaseException as error:
+            record['error'] = type(error).__name__
+            raise
+        finally:
+            record['duration_ns'] = time.perf_counter_ns() - start
+            LogWriter.instance().write({'time_ns': time.time_ns(), **record})
 
     return wrapper
 
 
 def decorator_args_kwargs(func):
+    """call is logged with its arguments and result, or with name of error instead of result"""
     def wrapper(*args, **kwargs):
-        path_to_file_log = pathlib.Path(get_tuning_value('path_to_dbase') + os.sep + get_tuning_value('name_log'))
+        record = {'function': func.__name__, 'args': args, 'kwargs': kwargs}
+        start = time.perf_counter_ns()
+        try:
+            record['result'] = func(*args, **kwargs)
+            return record['result']
+        except BaseException as error:
+            record['error'] = type(error).__name__
+            raise
+        finally:
+            record['duration_ns'] = time.perf_counter_ns() - start
+            LogWriter.instance().write({'time_ns': time.time_ns(), **record})
 
-        if path_to_file_log is not None:
-            try:
-                if not pathlib.Path(path_to_file_log).exists():
-                    raise FileLogNotFound
-            except FileLogNotFound:
-                if not create_file_log(path_to_file_log=path_to_file_log):
-                    raise FileLogNotCreated
-
-            with open(path_to_file_log, 'a') as fl:
-                sep = get_tuning_value('sep_in_dbase')
-                fl.write(f'args: {sep.join(list(args))}\n')
-
-                list_kwargs = [str(i) + ':' + str(j) for i, j in kwargs.items()]
-                fl.write(f'kwargs: {sep.join(list_kwargs)}\n')
+    return wrapper
+
+
+class Histogram(object):
+    """HDR-style histogram of latencies in nanoseconds: power of two ranges split to linear sub-buckets"""
+    sub_buckets = 16  # relative error of value is not more than 1/16
+
+    __slots__ = ('__counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.__counts: list = []
+        self.count: int = 0
+        self.total: int = 0
+        self.min: int = 0
+        self.max: int = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        if value < Histogram.sub_buckets:
+            return value
+        shift = value.bit_length() - Histogram.sub_buckets.bit_length()
+        return Histogram.sub_buckets * shift + (value >> shift)
+
+    @staticmethod
+    def bucket_value(bucket: int) -> int:
+        """highest value of bucket"""
+        if bucket < Histogram.sub_buckets:
+            return bucket
+        shift, sub_bucket = divmod(bucket, Histogram.sub_buckets)
+        return ((Histogram.sub_buckets + sub_bucket + 1) << (shift - 1)) - 1
+
+    def record(self, value: int) -> None:
+        bucket = Histogram.bucket(max(value, 0))
+        if bucket >= len(self.__counts):
+            self.__counts.extend([0] * (bucket + 1 - len(self.__counts)))
+        self.__counts[bucket] += 1
+
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, percent: float) -> int:
+        if not self.count:
+            return 0
+
+        rank = max(self.count * percent / 100, 1)
+        cnt = 0
+        for bucket, bucket_count in enumerate(self.__counts):
+            cnt += bucket_count
+            if cnt >= rank:
+                return min(Histogram.bucket_value(bucket), self.max)
+        return self.max
+
+    @property
+    def dict(self) -> dict:
+        return {'count': self.count,
+                'sum': self.total,
+                'min': self.min,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'max': self.max}
+
+
+class MetricsRegistry(object):
+    """counters, gauges and latency histograms of operations of contact book"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.__counters: dict = {}
+        self.__gauges: dict = {}
+        self.__histograms: dict = {}
+
+    def inc(self, name: str, value: int = 1) -> None:
+        if self.enabled:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def gauge(self, name: str, value) -> None:
+        if self.enabled:
+            self.__gauges[name] = value
+
+    def observe(self, name: str, value_ns: int) -> None:
+        if self.enabled:
+            histogram = self.__histograms.get(name)
+            if histogram is None:
+                histogram = self.__histograms[name] = Histogram()
+            histogram.record(value_ns)
+
+    @property
+    def dict(self) -> dict:
+        return {'counters': dict(self.__counters),
+                'gauges': dict(self.__gauges),
+                'histograms_ns': {name: histogram.dict for name, histogram in sorted(self.__histograms.items())}}
+
+    def to_json(self) -> str:
+        return json.dumps(self.dict, indent=4, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """metrics in prometheus text exposition format, latencies as summaries in seconds"""
+        rows: list = []
+        for name, value in sorted(self.__counters.items()):
+            name = f'contact_book_{re.sub(r"[^a-zA-Z0-9_]", "_", name)}_total'
+            rows += (f'# TYPE {name} counter', f'{name} {value}')
+
+        for name, value in sorted(self.__gauges.items()):
+            name = f'contact_book_{re.sub(r"[^a-zA-Z0-9_]", "_", name)}'
+            rows += (f'# TYPE {name} gauge', f'{name} {value}')
+
+        for name, histogram in sorted(self.__histograms.items()):
+            name = f'contact_book_{re.sub(r"[^a-zA-Z0-9_]", "_", name)}_seconds'
+            rows.append(f'# TYPE {name} summary')
+            for quantile in (0.5, 0.9, 0.99):
+                rows.append(f'{name}{{quantile="{quantile}"}} {histogram.percentile(quantile * 100) / 1e9}')
+            rows += (f'{name}_sum {histogram.total / 1e9}', f'{name}_count {histogram.count}')
+
+        return '\n'.join(rows) + '\n'
+
+    def dump(self, path_to_file: pathlib.Path) -> pathlib.Path:
+        """write metrics to file, prometheus text for suffix .prom, json for others"""
+        path_to_file = pathlib.Path(path_to_file)
+        with open(path_to_file, 'w', encoding='utf-8') as fm:
+            fm.write(self.to_prometheus() if path_to_file.suffix == '.prom' else self.to_json())
+        return path_to_file
+
+    def report(self) -> str:
+        rows = [f'{name}: {value}' for name, value in sorted({**self.__counters, **self.__gauges}.items())]
+        for name, histogram in sorted(self.__histograms.items()):
+            rows.append(f'{name}: count {histogram.count}, '
+                        + ', '.join(f'{i} {histogram.dict[i] / 1e6:.3f} ms'
+                                    for i in ('min', 'p50', 'p90', 'p99', 'max')))
+        return '\n'.join(rows) if rows else 'There are no metrics yet!'
+
+
+METRICS = MetricsRegistry(enabled=get_tuning_value('metrics_enabled'))
+
+
+class MemoryBudget(object):
+    """LRU accounting of bytes of segments of indexes: when bytes are over budget, the least recently used
+    segments are evicted by owner.evict(key) and owner rebuilds them on demand; budget 0 is unlimited"""
+
+    def __init__(self, budget: int = 0):
+        self.budget = budget
+        self.__segments = collections.OrderedDict()  # (id of owner, key) -> (weak reference to owner, key, bytes)
+        self.__used: int = 0
+        self.__evicted: int = 0
+
+    @property
+    def used(self) -> int:
+        return self.__used
+
+    @property
+    def dict(self) -> dict:
+        return {'budget': self.budget,
+                'used': self.__used,
+                'segments': len(self.__segments),
+                'evicted': self.__evicted}
+
+    def __release(self, reference) -> None:
+        """segments of owner which is collected"""
+        for segment_id in [i for i, (owner, *_) in self.__segments.items() if owner is reference]:
+            self.__used -= self.__segments.pop(segment_id)[2]
+
+    def charge(self, owner, key, nbytes: int) -> None:
+        """segment is built or rebuilt by owner, it is the most recently used"""
+        segment_id = (id(owner), key)
+        segment = self.__segments.pop(segment_id, None)
+        if segment is not None:
+            self.__used -= segment[2]
+        self.__segments[segment_id] = (weakref.ref(owner, self.__release), key, nbytes)
+        self.__used += nbytes
+
+        while self.budget and self.__used > self.budget and len(self.__segments) > 1:
+            reference, evicted_key, evicted_bytes = self.__segments.popitem(last=False)[1]
+            self.__used -= evicted_bytes
+            self.__evicted += 1
+            METRICS.inc('index.evicted')
+            evicted_owner = reference()
+            if evicted_owner is not None:
+                evicted_owner.evict(evicted_key)
+        METRICS.gauge('index.memory.bytes', self.__used)
+
+    def recharge(self, owner, key, delta: int) -> None:
+        """segment is changed in place by owner, its bytes are changed by delta"""
+        segment = self.__segments.get((id(owner), key))
+        if segment is not None:
+            self.charge(owner=owner, key=key, nbytes=segment[2] + delta)
+
+    def touch(self, owner, key) -> None:
+        segment_id = (id(owner), key)
+        if segment_id in self.__segments:
+            self.__segments.move_to_end(segment_id)
+
+
+INDEX_BUDGET = MemoryBudget(budget=get_tuning_value('index_memory_budget'))
+
+SIZEOF_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+                     weakref.ref, sqlite3.Connection)
+
+
+@functools.lru_cache(maxsize=None)
+def slots_of(cls) -> tuple:
+    """names of attributes of __slots__ of class and of its bases as they are stored, private are mangled"""
+    names: list = []
+    for base in cls.__mro__:
+        slots = base.__dict__.get('__slots__', ())
+        for slot in (slots,) if isinstance(slots, str) else slots:
+            if slot in ('__dict__', '__weakref__'):
+                continue
+            if slot.startswith('__') and not slot.endswith('__'):
+                slot = f'_{base.__name__.lstrip("_")}{slot}'
+            names.append(slot)
+    return tuple(names)
+
+
+def deep_sizeof(obj, seen: set, by_type: dict = None) -> tuple:
+    """bytes and count of objects reachable from obj by sys.getsizeof, objects in seen are not counted again,
+    so shared objects belong to the first walked structure; by_type is filled by [bytes, count] of types"""
+    size = count = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SIZEOF_SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        obj_size = sys.getsizeof(obj, 0)
+        size += obj_size
+        count += 1
+        if by_type is not None:
+            counts = by_type.setdefault(type(obj).__name__, [0, 0])
+            counts[0] += obj_size
+            counts[1] += 1
+
+        if isinstance(obj, (str, bytes, int, float, datetime.datetime, array.array)):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+            stack.extend(obj)
         else:
-            print(*args, sep='\n')
-            print(*kwargs, sep='\n')
-        result = func(*args, **kwargs)
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            for name in slots_of(type(obj)):
+                value = getattr(obj, name, None)
+                if value is not None:
+                    stack.append(value)
+    return size, count
+
+
+def rss_bytes() -> None | int:
+    """resident memory of process, current on linux, peak on other unix"""
+    try:
+        with open('/proc/self/statm') as fs:
+            return int(fs.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
 
-        if path_to_file_log is not None:
-            with open(path_to_file_log, 'a') as fl:
-                fl.write(f'result: {str(result)}\n')
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024  # linux reports kilobytes
+
+
+def memory_report(storage, top: int = 10) -> dict:
+    """bytes of structures of storage (contacts, indexes, ...) by walk of sys.getsizeof, bytes of the biggest
+    types, count of contacts in memory and allocations by lines of code when tracemalloc is tracing"""
+    seen: set = set()
+    by_type: dict = {}
+    structures: dict = {}
+    for name, obj in storage.memory_parts().items():
+        if obj is not None:  # index is not built
+            size, count = deep_sizeof(obj, seen=seen, by_type=by_type)
+            structures[name] = {'bytes': size, 'objects': count}
+
+    report = {'rss_bytes': rss_bytes(),
+              'structures': structures,
+              'types': {name: {'bytes': size, 'objects': count}
+                        for name, (size, count) in heapq.nlargest(top, by_type.items(), key=lambda i: i[1][0])},
+              'contacts': {'storage': len(storage),
+                           'objects': sum(by_type.get(cls.__name__, (0, 0))[1]
+                                          for cls in (Contact, *Contact.__subclasses__())),
+                           'counter': Contact.count()},
+              'index_budget': INDEX_BUDGET.dict}
+
+    if 'tracemalloc' in sys.modules and sys.modules['tracemalloc'].is_tracing():
+        tracemalloc = sys.modules['tracemalloc']
+        current, peak = tracemalloc.get_traced_memory()
+        report['tracemalloc'] = {'current_bytes': current,
+                                 'peak_bytes': peak,
+                                 'lines': [{'line': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                                            'bytes': stat.size,
+                                            'blocks': stat.count}
+                                           for stat in tracemalloc.take_snapshot().statistics('lineno')[:top]]}
+    return report
+
+
+def format_memory_report(report: dict) -> str:
+    mib = 1 << 20
+    rows = [f'process rss: {report["rss_bytes"] / mib:.1f} MiB' if report['rss_bytes'] is not None
+            else 'process rss: unknown']
+    rows += [f'{name}: {value["bytes"] / mib:.1f} MiB, {value["objects"]} objects'
+             for name, value in report['structures'].items()]
+    rows += [f'    {name}: {value["bytes"] / mib:.1f} MiB, {value["objects"]} objects'
+             for name, value in report['types'].items()]
+    rows.append(f'contacts in storage {report["contacts"]["storage"]}, in memory {report["contacts"]["objects"]}, '
+                f'by counter of Contact {report["contacts"]["counter"]}')
+    budget = report['index_budget']
+    rows.append(f'segments of indexes: {budget["used"] / mib:.1f} MiB of budget '
+                f'{budget["budget"] / mib:.1f} MiB (0 - unlimited), {budget["segments"]} segments, '
+                f'evicted {budget["evicted"]}')
+    if 'tracemalloc' in report:
+        rows.append(f'tracemalloc: current {report["tracemalloc"]["current_bytes"] / mib:.1f} MiB, '
+                    f'peak {report["tracemalloc"]["peak_bytes"] / mib:.1f} MiB')
+        rows += [f'    {line["line"]}: {line["bytes"] / mib:.1f} MiB, {line["blocks"]} blocks'
+                 for line in report['tracemalloc']['lines']]
+    return '\n'.join(rows)
+
+
+def decorator_metrics(name: str):
+    """record latency of function to histogram of METRICS"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                METRICS.observe(name, time.perf_counter_ns() - start)
 
-        return result
+        return wrapper
 
-    return wrapper
+    return decorator
 
 
 @decorator_args_kwargs
+@decorator_metrics('lookup.phone')
 def find_contact_by_phone(dict_contacts: dict,
                           phone_number: str) -> None | Contact:
-    return dict_contacts.get(phone_number)
+    contact = dict_contacts.get(normalize_phone_number(phone_number))
+    if contact is None:  # phone number of book which is not normalized yet
+        contact = dict_contacts.get(phone_number)
+    return contact
 
 
 def find_contact_by_name(dict_contacts: dict,
                          contact_name: str) -> tuple:
-    contacts = ()
-    for obj in dict_contacts.values():
-        if obj.contact_name.upper().find(contact_name.upper()) >= 0:
-            contacts += (obj,)
-    return contacts
+    search_key = get_search_key(contact_name)
+    return tuple(obj for obj in dict_contacts.values() if search_key in obj.search_key)
+
+
+class NameIndex(object):
+    """n-gram posting-list index of contact names for substring search, postings are kept in segments
+    by first symbol of gram: segments are charged to INDEX_BUDGET, evicted segment is rebuilt on demand
+    by scan of names for its symbol"""
+    __slots__ = ('__dict_contacts', '__gram_size', '__segments', '__weakref__')
+
+    def __init__(self,
+                 dict_contacts: dict,
+                 gram_size: int = get_tuning_value('name_index_gram_size')):
+        self.__dict_contacts = dict_contacts
+        self.__gram_size = gram_size
+        self.__segments: dict = {}  # first symbol of gram -> gram -> phone numbers
+
+        if INDEX_BUDGET.budget:  # segments are built by first search of them
+            return
+
+        start = time.perf_counter_ns()
+        postings: dict = {}
+        for contact in dict_contacts.values():
+            for gram in self.grams(contact.search_key):
+                phones = postings.get(gram)
+                if phones is None:
+                    postings[gram] = {contact.phone_number}
+                else:
+                    phones.add(contact.phone_number)
+
+        segments = self.__segments
+        for gram, phones in postings.items():
+            segment = segments.get(gram[0])
+            if segment is None:
+                segment = segments[gram[0]] = {}
+            segment[gram] = phones
+        for symbol, segment in segments.items():
+            INDEX_BUDGET.charge(owner=self, key=symbol, nbytes=NameIndex.sizeof(segment))
+        METRICS.observe('index.rebuild', time.perf_counter_ns() - start)
+
+    def __getstate__(self):
+        return self.__dict_contacts, self.__gram_size, self.__segments
+
+    def __setstate__(self, state):
+        self.__dict_contacts, self.__gram_size, self.__segments = state
+        for symbol, segment in self.__segments.items():
+            INDEX_BUDGET.charge(owner=self, key=symbol, nbytes=NameIndex.sizeof(segment))
+
+    def __len__(self):
+        return sum(map(len, self.__segments.values()))
+
+    @staticmethod
+    def sizeof(segment: dict) -> int:
+        """bytes of segment without phone numbers, they are shared with contacts"""
+        return sys.getsizeof(segment) + sum(sys.getsizeof(gram) + sys.getsizeof(phones)
+                                            for gram, phones in segment.items())
+
+    def grams(self, key: str) -> set:
+        """all substrings of search key with length from 1 to gram size"""
+        return {key[i:i + size]
+                for size in range(1, self.__gram_size + 1)
+                for i in range(len(key) - size + 1)}
+
+    def evict(self, symbol: str) -> None:
+        self.__segments.pop(symbol, None)
+
+    def __segment(self, symbol: str) -> dict:
+        segment = self.__segments.get(symbol)
+        if segment is not None:
+            INDEX_BUDGET.touch(owner=self, key=symbol)
+            return segment
+
+        start = time.perf_counter_ns()
+        segment = {}
+        gram_size = self.__gram_size
+        for contact in self.__dict_contacts.values():
+            key = contact.search_key
+            i = key.find(symbol)
+            while i >= 0:
+                for gram in {key[i:i + size] for size in range(1, min(gram_size, len(key) - i) + 1)}:
+                    phones = segment.get(gram)
+                    if phones is None:
+                        segment[gram] = {contact.phone_number}
+                    else:
+                        phones.add(contact.phone_number)
+                i = key.find(symbol, i + 1)
+        self.__segments[symbol] = segment
+        INDEX_BUDGET.charge(owner=self, key=symbol, nbytes=NameIndex.sizeof(segment))
+        METRICS.observe('index.segment.rebuild', time.perf_counter_ns() - start)
+        return segment
+
+    def __recharge(self, deltas: dict) -> None:
+        """changed segments are charged by change of bytes of them, deltas of segments are taken with
+        minus size of dict of segment before change"""
+        for symbol, delta in deltas.items():
+            segment = self.__segments.get(symbol)
+            if segment is None:  # it is evicted by charge of previous one
+                continue
+            delta += sys.getsizeof(segment)
+            if delta:
+                INDEX_BUDGET.recharge(owner=self, key=symbol, delta=delta)
+
+    def add(self, contact: Contact) -> None:
+        """only segments in memory are changed, others are built with contact on demand"""
+        segments = self.__segments
+        deltas: dict = {}
+        for gram in self.grams(contact.search_key):
+            segment = segments.get(gram[0])
+            if segment is None:
+                continue
+            delta = deltas.get(gram[0], -sys.getsizeof(segment))
+            phones = segment.get(gram)
+            if phones is None:
+                phones = segment[gram] = {contact.phone_number}
+                delta += sys.getsizeof(gram) + sys.getsizeof(phones)
+            else:
+                delta -= sys.getsizeof(phones)
+                phones.add(contact.phone_number)
+                delta += sys.getsizeof(phones)
+            deltas[gram[0]] = delta
+        self.__recharge(deltas)
+
+    def remove(self, contact: Contact) -> None:
+        segments = self.__segments
+        deltas: dict = {}
+        for gram in self.grams(contact.search_key):
+            segment = segments.get(gram[0])
+            if segment is None:
+                continue
+            phones = segment.get(gram)
+            if phones is not None:
+                phones.discard(contact.phone_number)
+                if not phones:
+                    deltas[gram[0]] = (deltas.get(gram[0], -sys.getsizeof(segment))
+                                       - sys.getsizeof(gram) - sys.getsizeof(phones))
+                    del segment[gram]
+        self.__recharge(deltas)
+
+    def __posting(self, gram: str):
+        return self.__segment(gram[0]).get(gram, ()) if gram else ()
+
+    def __postings(self, key: str) -> list:
+        """postings of grams of key longer than gram, each of them has all contacts with key, so only
+        segments in memory are used and one segment is built when there are no such segments"""
+        grams = [key[i:i + self.__gram_size] for i in range(len(key) - self.__gram_size + 1)]
+        return [self.__posting(gram) for gram in [gram for gram in grams if gram[0] in self.__segments]
+                or grams[:1]]
+
+    def __phones(self, key: str):
+        """phone numbers of contacts with key when it is not longer than gram, else with grams of key"""
+        if len(key) <= self.__gram_size:
+            return self.__posting(key)
+
+        postings = sorted(self.__postings(key), key=len)
+        return postings[0].intersection(*postings[1:]) if postings[0] else ()
+
+    def estimate(self, contact_name: str) -> int:
+        """count of contacts in the shortest posting list of grams of name, it is not less than count of found"""
+        key = get_search_key(contact_name)
+        if len(key) <= self.__gram_size:
+            return len(self.__posting(key))
+        return min(map(len, self.__postings(key)))
+
+    def candidates(self, contact_name: str):
+        """phone numbers of contacts which may have part of name, they are checked by caller"""
+        yield from tuple(self.__phones(get_search_key(contact_name)))
+
+    def find(self, contact_name: str) -> tuple:
+        key = get_search_key(contact_name)
+        if not key:
+            return ()
+
+        contacts = (self.__dict_contacts[phone] for phone in self.__phones(key))
+        if len(key) <= self.__gram_size:
+            return tuple(contacts)
+
+        return tuple(contact for contact in contacts if key in contact.search_key)
 
 
 @decorator_time_lost
-def find_contact_by_name_(names_dict: dict,
-                          dict_contacts: dict,
+@decorator_metrics('lookup.name')
+def find_contact_by_name_(storage,
                           contact_name: str) -> tuple:
-    contacts = names_dict.get(contact_name.upper())
+    return storage.find_by_name(contact_name=contact_name)
+
+
+class PhoneIndex(object):
+    """sorted arrays of digits of phone numbers and of reversed digits for search by beginning and ending"""
+    __slots__ = ('__prefixes', '__prefix_phones', '__suffixes', '__suffix_phones')
+
+    def __init__(self, phone_numbers):
+        start = time.perf_counter_ns()
+        prefixes = sorted((PhoneIndex.digits(phone_number), phone_number) for phone_number in phone_numbers)
+        suffixes = sorted((digits[::-1], phone_number) for digits, phone_number in prefixes)
+        self.__prefixes = [digits for digits, _ in prefixes]
+        self.__prefix_phones = [phone_number for _, phone_number in prefixes]
+        self.__suffixes = [digits for digits, _ in suffixes]
+        self.__suffix_phones = [phone_number for _, phone_number in suffixes]
+        METRICS.observe('index.phone.rebuild', time.perf_counter_ns() - start)
+
+    def __len__(self):
+        return len(self.__prefixes)
+
+    @staticmethod
+    def digits(phone_number: str) -> str:
+        return phone_number.translate(PHONE_SEPARATORS_TABLE).lstrip('+')
+
+    @staticmethod
+    def __insert(keys: list, phones: list, key: str, phone_number: str) -> None:
+        i = bisect.bisect_left(keys, key)
+        keys.insert(i, key)
+        phones.insert(i, phone_number)
+
+    @staticmethod
+    def __delete(keys: list, phones: list, key: str, phone_number: str) -> None:
+        i = bisect.bisect_left(keys, key)
+        while i < len(keys) and keys[i] == key:
+            if phones[i] == phone_number:
+                del keys[i], phones[i]
+                return
+            i += 1
+
+    @staticmethod
+    def __bounds(keys: list, key: str) -> tuple:
+        """positions of keys beginning by given key, ':' is the next symbol after '9'"""
+        lo = bisect.bisect_left(keys, key)
+        return lo, bisect.bisect_left(keys, f'{key}:', lo)
+
+    @staticmethod
+    def __range(keys: list, phones: list, key: str) -> list:
+        lo, hi = PhoneIndex.__bounds(keys, key)
+        return phones[lo:hi]
+
+    @staticmethod
+    def prefix_digits(phone_prefix: str) -> None | str:
+        """digits of beginning of phone number with country code instead of trunk prefix (8912 -> 7912),
+        None when it is not beginning of phone number"""
+        prefix = phone_prefix.strip().translate(PHONE_SEPARATORS_TABLE)
+        trunk_prefix = get_tuning_value('phone_trunk_prefix')
+        if prefix.startswith('+'):
+            prefix = prefix[1:]
+        elif prefix.startswith(trunk_prefix):
+            prefix = f'{get_tuning_value("phone_country_code")}{prefix[len(trunk_prefix):]}'
+        return prefix if prefix.isdigit() else None
+
+    def add(self, phone_number: str) -> None:
+        digits = PhoneIndex.digits(phone_number)
+        PhoneIndex.__insert(self.__prefixes, self.__prefix_phones, digits, phone_number)
+        PhoneIndex.__insert(self.__suffixes, self.__suffix_phones, digits[::-1], phone_number)
+
+    def remove(self, phone_number: str) -> None:
+        digits = PhoneIndex.digits(phone_number)
+        PhoneIndex.__delete(self.__prefixes, self.__prefix_phones, digits, phone_number)
+        PhoneIndex.__delete(self.__suffixes, self.__suffix_phones, digits[::-1], phone_number)
+
+    def find_prefix(self, prefix: str) -> list:
+        return PhoneIndex.__range(self.__prefixes, self.__prefix_phones, prefix)
+
+    def find_suffix(self, suffix: str) -> list:
+        return PhoneIndex.__range(self.__suffixes, self.__suffix_phones, suffix[::-1])
+
+    def count_prefix(self, prefix: str) -> int:
+        lo, hi = PhoneIndex.__bounds(self.__prefixes, prefix)
+        return hi - lo
+
+    def iter_prefix(self, prefix: str):
+        """phone numbers beginning by digits of prefix, they are taken from index one by one"""
+        lo, hi = PhoneIndex.__bounds(self.__prefixes, prefix)
+        for i in range(lo, hi):
+            yield self.__prefix_phones[i]
+
+    def find(self, phone_part: str) -> list:
+        """phone numbers by part: beginning with '*' at the end (+7912*, 8912*) or last digits (6789, *6789)"""
+        phone_part = phone_part.strip()
+        if phone_part.endswith('*'):
+            prefix = PhoneIndex.prefix_digits(phone_part[:-1])
+            return [] if prefix is None else self.find_prefix(prefix)
+
+        suffix = phone_part.lstrip('*').translate(PHONE_SEPARATORS_TABLE)
+        return self.find_suffix(suffix) if suffix.isdigit() else []
 
-    if contacts is None:
-        contacts = find_contact_by_name(dict_contacts=dict_contacts,
-                                        contact_name=contact_name)
-    return contacts
+
+@decorator_time_lost
+@decorator_metrics('lookup.phone_part')
+def find_contact_by_phone_part(storage,
+                               phone_part: str) -> tuple:
+    return storage.find_by_phone_part(phone_part=phone_part)
+
+
+class SortedContacts(object):
+    """blocked sorted list of keys (search key, phone number) of contacts, it keeps order of names
+    on add and remove without sorting of all contacts and gives page of phone numbers by its position"""
+    __slots__ = ('__blocks', '__maxes', '__len', '__block_size')
+
+    def __init__(self,
+                 dict_contacts: dict,
+                 block_size: int = get_tuning_value('sorted_block_size')):
+        start = time.perf_counter_ns()
+        keys = sorted(map(SortedContacts.key, dict_contacts.values()))
+        self.__block_size = block_size
+        self.__blocks = [keys[i:i + block_size] for i in range(0, len(keys), block_size)]
+        self.__maxes = [block[-1] for block in self.__blocks]
+        self.__len = len(keys)
+        METRICS.observe('index.sorted.rebuild', time.perf_counter_ns() - start)
+
+    @staticmethod
+    def key(contact: Contact) -> tuple:
+        return contact.search_key, contact.phone_number
+
+    def __len__(self):
+        return self.__len
+
+    def __iter__(self):
+        for block in self.__blocks:
+            for _, phone_number in block:
+                yield phone_number
+
+    def add(self, contact: Contact) -> None:
+        key = SortedContacts.key(contact)
+        if not self.__blocks:
+            self.__blocks.append([key])
+            self.__maxes.append(key)
+            self.__len += 1
+            return
+
+        i = min(bisect.bisect_left(self.__maxes, key), len(self.__maxes) - 1)
+        block = self.__blocks[i]
+        bisect.insort(block, key)
+        self.__maxes[i] = block[-1]
+        self.__len += 1
+
+        if len(block) > 2 * self.__block_size:  # split of block keeps insert by O(block size)
+            half = len(block) // 2
+            self.__blocks[i:i + 1] = block[:half], block[half:]
+            self.__maxes[i:i + 1] = block[half - 1], block[-1]
+
+    def remove(self, contact: Contact) -> None:
+        key = SortedContacts.key(contact)
+        i = bisect.bisect_left(self.__maxes, key)
+        if i == len(self.__maxes):
+            return
+
+        block = self.__blocks[i]
+        j = bisect.bisect_left(block, key)
+        if j == len(block) or block[j] != key:
+            return
+
+        del block[j]
+        self.__len -= 1
+        if block:
+            self.__maxes[i] = block[-1]
+        else:
+            del self.__blocks[i], self.__maxes[i]
+
+    def page(self, start: int, count: int) -> list:
+        """phone numbers from position start in order of names"""
+        phone_numbers: list = []
+        for block in self.__blocks:
+            if start >= len(block):
+                start -= len(block)
+                continue
+
+            phone_numbers.extend(phone_number for _, phone_number in block[start:start + count - len(phone_numbers)])
+            start = 0
+            if len(phone_numbers) >= count:
+                break
+        return phone_numbers
+
+
+class CreationIndex(object):
+    """sorted arrays of dates and times of creation of contacts and of their phone numbers
+    for search by range of dates"""
+    __slots__ = ('__dates', '__phones')
+
+    def __init__(self, dict_contacts: dict):
+        start = time.perf_counter_ns()
+        keys = sorted((contact.date_time_creation_contact, contact.phone_number) for contact in dict_contacts.values())
+        self.__dates = [date_time for date_time, _ in keys]
+        self.__phones = [phone_number for _, phone_number in keys]
+        METRICS.observe('index.created.rebuild', time.perf_counter_ns() - start)
+
+    def __len__(self):
+        return len(self.__dates)
+
+    def add(self, contact: Contact) -> None:
+        i = bisect.bisect_right(self.__dates, contact.date_time_creation_contact)  # new contacts are at the end
+        self.__dates.insert(i, contact.date_time_creation_contact)
+        self.__phones.insert(i, contact.phone_number)
+
+    def remove(self, contact: Contact) -> None:
+        i = bisect.bisect_left(self.__dates, contact.date_time_creation_contact)
+        while i < len(self.__dates) and self.__dates[i] == contact.date_time_creation_contact:
+            if self.__phones[i] == contact.phone_number:
+                del self.__dates[i], self.__phones[i]
+                return
+            i += 1
+
+    def __bounds(self, date_from: datetime.datetime = None, date_to: datetime.datetime = None) -> tuple:
+        lo = 0 if date_from is None else bisect.bisect_left(self.__dates, date_from)
+        hi = len(self.__dates) if date_to is None else bisect.bisect_left(self.__dates, date_to, lo)
+        return lo, max(lo, hi)
+
+    def count(self, date_from: datetime.datetime = None, date_to: datetime.datetime = None) -> int:
+        lo, hi = self.__bounds(date_from, date_to)
+        return hi - lo
+
+    def find(self, date_from: datetime.datetime = None, date_to: datetime.datetime = None):
+        """phone numbers of contacts created from date_from (inclusive) to date_to (exclusive) one by one"""
+        lo, hi = self.__bounds(date_from, date_to)
+        for i in range(lo, hi):
+            yield self.__phones[i]
+
+
+class ContactFilter(object):
+    """predicates on part of name, beginning of phone number and range of dates of creation of contacts,
+    None is any; matched contacts are streamed from candidates of the most selective index"""
+    __slots__ = ('__search_key', '__phone_prefix', '__date_from', '__date_to')
+
+    def __init__(self,
+                 contact_name: str = None,
+                 phone_prefix: str = None,
+                 date_from: datetime.datetime = None,
+                 date_to: datetime.datetime = None):
+        self.__search_key = get_search_key(contact_name) if contact_name else None
+        self.__phone_prefix = None
+        if phone_prefix:
+            self.__phone_prefix = PhoneIndex.prefix_digits(phone_prefix)
+            if self.__phone_prefix is None:
+                raise ValueError(f'{phone_prefix} is not beginning of phone number')
+        self.__date_from = date_from
+        self.__date_to = date_to
+
+    def __repr__(self):
+        return (f'ContactFilter(search_key={self.__search_key}, phone_prefix={self.__phone_prefix}, '
+                f'date_from={self.__date_from}, date_to={self.__date_to})')
+
+    @property
+    def search_key(self) -> None | str:
+        return self.__search_key
+
+    @property
+    def phone_prefix(self) -> None | str:
+        """digits of beginning of phone number without '+'"""
+        return self.__phone_prefix
+
+    @property
+    def date_from(self) -> None | datetime.datetime:
+        return self.__date_from
+
+    @property
+    def date_to(self) -> None | datetime.datetime:
+        """end of range of dates of creation, it is not included"""
+        return self.__date_to
+
+    @property
+    def dated(self) -> bool:
+        return self.__date_from is not None or self.__date_to is not None
+
+    def match(self, contact: Contact) -> bool:
+        return ((self.__search_key is None or self.__search_key in contact.search_key)
+                and (self.__phone_prefix is None
+                     or PhoneIndex.digits(contact.phone_number).startswith(self.__phone_prefix))
+                and (self.__date_from is None or contact.date_time_creation_contact >= self.__date_from)
+                and (self.__date_to is None or contact.date_time_creation_contact < self.__date_to))
+
+    def plan(self,
+             names: NameIndex = None,
+             phones: PhoneIndex = None,
+             created: CreationIndex = None) -> None | tuple:
+        """predicate of given indexes with the least count of candidates: name of index, count of candidates
+        and their phone numbers which are not taken yet; None when no predicate has index"""
+        plans: list = []
+        if self.__search_key is not None and names is not None:
+            plans.append(('name', names.estimate(self.__search_key), names.candidates(self.__search_key)))
+        if self.__phone_prefix is not None and phones is not None:
+            plans.append(('phone', phones.count_prefix(self.__phone_prefix), phones.iter_prefix(self.__phone_prefix)))
+        if self.dated and created is not None:
+            plans.append(('created', created.count(self.__date_from, self.__date_to),
+                          created.find(self.__date_from, self.__date_to)))
+        return min(plans, key=lambda plan: plan[1], default=None)
+
+    def filter(self,
+               dict_contacts: dict,
+               names: NameIndex = None,
+               phones: PhoneIndex = None,
+               created: CreationIndex = None):
+        """contacts matched all predicates, they are checked one by one from candidates of plan,
+        or from all contacts when no predicate has index"""
+        plan = self.plan(names=names, phones=phones, created=created)
+        METRICS.inc(f'filter.plan.{"scan" if plan is None else plan[0]}')
+        for phone_number in iter(dict_contacts) if plan is None else plan[2]:
+            contact = dict_contacts.get(phone_number)
+            if contact is not None and self.match(contact):
+                yield contact
+
+
+def find_contact_by_filter(storage,
+                           contact_filter: ContactFilter):
+    """iterator of contacts by filter, they are found while they are taken from it"""
+    return storage.find_by_filter(contact_filter=contact_filter)
 
 
 def create_contact() -> Contact:
     contact_name = input('Please, input contact name>> ')
     Contact.validate_contact_name(contact_name=contact_name)
 
-    phone_number = input(f'Please, input phone number for {contact_name}>> ')
+    phone_number = normalize_phone_number(input(f'Please, input phone number for {contact_name}>> '))
     Contact.validate_phone_number(phone_number=phone_number)
 
     return Contact(phone_number=phone_number,
@@ -393,12 +1585,42 @@ def edit_contact(contact: Contact) -> Contact:
     contact_name = input(f'Please, input new contact name for "{contact.contact_name}">> ')
     phone_number = contact.phone_number
     new_contact = Contact(phone_number=phone_number,
-                          contact_name=contact_name)
+                          contact_name=contact_name,
+                          date_time_creation_contact=contact.date_time_creation_contact)
 
     del contact
     return new_contact
 
 
+def input_contact_filter() -> ContactFilter:
+    """predicates of filter from user, empty answer is any value, last date is included in range"""
+    def input_date(prompt: str) -> None | datetime.datetime:
+        answer = input(prompt).strip()
+        return datetime.datetime.strptime(answer, '%d.%m.%Y') if answer else None
+
+    contact_name = input('Enter part of contact name or nothing for any>> ').strip()
+    phone_prefix = input('Enter beginning of phone (+7912) or nothing for any>> ').strip()
+    date_from = input_date('Enter first date of creation (dd.mm.yyyy) or nothing for any>> ')
+    date_to = input_date('Enter last date of creation (dd.mm.yyyy) or nothing for any>> ')
+    if date_to is not None:
+        date_to += datetime.timedelta(days=1)
+
+    return ContactFilter(contact_name=contact_name or None,
+                         phone_prefix=phone_prefix or None,
+                         date_from=date_from,
+                         date_to=date_to)
+
+
+def input_merge_of_duplicates(score: float, contacts: tuple, merged: Contact) -> bool | None:
+    """answer of user for group of duplicates, see dedupe_contacts"""
+    print(f'Duplicates with score {score}:')
+    for contact in contacts:
+        print(f'    {contact} {contact.str_date_time_creation_contact}')
+    print(f'will be merged to: {merged} {merged.str_date_time_creation_contact}')
+    answer = input('Merge? ("Y" - merge / Press key Enter - skip / "N" - stop and return main menu)>> ').upper()
+    return None if answer == 'N' else answer == 'Y'
+
+
 def get_mark_print(len_obj: int, num_of_lines: int = get_tuning_value('num_of_lines')) -> int:
     if len_obj <= num_of_lines:
         mark_print: int = get_tuning_value('mark_print')
@@ -408,23 +1630,66 @@ def get_mark_print(len_obj: int, num_of_lines: int = get_tuning_value('num_of_li
     return 1 if mark_print == 0 else mark_print
 
 
-def print_contacts(dict_contacts: dict) -> None:
-    cnt_rows: int = 0
-    if dict_contacts:
-        list_contacts = sorted_dict_contacts(dict_contacts=dict_contacts)
+def print_contacts(dict_contacts: dict = None, storage=None) -> None:
+    """print contacts in order of names page by page, pages of storage are taken from its sorted order;
+    only rendering of each page is timed, not waiting of user between pages"""
+    if storage is None:
+        sorted_contacts = SortedContacts(dict_contacts=dict_contacts or {})
+        len_contacts = len(sorted_contacts)
 
-        mark_print = get_mark_print(len_obj=len(list_contacts))
+        def page_of_contacts(start: int, count: int) -> tuple:
+            return tuple(dict_contacts[phone_number] for phone_number in sorted_contacts.page(start, count))
+    else:
+        len_contacts = len(storage)
+        page_of_contacts = storage.page_of_contacts
 
-        for _, contact in list_contacts:
+    if not len_contacts:
+        print('Contact book is empty!')
+        return
+
+    page_size = get_mark_print(len_obj=len_contacts)
+    cnt_pages = -(-len_contacts // page_size)
+    num_page = 0
+    while num_page < cnt_pages:
+        start = time.perf_counter_ns()
+        for contact in page_of_contacts(start=num_page * page_size, count=page_size):
             print(contact)
-            cnt_rows += 1
-            if cnt_rows % mark_print == 0:
-                input('Press any key to continue...')
+        METRICS.observe('print', time.perf_counter_ns() - start)
+
+        num_page += 1
+        if num_page < cnt_pages:
+            answer = input(f'Page {num_page} of {cnt_pages}. Press key Enter for next page, '
+                           f'enter number of page to go or "N" to stop>> ')
+            if answer.upper() == 'N':
+                return
+            if answer.isdigit():
+                num_page = min(max(int(answer), 1), cnt_pages) - 1
+
+    input('Output is finish. Press any key to continue...')
+
+
+def print_stream_of_contacts(contacts) -> int:
+    """print contacts of iterator page by page while they are found, count of them is not known before end,
+    returns count of printed contacts; search and rendering of each page are timed, not waiting of user"""
+    page_size = get_tuning_value('num_of_lines')
+    contacts = iter(contacts)
+    count = 0
+    start = time.perf_counter_ns()
+    page = tuple(itertools.islice(contacts, page_size))
+    while page:
+        for contact in page:
+            print(contact)
+        count += len(page)
 
-        if cnt_rows % mark_print != 0:
-            input('Output is finish. Press any key to continue...')
-    else:
-        print('Contact book is empty!')
+        page = tuple(itertools.islice(contacts, page_size))
+        METRICS.observe('print.stream', time.perf_counter_ns() - start)
+        if page and input(f'Found {count}. Press key Enter for next page or "N" to stop>> ').upper() == 'N':
+            return count
+        start = time.perf_counter_ns()
+
+    if count:
+        input(f'Found {count}. Output is finish. Press any key to continue...')
+    return count
 
 
 def create_file_base(path_to_file_dbase: pathlib.Path) -> bool | None:
@@ -433,16 +1698,460 @@ def create_file_base(path_to_file_dbase: pathlib.Path) -> bool | None:
     return True
 
 
-def create_file_log(path_to_file_log: pathlib.Path) -> bool | None:
-    with open(path_to_file_log, 'w'):
-        pass
-    return True
+class ColumnarContacts(collections.abc.MutableMapping):
+    """compact store of contacts by columns with open addressing hash index of phone numbers,
+    contacts are created as views on access"""
+    packed_phone = re.compile(r'\+?\d{1,17}')
+    empty = -1
+    removed = -2
+
+    def __init__(self, dict_contacts: dict = None):
+        self.__phones = array.array('Q')  # phone packed to integer, 0 - removed row, 1 - see extra phones
+        self.__extra_phones: dict = {}  # row -> phone number which is not packed to integer
+        self.__names = bytearray()
+        self.__name_offsets = array.array('Q')
+        self.__name_sizes = array.array('I')
+        self.__creations = array.array('q')  # epoch seconds
+        self.__table = array.array('q', [ColumnarContacts.empty]) * 8  # hash index: phone number -> row
+        self.__count: int = 0
+        self.__used_slots: int = 0
+        self.__garbage_names: int = 0
+
+        if dict_contacts is not None:
+            for contact in dict_contacts.values():
+                self[contact.phone_number] = contact
+
+    def __getstate__(self):
+        """hash index is not pickled, because hashes of str are randomized per process"""
+        return (self.__phones, self.__extra_phones, self.__names, self.__name_offsets, self.__name_sizes,
+                self.__creations, self.__count, self.__garbage_names)
+
+    def __setstate__(self, state):
+        (self.__phones, self.__extra_phones, self.__names, self.__name_offsets, self.__name_sizes,
+         self.__creations, self.__count, self.__garbage_names) = state
+        self.__resize(ColumnarContacts.capacity(self.__count))
+
+    @staticmethod
+    def capacity(count: int) -> int:
+        """capacity of hash index for count of phone numbers, it is filled less than a third"""
+        capacity = 8
+        while capacity * 2 <= count * 3:
+            capacity *= 2
+        return capacity * 2
+
+    @staticmethod
+    def pack_phone(phone_number: str) -> int:
+        """phone number as integer with leading 1 and flag of '+', so leading zeros are kept"""
+        if ColumnarContacts.packed_phone.fullmatch(phone_number) is None:
+            return 1
+        if phone_number.startswith('+'):
+            return int(f'11{phone_number[1:]}')
+        return int(f'10{phone_number}')
+
+    def __phone_number(self, row: int) -> str:
+        packed = self.__phones[row]
+        if packed == 1:
+            return self.__extra_phones[row]
+        packed = str(packed)
+        return f'+{packed[2:]}' if packed[1] == '1' else packed[2:]
+
+    def __name(self, row: int) -> str:
+        offset = self.__name_offsets[row]
+        return self.__names[offset:offset + self.__name_sizes[row]].decode('utf-8')
+
+    def __find(self, phone_number: str) -> tuple:
+        """slot of hash index and row of phone number, row is -1 when phone number is not found"""
+        table = self.__table
+        mask = len(table) - 1
+        slot = hash(phone_number) & mask
+        free_slot = -1
+        while True:
+            row = table[slot]
+            if row == ColumnarContacts.empty:
+                return (slot if free_slot < 0 else free_slot), -1
+            if row == ColumnarContacts.removed:
+                if free_slot < 0:
+                    free_slot = slot
+            elif self.__phone_number(row) == phone_number:
+                return slot, row
+            slot = (slot + 1) & mask
+
+    def __resize(self, capacity: int) -> None:
+        self.__table = table = array.array('q', [ColumnarContacts.empty]) * capacity
+        mask = capacity - 1
+        for row, packed in enumerate(self.__phones):
+            if packed:
+                slot = hash(self.__phone_number(row)) & mask
+                while table[slot] != ColumnarContacts.empty:
+                    slot = (slot + 1) & mask
+                table[slot] = row
+        self.__used_slots = self.__count
+
+    def __set_name(self, row: int, contact_name: str) -> None:
+        name = contact_name.encode('utf-8')
+        self.__name_offsets[row] = len(self.__names)
+        self.__name_sizes[row] = len(name)
+        self.__names += name
+
+    def put(self, phone_number: str, contact_name: str, creation: int) -> None:
+        """add or replace contact by its fields, creation in epoch seconds"""
+        slot, row = self.__find(phone_number)
+        if row >= 0:
+            self.__garbage_names += self.__name_sizes[row]
+            self.__set_name(row, contact_name)
+            self.__creations[row] = creation
+            if self.__garbage_names > len(self.__names) // 2:
+                self.compact()
+            return
+
+        row = len(self.__phones)
+        packed = ColumnarContacts.pack_phone(phone_number)
+        if packed == 1:
+            self.__extra_phones[row] = phone_number
+        self.__phones.append(packed)
+        self.__name_offsets.append(0)
+        self.__name_sizes.append(0)
+        self.__set_name(row, contact_name)
+        self.__creations.append(creation)
+
+        if self.__table[slot] == ColumnarContacts.empty:
+            self.__used_slots += 1
+        self.__table[slot] = row
+        self.__count += 1
+
+        if self.__used_slots * 3 >= len(self.__table) * 2:
+            self.__resize(len(self.__table) * 2 if self.__count * 3 >= len(self.__table) else len(self.__table))
+
+    def __setitem__(self, phone_number: str, contact: Contact) -> None:
+        self.put(phone_number, contact.contact_name, datetime2epoch(contact.date_time_creation_contact))
+
+    def __getitem__(self, phone_number: str) -> Contact:
+        _, row = self.__find(phone_number)
+        if row < 0:
+            raise KeyError(phone_number)
+        return self.__contact(row, phone_number)
+
+    def __contact(self, row: int, phone_number: str) -> Contact:
+        return Contact(phone_number=phone_number,
+                       contact_name=self.__name(row),
+                       date_time_creation_contact=epoch2datetime(self.__creations[row]),
+                       validate=False)
+
+    def __delitem__(self, phone_number: str) -> None:
+        slot, row = self.__find(phone_number)
+        if row < 0:
+            raise KeyError(phone_number)
+
+        self.__table[slot] = ColumnarContacts.removed
+        self.__phones[row] = 0
+        self.__extra_phones.pop(row, None)
+        self.__garbage_names += self.__name_sizes[row]
+        self.__count -= 1
+
+        if self.__count * 2 < len(self.__phones) - 8:
+            self.compact()
+
+    def __contains__(self, phone_number) -> bool:
+        return self.__find(phone_number)[1] >= 0
+
+    def __len__(self):
+        return self.__count
+
+    def __iter__(self):
+        for row, packed in enumerate(self.__phones):
+            if packed:
+                yield self.__phone_number(row)
+
+    def values(self):
+        for row, packed in enumerate(self.__phones):
+            if packed:
+                yield self.__contact(row, self.__phone_number(row))
+
+    def items(self):
+        for contact in self.values():
+            yield contact.phone_number, contact
+
+    def compact(self) -> None:
+        """drop removed rows and replaced names"""
+        rows = [row for row, packed in enumerate(self.__phones) if packed]
+        names = bytearray()
+        name_offsets = array.array('Q')
+        for row in rows:
+            offset = self.__name_offsets[row]
+            name_offsets.append(len(names))
+            names += self.__names[offset:offset + self.__name_sizes[row]]
+
+        self.__extra_phones = {i: self.__extra_phones[row] for i, row in enumerate(rows) if row in self.__extra_phones}
+        self.__phones = array.array('Q', (self.__phones[row] for row in rows))
+        self.__name_sizes = array.array('I', (self.__name_sizes[row] for row in rows))
+        self.__creations = array.array('q', (self.__creations[row] for row in rows))
+        self.__name_offsets = name_offsets
+        self.__names = names
+        self.__garbage_names = 0
+        self.__resize(ColumnarContacts.capacity(self.__count))
+
+
+class LazyContacts(collections.abc.MutableMapping):
+    """contacts of file dbase kept as raw records and parsed to Contact on first access"""
+
+    def __init__(self, version: int, encoding: str, sep: str):
+        self.__rows: dict = {}  # phone number -> raw record or Contact
+        self.__version = version
+        self.__encoding = encoding
+        self.__sep = sep
+        self.__bad_rows: int = 0
+
+    @property
+    def bad_rows(self) -> int:
+        return self.__bad_rows
+
+    def put_raw(self, phone_number: str, rec: bytes) -> None:
+        self.__rows[phone_number] = rec
+
+    def __parse(self, phone_number: str, rec: bytes) -> None | Contact:
+        try:
+            if self.__version >= 2:
+                rec = verify_record_dbase(rec)
+            _, contact_name, date_time_creation = split_record_dbase(rec.decode(self.__encoding),
+                                                                     sep=self.__sep,
+                                                                     escaped=self.__version >= 2)
+            contact = Contact(phone_number=phone_number,
+                              contact_name=contact_name,
+                              date_time_creation_contact=parse_date_time_creation(date_time_creation),
+                              validate=False)
+        except (FileBaseCorrupted, ValueError):
+            del self.__rows[phone_number]
+            self.__bad_rows += 1
+            print(f'found bad row of contact {phone_number} in file dbase; it is skipped')
+            return None
+
+        self.__rows[phone_number] = contact
+        return contact
+
+    def __getitem__(self, phone_number: str) -> Contact:
+        contact = self.__rows[phone_number]
+        if type(contact) is bytes:
+            contact = self.__parse(phone_number, contact)
+            if contact is None:
+                raise KeyError(phone_number)
+        return contact
+
+    def __setitem__(self, phone_number: str, contact: Contact) -> None:
+        self.__rows[phone_number] = contact
+
+    def __delitem__(self, phone_number: str) -> None:
+        del self.__rows[phone_number]
+
+    def __contains__(self, phone_number) -> bool:
+        return phone_number in self.__rows
+
+    def __len__(self):
+        return len(self.__rows)
+
+    def __iter__(self):
+        return iter(self.__rows)
+
+    def values(self):
+        for phone_number, contact in tuple(self.__rows.items()):
+            if type(contact) is bytes:
+                contact = self.__parse(phone_number, contact)
+                if contact is None:
+                    continue
+            yield contact
+
+    def items(self):
+        for contact in self.values():
+            yield contact.phone_number, contact
+
+
+def shard_of_phone(phone_number: str, shards: int) -> int:
+    """shard of normalized phone number in sharded dbase, crc32 is the same in all processes unlike hash()"""
+    return zlib.crc32(phone_number.encode('utf-8')) % shards
+
+
+def path_to_file_shard(path_to_file_dbase: pathlib.Path, num_shard: int) -> pathlib.Path:
+    return pathlib.Path(f'{path_to_file_dbase}.{num_shard:03d}')
+
 
+SHARDS_HEADER = b'#contact-book-shards;'
 
-def full_download_dbase(path_to_file_dbase=pathlib.Path(get_tuning_value('path_to_dbase')
-                                                        + os.sep + 'contact-book.dbase'),
-                        mark_print=None) -> tuple:
-    base_dict: dict = {}
+
+def read_shards_manifest(path_to_file_dbase: pathlib.Path) -> None | dict:
+    """manifest of sharded dbase which is kept in place of file dbase, None for dbase in one file"""
+    try:
+        with open(path_to_file_dbase, 'rb') as fb:
+            if fb.read(len(SHARDS_HEADER)) != SHARDS_HEADER:
+                return None
+            fb.readline()
+            return json.loads(fb.read())
+    except FileNotFoundError:
+        return None
+
+
+def write_shards_manifest(manifest: dict, path_to_file_dbase: pathlib.Path) -> None:
+    path_to_file_tmp = pathlib.Path(f'{path_to_file_dbase}.tmp')
+    with open(path_to_file_tmp, 'wb') as fb:
+        fb.write(SHARDS_HEADER + b'1\n')
+        fb.write(json.dumps(manifest, indent=4).encode('utf-8'))
+        fb.flush()
+        os.fsync(fb.fileno())
+    replace_file(path_to_file_tmp=path_to_file_tmp, path_to_file=path_to_file_dbase)
+
+
+def read_file_dbase(path_to_file_dbase: pathlib.Path,
+                    base_dict,
+                    contacts_store: str,
+                    mark_print: int,
+                    skip_bad_records=True) -> tuple:
+    """contacts of one file dbase or shard are put to base_dict, lazy store is created by header of file
+    when base_dict is None; returns base_dict and count of rows"""
+    columnar = contacts_store == 'columnar'
+    lazy = contacts_store == 'lazy'
+    cnt_rows: int = 0
+    num_row: int = 0
+    bad_rows: list = []
+    collided_rows: list = []  # rows of legacy numbers equal to previous ones after normalization
+    len_base_dict: int = 0 if base_dict is None else len(base_dict)
+    sep = get_tuning_value('sep_in_dbase')  # it's tuning
+    read_buffer_size: int = get_tuning_value('read_buffer_size')
+    version, encoding = None, None
+
+    size_fb = os.path.getsize(path_to_file_dbase)
+    step_mark = max(size_fb // (mark_print or 1), 1)
+    next_mark = step_mark
+    offset = 0
+    tail = b''
+    io_ns = 0
+    start = time.perf_counter_ns()
+
+    with open(path_to_file_dbase, 'rb', buffering=0) as fb:
+        while True:
+            start_io = time.perf_counter_ns()
+            chunk = fb.read(read_buffer_size)
+            io_ns += time.perf_counter_ns() - start_io
+            if not chunk:
+                block, tail = tail, b''
+            else:
+                offset += len(chunk)
+                end_of_rows = chunk.rfind(b'\n')
+                if end_of_rows < 0:
+                    tail += chunk
+                    continue
+                block, tail = tail + chunk[:end_of_rows], chunk[end_of_rows + 1:]
+
+            rows = block.split(b'\n')
+            if version is None:
+                version, encoding = parse_header_dbase(rows[0])
+                if lazy:
+                    if base_dict is None:
+                        base_dict = LazyContacts(version=version, encoding=encoding, sep=sep)
+                    sep_bytes = sep.encode(encoding)
+            escaped = version >= 2
+
+            for rec in rows:
+                num_row += 1
+                if not rec or rec[:1] == b'#':
+                    continue
+
+                try:
+                    if lazy:  # only phone number is parsed, other fields are parsed on access
+                        end_of_phone = rec.find(sep_bytes)
+                        if end_of_phone < 0:
+                            raise FileBaseCorrupted
+                        phone_number = rec[:end_of_phone].decode(encoding)
+                        if phone_number[:1] != '+':
+                            phone_number = normalize_phone_number(phone_number)
+                            if phone_number in base_dict:
+                                collided_rows.append(num_row)
+                        base_dict.put_raw(phone_number, rec)
+                        cnt_rows += 1
+                        continue
+
+                    if escaped:
+                        rec = verify_record_dbase(rec)
+                    phone_number, contact_name, date_time_creation = split_record_dbase(rec.decode(encoding),
+                                                                                        sep=sep,
+                                                                                        escaped=escaped)
+                    if phone_number[:1] != '+':  # numbers with '+' are validated as digits only, so canonical
+                        phone_number = normalize_phone_number(phone_number)
+                        if phone_number in base_dict:
+                            collided_rows.append(num_row)
+                    if columnar:
+                        base_dict.put(phone_number, contact_name,
+                                      datetime2epoch(parse_date_time_creation(date_time_creation)))
+                    else:
+                        base_dict[phone_number] = Contact(phone_number=phone_number,
+                                                          contact_name=contact_name,
+                                                          date_time_creation_contact=parse_date_time_creation(
+                                                              date_time_creation),
+                                                          validate=False)
+                except (FileBaseCorrupted, ValueError):  # UnicodeDecodeError is ValueError
+                    bad_rows.append(num_row)
+                    continue
+
+                cnt_rows += 1
+
+            if not chunk:
+                break
+
+            if mark_print and size_fb > read_buffer_size and offset >= next_mark:
+                print(f'download {cnt_rows} rows ({offset * 100 // size_fb}%)')
+                next_mark = (offset // step_mark + 1) * step_mark
+
+    METRICS.observe('load.io', io_ns)
+    METRICS.observe('load.parse', time.perf_counter_ns() - start - io_ns)
+    METRICS.inc('load.bad_rows', len(bad_rows))
+
+    if bad_rows:
+        message = (f'found {len(bad_rows)} bad rows in file {path_to_file_dbase}, '
+                   f'first of them: {", ".join(map(str, bad_rows[:10]))}')
+        if not skip_bad_records:
+            raise FileBaseCorrupted(message)
+        print(f'{message}; they are skipped')
+
+    # legacy numbers are normalized, so distinct rows of legacy file may be the same contact;
+    # they are counted by size of store, rows are known only when legacy number follows the same one
+    cnt_collisions = 0 if base_dict is None else cnt_rows - (len(base_dict) - len_base_dict)
+    METRICS.inc('load.collisions', cnt_collisions)
+    if cnt_collisions > 0:
+        message = (f'found {cnt_collisions} rows in file {path_to_file_dbase} with the same phone numbers '
+                   f'after normalization'
+                   + (f', first of them: {", ".join(map(str, collided_rows[:10]))}' if collided_rows else ''))
+        if not skip_bad_records:
+            raise FileBaseCorrupted(message)
+        print(f'{message}; only the last of them are kept')
+
+    return base_dict, cnt_rows
+
+
+def download_shard(path_to_file_shard: pathlib.Path, skip_bad_records=True) -> bytes:
+    """contacts of shard in worker of process pool, they are pickled here to be unpickled
+    by main process with paused collections"""
+    import pickle
+    contacts, cnt_rows = read_file_dbase(path_to_file_dbase=path_to_file_shard,
+                                         base_dict={},
+                                         contacts_store='dict',
+                                         mark_print=0,
+                                         skip_bad_records=skip_bad_records)
+    return pickle.dumps((contacts, cnt_rows), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+@decorator_metrics('load')
+def full_download_dbase(path_to_file_dbase=None,
+                        mark_print=None,
+                        skip_bad_records=True,
+                        contacts_store=None,
+                        processes=None) -> tuple:
+    """contacts of file dbase in dict, columnar or lazy store by tuning contacts_store,
+    shards of sharded dbase are loaded by process pool when processes > 1 and merged"""
+    if path_to_file_dbase is None:
+        path_to_file_dbase = get_path_to_file('contact-book.dbase')
+    if contacts_store is None:
+        contacts_store = get_tuning_value('contacts_store')
+    if processes is None:
+        processes = get_tuning_value('dbase_processes')
+    lazy = contacts_store == 'lazy'
+    base_dict = None if lazy else ColumnarContacts() if contacts_store == 'columnar' else {}
 
     try:
         if not pathlib.Path(path_to_file_dbase).exists():
@@ -451,25 +2160,43 @@ def full_download_dbase(path_to_file_dbase=pathlib.Path(get_tuning_value('path_t
         if not create_file_base(path_to_file_dbase=path_to_file_dbase):
             return tuple()
 
-    cnt_rows: int = 0
-    mask = Contact.mask_date_time_creation()
-
-    with open(path_to_file_dbase, 'r') as fb:
-        len_fb = sum(1 for _ in fb)
-        if mark_print is None:
-            mark_print = get_mark_print(len_fb)  # count rows in file
-
-    with open(path_to_file_dbase, 'r') as fb:
-        for rec in fb:
-            contact = rec.rstrip('\n').split(get_tuning_value('sep_in_dbase'))  # it's tuning
-            base_dict[contact[0]] = Contact(phone_number=contact[0],
-                                            contact_name=contact[1],
-                                            date_time_creation_contact=datetime.datetime.strptime(contact[2], mask),
-                                            validate=False)
+    if mark_print is None:
+        mark_print = get_tuning_value('num_of_lines')  # count of progress marks by size of file
 
-            cnt_rows += 1
-            if (len_fb // mark_print) >= 2 and cnt_rows % mark_print == 0:
-                print(f'download {cnt_rows} rows')
+    cnt_rows: int = 0
+    manifest = read_shards_manifest(path_to_file_dbase=path_to_file_dbase)
+    if manifest is None:
+        base_dict, cnt_rows = read_file_dbase(path_to_file_dbase=path_to_file_dbase,
+                                              base_dict=base_dict,
+                                              contacts_store=contacts_store,
+                                              mark_print=mark_print,
+                                              skip_bad_records=skip_bad_records)
+    else:
+        paths_to_file_shard = [path_to_file_shard(path_to_file_dbase=path_to_file_dbase, num_shard=num_shard)
+                               for num_shard in range(len(manifest['shards']))]
+        executor = None if lazy else create_process_pool(processes=min(processes, len(paths_to_file_shard)))
+        try:
+            if executor is None:
+                for path_to_file in paths_to_file_shard:
+                    base_dict, cnt_shard_rows = read_file_dbase(path_to_file_dbase=path_to_file,
+                                                                base_dict=base_dict,
+                                                                contacts_store=contacts_store,
+                                                                mark_print=0,
+                                                                skip_bad_records=skip_bad_records)
+                    cnt_rows += cnt_shard_rows
+            else:
+                import pickle
+                for data in executor.map(functools.partial(download_shard, skip_bad_records=skip_bad_records),
+                                         paths_to_file_shard):
+                    with gc_paused():
+                        contacts, cnt_shard_rows = pickle.loads(data)
+                        base_dict.update(contacts)
+                    cnt_rows += cnt_shard_rows
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    METRICS.gauge('load.rows', cnt_rows)
 
     if cnt_rows > 0:
         print(f'total download {cnt_rows} rows')
@@ -477,79 +2204,1992 @@ def full_download_dbase(path_to_file_dbase=pathlib.Path(get_tuning_value('path_t
     return base_dict, path_to_file_dbase
 
 
-def create_cash_names(dict_contacts: dict) -> dict:
-    names_dict: dict = {}
-
-    for contact in dict_contacts.values():
-        part_of_contact_name = ''
-        for i in contact.contact_name:
-            part_of_contact_name += i.upper()
-            if names_dict.get(part_of_contact_name):
-                names_dict[part_of_contact_name] = names_dict[part_of_contact_name] + (contact,)
+@decorator_metrics('lookup.scan')
+def scan_dbase_for_phone(path_to_file_dbase: pathlib.Path,
+                         phone_number: str) -> None | Contact:
+    """contact by phone number from streaming scan of file dbase and its journal without load of all contacts,
+    lines are searched by national part of phone number, so legacy not normalized numbers are found too;
+    only one shard of sharded dbase is scanned"""
+    phone_number = normalize_phone_number(phone_number)
+    path_to_file_dbase = pathlib.Path(path_to_file_dbase)
+    if not phone_number or not path_to_file_dbase.exists():
+        return None
+
+    manifest = read_shards_manifest(path_to_file_dbase=path_to_file_dbase)
+    path_to_file_scan = path_to_file_dbase if manifest is None else path_to_file_shard(
+        path_to_file_dbase=path_to_file_dbase, num_shard=shard_of_phone(phone_number, len(manifest['shards'])))
+
+    sep = get_tuning_value('sep_in_dbase')
+    read_buffer_size: int = get_tuning_value('read_buffer_size')
+    version, encoding, needle, sep_bytes = None, None, None, None
+    found_rec = None
+    tail = b''
+
+    with open(path_to_file_scan, 'rb', buffering=0) as fb:
+        while True:
+            chunk = fb.read(read_buffer_size)
+            if not chunk:
+                block, tail = tail, b''
             else:
-                names_dict[part_of_contact_name] = (contact,)
-    return names_dict
+                end_of_rows = chunk.rfind(b'\n')
+                if end_of_rows < 0:
+                    tail += chunk
+                    continue
+                block, tail = tail + chunk[:end_of_rows], chunk[end_of_rows + 1:]
+
+            if version is None:
+                version, encoding = parse_header_dbase(block.partition(b'\n')[0])
+                sep_bytes = sep.encode(encoding)
+                needle = phone_number[-get_tuning_value('phone_national_length'):].encode(encoding) + sep_bytes
+
+            position = block.find(needle)
+            while position >= 0:
+                start = block.rfind(b'\n', 0, position) + 1
+                end = block.find(b'\n', position)
+                end = len(block) if end < 0 else end
+                rec = block[start:end]
+                if (rec[:1] != b'#' and normalize_phone_number(
+                        rec[:rec.find(sep_bytes)].decode(encoding, errors='replace')) == phone_number):
+                    found_rec = rec  # the last record of phone number wins as in full load
+                position = block.find(needle, end)
+
+            if not chunk:
+                break
+
+    contacts: dict = {}
+    if found_rec is not None:
+        try:
+            if version >= 2:
+                found_rec = verify_record_dbase(found_rec)
+            _, contact_name, date_time_creation = split_record_dbase(found_rec.decode(encoding),
+                                                                     sep=sep,
+                                                                     escaped=version >= 2)
+            contacts[phone_number] = Contact(phone_number=phone_number,
+                                             contact_name=contact_name,
+                                             date_time_creation_contact=parse_date_time_creation(date_time_creation),
+                                             validate=False)
+        except (FileBaseCorrupted, ValueError):
+            print(f'found bad row of contact {phone_number} in file dbase; it is skipped')
+
+    DBaseJournal.for_dbase(path_to_file_dbase=path_to_file_dbase).replay(dict_contacts=contacts,
+                                                                         phone_numbers={phone_number})
+    return contacts.get(phone_number)
+
+
+def write_file_dbase(contacts,
+                     path_to_file_dbase: pathlib.Path,
+                     mark_print: int) -> dict:
+    """write contacts to temporary file and atomic replace file dbase or shard by it,
+    returns count of rows, size and crc32 of written file; progress is printed by every mark_print rows"""
+    cnt_rows: int = 0
+    version: int = get_tuning_value('version_dbase')
+    encoding: str = get_tuning_value('encoding_dbase')
+    path_to_file_tmp = pathlib.Path(f'{path_to_file_dbase}.tmp')
+
+    try:
+        with open(path_to_file_tmp, 'wb') as fb:
+            rec = header_dbase(version=version, encoding=encoding)
+            fb.write(rec)
+            crc32 = zlib.crc32(rec)
+            for contact in contacts:
+                rec = checksum_record_dbase(contact.format_to_dbase, encoding=encoding)
+                fb.write(rec)
+                crc32 = zlib.crc32(rec, crc32)
+                cnt_rows += 1
+                if mark_print and cnt_rows % mark_print == 0:
+                    print(f'upload {cnt_rows} rows...')
+
+            fb.flush()
+            os.fsync(fb.fileno())
+            size = fb.tell()
+    except OSError:
+        if path_to_file_tmp.exists():
+            path_to_file_tmp.unlink()
+        raise FileBaseNotCreated
+
+    replace_file(path_to_file_tmp=path_to_file_tmp, path_to_file=path_to_file_dbase)
+    return {'rows': cnt_rows, 'size': size, 'crc32': crc32}
+
+
+def upload_shard(job: tuple) -> dict:
+    """write contacts of shard in worker of process pool, job is path to shard file and its contacts"""
+    path_to_file, contacts = job
+    return write_file_dbase(contacts=contacts, path_to_file_dbase=path_to_file, mark_print=0)
 
 
 # @decorator_args_kwargs
+@decorator_metrics('save.full')
 def full_upload_dbase(dbase_dict: dict,
                       path_to_file_dbase: pathlib.Path,
-                      mark_print=None) -> None:
-    try:
-        if not pathlib.Path(path_to_file_dbase).exists():
-            raise FileBaseNotFound
-    except FileBaseNotFound:
-        if not create_file_base(path_to_file_dbase=path_to_file_dbase):
-            raise FileBaseNotCreated
+                      mark_print=None,
+                      shards=None,
+                      changed_phone_numbers=None,
+                      processes=None) -> None:
+    """write all contacts to file dbase, or to shards by tuning dbase_shards and manifest of them in place
+    of file dbase; when number of shards is not changed, only shards of changed_phone_numbers are rewritten,
+    they are written by process pool when processes > 1"""
+    if shards is None:
+        shards = get_tuning_value('dbase_shards')
+    if processes is None:
+        processes = get_tuning_value('dbase_processes')
+    manifest = read_shards_manifest(path_to_file_dbase=path_to_file_dbase)
+    old_shards = 0 if manifest is None else len(manifest['shards'])
+
+    if shards <= 0:
+        if mark_print is None:
+            mark_print = max(len(dbase_dict) // get_tuning_value('num_of_lines'), 1)  # progress by every 10%
+        if len(dbase_dict) // mark_print < 2:
+            mark_print = 0
+        cnt_rows = write_file_dbase(contacts=dbase_dict.values(),
+                                    path_to_file_dbase=path_to_file_dbase,
+                                    mark_print=mark_print)['rows']
+    else:
+        if old_shards != shards or changed_phone_numbers is None:
+            entries = [None] * shards
+            dirty_shards = range(shards)
+        else:
+            entries = manifest['shards']
+            dirty_shards = sorted({shard_of_phone(phone_number, shards) for phone_number in changed_phone_numbers})
+
+        parts: dict = {num_shard: [] for num_shard in dirty_shards}
+        for phone_number, contact in dbase_dict.items():
+            part = parts.get(shard_of_phone(phone_number, shards))
+            if part is not None:
+                part.append(contact)
+        jobs = [(path_to_file_shard(path_to_file_dbase=path_to_file_dbase, num_shard=num_shard), part)
+                for num_shard, part in parts.items()]
+
+        executor = create_process_pool(processes=min(processes, len(jobs)))
+        try:
+            results = map(upload_shard, jobs) if executor is None else executor.map(upload_shard, jobs)
+            for num_shard, entry in zip(parts, results):
+                entries[num_shard] = entry
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
-    cnt_rows: int = 0
-    len_dbase_dict: int = len(dbase_dict)
+        write_shards_manifest(manifest={'shards': entries}, path_to_file_dbase=path_to_file_dbase)
+        cnt_rows = sum(entries[num_shard]['rows'] for num_shard in parts)
+        METRICS.gauge('save.dirty_shards', len(parts))
+        print(f'total rewritten {len(parts)} of {shards} shards')
 
-    if mark_print is None:
-        mark_print = get_mark_print(len_obj=len_dbase_dict)
+    for num_shard in range(max(shards, 0), old_shards):  # shards of previous layout
+        path_to_file_shard(path_to_file_dbase=path_to_file_dbase, num_shard=num_shard).unlink(missing_ok=True)
+
+    if cnt_rows > 0:
+        print(f'total upload {cnt_rows} rows...')
+
+
+class DBaseJournal(object):
+    """append-only journal of changes of contact book, replayed on top of file dbase"""
+    operation_add = 'A'
+    operation_edit = 'E'
+    operation_delete = 'D'
+
+    __slots__ = ('__path_to_file_journal',
+                 '__encoding',
+                 '__pending',
+                 '__count_records',
+                 '__size')
+
+    def __init__(self, path_to_file_journal: pathlib.Path):
+        self.__path_to_file_journal = pathlib.Path(path_to_file_journal)
+        self.__encoding = get_tuning_value('encoding_dbase')
+        self.__pending: list = []
+        self.__count_records: int = 0
+        self.__size: int = 0
+
+    @classmethod
+    def for_dbase(cls, path_to_file_dbase: pathlib.Path):
+        return cls(path_to_file_journal=pathlib.Path(path_to_file_dbase).with_suffix('.journal'))
+
+    @property
+    def path_to_file_journal(self) -> pathlib.Path:
+        return self.__path_to_file_journal
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    @property
+    def count_records(self) -> int:
+        return self.__count_records
 
-    with open(path_to_file_dbase, 'w') as fb:
-        for _, contact in dbase_dict.items():
-            fb.write(f'{contact.format_to_dbase}\n')
+    @property
+    def size(self) -> int:
+        """size of journal file which is read or written by this process"""
+        return self.__size
+
+    def __append(self, rec: str) -> None:
+        self.__pending.append(checksum_record_dbase(rec, encoding=self.__encoding))
+
+    def add(self, contact: Contact) -> None:
+        self.__append(f'{DBaseJournal.operation_add};{contact.format_to_dbase}')
+
+    def edit(self, contact: Contact) -> None:
+        self.__append(f'{DBaseJournal.operation_edit};{contact.format_to_dbase}')
+
+    def delete(self, contact: Contact) -> None:
+        self.__append(f'{DBaseJournal.operation_delete};{contact.phone_number}')
+
+    def discard(self) -> None:
+        self.__pending.clear()
+
+    def flush(self) -> int:
+        """write pending records by one batch and fsync journal; caller holds exclusive lock and has read
+        journal to the end, so bytes after size are torn record of crashed writer and they are cut"""
+        cnt_rows = len(self.__pending)
+        if not cnt_rows:
+            return 0
+
+        with open(self.__path_to_file_journal, 'ab') as fj:
+            if fj.tell() > self.__size:
+                fj.truncate(self.__size)
+            fj.write(b''.join(self.__pending))
+            fj.flush()
+            os.fsync(fj.fileno())
+            self.__size = fj.tell()
+
+        self.__count_records += cnt_rows
+        self.__pending.clear()
+        return cnt_rows
+
+    def __parse(self, rec: bytes, sep: str, phone_numbers: set = None) -> tuple:
+        """operation, phone number and contact (None when it is removed or not in phone_numbers) of record"""
+        operation, _, rec = verify_record_dbase(rec).decode(self.__encoding).partition(sep)
+        if operation == DBaseJournal.operation_delete:
+            return operation, normalize_phone_number(rec), None
+
+        if operation in (DBaseJournal.operation_add, DBaseJournal.operation_edit):
+            phone_number, contact_name, date_time_creation = split_record_dbase(rec, sep=sep)
+            phone_number = normalize_phone_number(phone_number)
+            if phone_numbers is not None and phone_number not in phone_numbers:
+                return operation, phone_number, None
+            return operation, phone_number, Contact(phone_number=phone_number,
+                                                    contact_name=contact_name,
+                                                    date_time_creation_contact=parse_date_time_creation(
+                                                        date_time_creation),
+                                                    validate=False)
+        raise FileBaseCorrupted
+
+    def records(self, offset: int = 0, phone_numbers: set = None):
+        """records (operation, phone number, contact) of journal file from offset,
+        size of journal is moved to the end of the last complete record"""
+        if not self.__path_to_file_journal.exists():
+            return
+
+        bad_rows: int = 0
+        sep = get_tuning_value('sep_in_dbase')
+        with open(self.__path_to_file_journal, 'rb') as fj:
+            fj.seek(offset)
+            for rec in fj:
+                if not rec.endswith(b'\n'):
+                    break  # record was not written completely
+
+                offset += len(rec)
+                try:
+                    record = self.__parse(rec[:-1], sep=sep, phone_numbers=phone_numbers)
+                except (FileBaseCorrupted, ValueError):
+                    bad_rows += 1
+                    continue
+
+                self.__count_records += 1
+                yield record
+
+        self.__size = offset
+        if bad_rows > 0:
+            print(f'found {bad_rows} bad records in journal {self.__path_to_file_journal}; they are skipped')
+
+    def phone_numbers(self) -> set:
+        """phone numbers of records of journal file, they are changed since last rewrite of file dbase"""
+        phone_numbers: set = set()
+        if not self.__path_to_file_journal.exists():
+            return phone_numbers
+
+        sep = get_tuning_value('sep_in_dbase')
+        with open(self.__path_to_file_journal, 'rb') as fj:
+            for rec in fj:
+                try:
+                    _, _, rec = verify_record_dbase(rec.rstrip(b'\n')).decode(self.__encoding).partition(sep)
+                except (FileBaseCorrupted, ValueError):
+                    continue
+                phone_numbers.add(normalize_phone_number(rec.partition(sep)[0]))
+        return phone_numbers
+
+    def pending_records(self):
+        """records (operation, phone number, contact) which are not flushed yet"""
+        sep = get_tuning_value('sep_in_dbase')
+        for rec in self.__pending:
+            yield self.__parse(rec[:-1], sep=sep)
+
+    def replay(self, dict_contacts: dict, phone_numbers: set = None) -> int:
+        """apply records of journal to dict of contacts, only records of phone_numbers when they are given"""
+        cnt_rows: int = 0
+        self.__count_records = 0
+        for operation, phone_number, contact in self.records(phone_numbers=phone_numbers):
+            if phone_numbers is not None and phone_number not in phone_numbers:
+                continue
+            if contact is None:
+                dict_contacts.pop(phone_number, None)
+            else:
+                dict_contacts[phone_number] = contact
             cnt_rows += 1
-            if (len_dbase_dict // mark_print) >= 2 and cnt_rows % mark_print == 0:
-                print(f'upload {cnt_rows} rows...')
 
+        if cnt_rows > 0:
+            print(f'total replay {cnt_rows} changes from journal')
+
+        return cnt_rows
+
+    def need_compaction(self, len_dbase: int) -> bool:
+        return (self.__size >= get_tuning_value('journal_compact_size')
+                or self.__count_records > get_tuning_value('journal_compact_ratio') * len_dbase)
+
+    def seek(self, size: int, count_records: int) -> None:
+        """records of journal up to size are already applied, e.g. they are in snapshot"""
+        self.__size = size
+        self.__count_records = count_records
+
+    def truncate(self) -> None:
+        with open(self.__path_to_file_journal, 'w'):
+            pass
+        self.__size = 0
+        self.__count_records = 0
+
+
+@decorator_metrics('save')
+def save_dbase(dbase_dict: dict,
+               path_to_file_dbase: pathlib.Path,
+               journal: DBaseJournal) -> None:
+    """save changes to journal, rewrite file dbase only when journal is too big or number of shards
+    is changed by tuning dbase_shards; only shards changed by records of journal are rewritten"""
+    cnt_rows = journal.flush()
     if cnt_rows > 0:
-        print(f'total upload {cnt_rows} rows...')
+        print(f'total saved {cnt_rows} changes...')
+
+    shards = get_tuning_value('dbase_shards')
+    manifest = read_shards_manifest(path_to_file_dbase=path_to_file_dbase)
+    if journal.need_compaction(len_dbase=len(dbase_dict)) or (0 if manifest is None
+                                                              else len(manifest['shards'])) != shards:
+        full_upload_dbase(dbase_dict=dbase_dict,
+                          path_to_file_dbase=path_to_file_dbase,
+                          shards=shards,
+                          changed_phone_numbers=journal.phone_numbers() if shards > 0 else None)
+        journal.truncate()
+
+
+class DBaseSnapshot(object):
+    """parsed contacts and built indexes of file dbase with applied part of its journal, pickled to file
+    next to dbase; it is valid while file dbase has the same size, time of modification and blake2b hash
+    and journal begins with the same records, so start of application skips parse and build of indexes"""
+    magic = b'CBOOKSNP'
+    version = 3
+    header = struct.Struct('<8sII')  # magic, version, size of json key
+
+    __slots__ = ('__path_to_file_dbase',
+                 '__path_to_file_journal',
+                 '__path_to_file_snapshot')
+
+    def __init__(self, path_to_file_dbase: pathlib.Path):
+        self.__path_to_file_dbase = pathlib.Path(path_to_file_dbase)
+        self.__path_to_file_journal = self.__path_to_file_dbase.with_suffix('.journal')
+        self.__path_to_file_snapshot = self.__path_to_file_dbase.with_suffix('.snapshot')
+
+    @property
+    def path_to_file_snapshot(self) -> pathlib.Path:
+        return self.__path_to_file_snapshot
+
+    @staticmethod
+    def digest(path_to_file: pathlib.Path, size: int) -> str:
+        """blake2b hash of first size bytes of file, hashlib is imported on demand for fast start"""
+        import hashlib
+        digest = hashlib.blake2b()
+        read_buffer_size: int = get_tuning_value('read_buffer_size')
+        with open(path_to_file, 'rb', buffering=0) as fb:
+            while size > 0:
+                chunk = fb.read(min(size, read_buffer_size))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size -= len(chunk)
+        return digest.hexdigest()
+
+    def __valid(self, key: dict) -> bool:
+        """key of snapshot is compared with files by sizes and times first, hashes are computed only then"""
+        version_dbase = stat_file(self.__path_to_file_dbase)
+        version_journal = stat_file(self.__path_to_file_journal)
+        size_journal = 0 if version_journal is None else version_journal[1]
+        return (version_dbase is not None
+                and key['contacts_store'] == get_tuning_value('contacts_store')
+                and key['dbase_size'] == version_dbase[1]
+                and key['dbase_mtime_ns'] == version_dbase[2]
+                and key['journal_size'] <= size_journal
+                and key['dbase_hash'] == self.digest(self.__path_to_file_dbase, key['dbase_size'])
+                and (key['journal_size'] == 0
+                     or key['journal_hash'] == self.digest(self.__path_to_file_journal, key['journal_size'])))
+
+    @decorator_metrics('snapshot.load')
+    def load(self) -> None | tuple:
+        """key and state (contacts and indexes by names) of snapshot, None when it is absent or stale"""
+        import pickle
+        try:
+            with open(self.__path_to_file_snapshot, 'rb') as fs:
+                magic, version, size_key = DBaseSnapshot.header.unpack(fs.read(DBaseSnapshot.header.size))
+                if magic != DBaseSnapshot.magic:
+                    raise FileBaseCorrupted
+                key = json.loads(fs.read(size_key))
+                if version != DBaseSnapshot.version or not self.__valid(key):
+                    METRICS.inc('snapshot.miss')
+                    return None
+
+                with gc_paused():
+                    state = pickle.load(fs)
+        except FileNotFoundError:
+            METRICS.inc('snapshot.miss')
+            return None
+        except Exception:  # snapshot is only cache, any damage of it is the same as its absence
+            METRICS.inc('snapshot.miss')
+            print(f'snapshot {self.__path_to_file_snapshot} is damaged; it is rebuilt')
+            return None
+
+        METRICS.inc('snapshot.hit')
+        return key, state
+
+    @decorator_metrics('snapshot.save')
+    def save(self, state: dict, journal_size: int, journal_records: int) -> None | dict:
+        """write snapshot of state which is file dbase with journal up to journal_size, returns key of it"""
+        import pickle
+        version_dbase = stat_file(self.__path_to_file_dbase)
+        key = {'contacts_store': get_tuning_value('contacts_store'),
+               'dbase_size': version_dbase[1],
+               'dbase_mtime_ns': version_dbase[2],
+               'dbase_hash': self.digest(self.__path_to_file_dbase, version_dbase[1]),
+               'journal_size': journal_size,
+               'journal_records': journal_records,
+               'journal_hash': self.digest(self.__path_to_file_journal, journal_size) if journal_size else '',
+               'indexes': sorted(name for name, index in state.items() if name != 'contacts' and index is not None)}
+        bytes_key = json.dumps(key).encode('utf-8')
+        path_to_file_tmp = pathlib.Path(f'{self.__path_to_file_snapshot}.{os.getpid()}.tmp')  # readers may write it too
 
+        try:
+            with open(path_to_file_tmp, 'wb') as fs:
+                fs.write(DBaseSnapshot.header.pack(DBaseSnapshot.magic, DBaseSnapshot.version, len(bytes_key)))
+                fs.write(bytes_key)
+                pickle.dump(state, fs, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path_to_file_tmp, self.__path_to_file_snapshot)
+        except OSError as error:
+            if path_to_file_tmp.exists():
+                path_to_file_tmp.unlink()
+            print(f'snapshot {self.__path_to_file_snapshot} is not written: {error}')
+            return None
+
+        return key
+
+
+class BinaryDBase(collections.abc.Mapping):
+    """read-only memory-mapped binary dbase: header, fixed-size records, sorted phone index and string heap"""
+    magic = b'CBOOKBIN'
+    version = 1
+    header = struct.Struct('<8sIIQQQ')  # magic, version, count, offset of records, index and heap
+    record = struct.Struct('<IIIIq')  # offset and size of phone and name in heap, creation in epoch seconds
+    index_item = struct.Struct('<I')
+
+    def __init__(self, path_to_file_binary: pathlib.Path):
+        self.__path_to_file_binary = pathlib.Path(path_to_file_binary)
+
+        with open(self.__path_to_file_binary, 'rb') as fb:
+            self.__mm = mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ)
 
-def full_backup_dbase(dbase_dict: dict,
-                      path_to_file_dbase=pathlib.Path(get_tuning_value('path_to_dbase')
-                                                      + os.sep + 'contact-book.backup'),
-                      mark_print=None) -> pathlib.Path:
+        try:
+            (magic, version, self.__count,
+             self.__offset_records, self.__offset_index, self.__offset_heap) = BinaryDBase.header.unpack_from(self.__mm)
+        except struct.error:
+            self.__mm.close()
+            raise FileBaseCorrupted(f'file {path_to_file_binary} is not binary dbase')
+
+        if magic != BinaryDBase.magic:
+            self.__mm.close()
+            raise FileBaseCorrupted(f'file {path_to_file_binary} is not binary dbase')
+        if version > BinaryDBase.version:
+            self.__mm.close()
+            raise FileBaseVersionNotSupported(f'version {version} of binary dbase is not supported')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.__mm.close()
+
+    @property
+    def path_to_file_binary(self) -> pathlib.Path:
+        return self.__path_to_file_binary
+
+    def __len__(self):
+        return self.__count
+
+    def __record(self, num_record: int) -> tuple:
+        return BinaryDBase.record.unpack_from(self.__mm, self.__offset_records + num_record * BinaryDBase.record.size)
+
+    def __phone_number(self, num_record: int) -> bytes:
+        phone_offset, phone_size, *_ = self.__record(num_record)
+        phone_offset += self.__offset_heap
+        return self.__mm[phone_offset:phone_offset + phone_size]
+
+    def __contact(self, num_record: int) -> Contact:
+        phone_offset, phone_size, name_offset, name_size, creation = self.__record(num_record)
+        heap = self.__offset_heap
+        return Contact(phone_number=self.__mm[heap + phone_offset:heap + phone_offset + phone_size].decode('utf-8'),
+                       contact_name=self.__mm[heap + name_offset:heap + name_offset + name_size].decode('utf-8'),
+                       date_time_creation_contact=epoch2datetime(creation),
+                       validate=False)
+
+    def __find(self, phone_number: bytes) -> int:
+        """binary search of record by sorted phone index"""
+        low, high = 0, self.__count
+        while low < high:
+            middle = (low + high) // 2
+            num_record, = BinaryDBase.index_item.unpack_from(self.__mm,
+                                                             self.__offset_index + middle * BinaryDBase.index_item.size)
+            if self.__phone_number(num_record) < phone_number:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.__count:
+            num_record, = BinaryDBase.index_item.unpack_from(self.__mm,
+                                                             self.__offset_index + low * BinaryDBase.index_item.size)
+            if self.__phone_number(num_record) == phone_number:
+                return num_record
+        return -1
+
+    def __getitem__(self, phone_number: str) -> Contact:
+        num_record = self.__find(phone_number.encode('utf-8'))
+        if num_record < 0:
+            raise KeyError(phone_number)
+        return self.__contact(num_record)
+
+    def __contains__(self, phone_number):
+        return self.__find(phone_number.encode('utf-8')) >= 0
+
+    def __iter__(self):
+        for num_record in range(self.__count):
+            yield self.__phone_number(num_record).decode('utf-8')
+
+    def values(self):
+        for num_record in range(self.__count):
+            yield self.__contact(num_record)
+
+    def items(self):
+        for contact in self.values():
+            yield contact.phone_number, contact
+
+
+def write_binary_dbase(dbase_dict: dict, path_to_file_binary: pathlib.Path) -> pathlib.Path:
+    """write contacts to binary dbase with atomic replace of file"""
+    heap = bytearray()
+    records = bytearray()
+    phones: list = []
+
+    for contact in dbase_dict.values():
+        phone_number = contact.phone_number.encode('utf-8')
+        contact_name = contact.contact_name.encode('utf-8')
+        phones.append(phone_number)
+        records += BinaryDBase.record.pack(len(heap), len(phone_number),
+                                           len(heap) + len(phone_number), len(contact_name),
+                                           datetime2epoch(contact.date_time_creation_contact))
+        heap += phone_number
+        heap += contact_name
+
+    index = bytearray()
+    for num_record in sorted(range(len(phones)), key=phones.__getitem__):
+        index += BinaryDBase.index_item.pack(num_record)
+
+    offset_records = BinaryDBase.header.size
+    offset_index = offset_records + len(records)
+    offset_heap = offset_index + len(index)
+
+    path_to_file_tmp = pathlib.Path(f'{path_to_file_binary}.tmp')
+    with open(path_to_file_tmp, 'wb') as fb:
+        fb.write(BinaryDBase.header.pack(BinaryDBase.magic, BinaryDBase.version, len(phones),
+                                         offset_records, offset_index, offset_heap))
+        fb.write(records)
+        fb.write(index)
+        fb.write(heap)
+        fb.flush()
+        os.fsync(fb.fileno())
+
+    replace_file(path_to_file_tmp=path_to_file_tmp, path_to_file=path_to_file_binary)
+    return pathlib.Path(path_to_file_binary)
+
+
+def convert_text_to_binary(path_to_file_dbase: pathlib.Path,
+                           path_to_file_binary: pathlib.Path = None) -> pathlib.Path:
+    """convert text file dbase (with its journal) to binary dbase"""
+    if path_to_file_binary is None:
+        path_to_file_binary = pathlib.Path(path_to_file_dbase).with_suffix('.dbin')
+
+    contacts, _ = full_download_dbase(path_to_file_dbase=path_to_file_dbase)
+    DBaseJournal.for_dbase(path_to_file_dbase=path_to_file_dbase).replay(dict_contacts=contacts)
+
+    return write_binary_dbase(dbase_dict=contacts, path_to_file_binary=path_to_file_binary)
+
+
+def convert_binary_to_text(path_to_file_binary: pathlib.Path,
+                           path_to_file_dbase: pathlib.Path = None) -> pathlib.Path:
+    """convert binary dbase to text file dbase"""
+    if path_to_file_dbase is None:
+        path_to_file_dbase = pathlib.Path(path_to_file_binary).with_suffix('.dbase')
+
+    with BinaryDBase(path_to_file_binary=path_to_file_binary) as binary_dbase:
+        full_upload_dbase(dbase_dict=binary_dbase, path_to_file_dbase=path_to_file_dbase)
+
+    return pathlib.Path(path_to_file_dbase)
+
+
+BACKUP_COMPRESSIONS = {None: '',
+                       'gzip': '.gz',
+                       'lzma': '.xz'}
+
+
+def open_backup(path_to_file_backup: pathlib.Path, mode: str, compression: str = None):
+    """text stream of backup file, compressed by gzip or lzma"""
+    match compression:
+        case None:
+            return open(path_to_file_backup, mode, encoding='utf-8')
+        case 'gzip':
+            return gzip.open(path_to_file_backup, f'{mode}t', encoding='utf-8')
+        case 'lzma':
+            return lzma.open(path_to_file_backup, f'{mode}t', encoding='utf-8')
+        case _:
+            raise ValueError(f'unknown compression of backup: {compression}')
+
+
+def read_backup_manifest(path_to_file_manifest: pathlib.Path) -> None | dict:
+    """manifest of last backups: chain of backup files and checksums of contacts"""
     try:
-        if not pathlib.Path(path_to_file_dbase).exists():
-            raise FileBaseNotFound
-    except FileBaseNotFound:
-        if not create_file_base(path_to_file_dbase=path_to_file_dbase):
-            raise FileBaseNotCreated
+        with open(path_to_file_manifest, 'r', encoding='utf-8') as fm:
+            return json.load(fm)
+    except (OSError, ValueError):
+        return None
+
+
+def write_backup_manifest(manifest: dict, path_to_file_manifest: pathlib.Path) -> None:
+    path_to_file_tmp = pathlib.Path(f'{path_to_file_manifest}.tmp')
+    with open(path_to_file_tmp, 'w', encoding='utf-8') as fm:
+        json.dump(manifest, fm)
+        fm.flush()
+        os.fsync(fm.fileno())
+
+    replace_file(path_to_file_tmp=path_to_file_tmp, path_to_file=path_to_file_manifest)
+
+
+def backup_records(contacts, last_checksums: None | dict, checksums: dict):
+    """json records of contacts changed since last backup and of removed contacts,
+    checksums of all contacts are put to checksums"""
+    for contact in contacts:
+        phone_number = contact.phone_number
+        checksum = zlib.crc32(contact.format_to_dbase.encode('utf-8'))
+        checksums[phone_number] = checksum
+
+        if last_checksums is None or last_checksums.get(phone_number) != checksum:
+            yield f'{json.dumps(phone_number)}: {json.dumps(contact.dict[phone_number])}'
+
+    if last_checksums is not None:
+        for phone_number in last_checksums.keys() - checksums.keys():  # removed contacts
+            yield f'{json.dumps(phone_number)}: null'
+
 
-    dict2json = {}
+def backup_shard(job: tuple) -> tuple:
+    """json records and checksums of contacts of shard in worker of process pool,
+    job is contacts of shard and checksums of last backup of the same shard"""
+    contacts, last_checksums = job
+    checksums: dict = {}
+    return list(backup_records(contacts=contacts, last_checksums=last_checksums, checksums=checksums)), checksums
 
+
+@decorator_metrics('backup')
+def full_backup_dbase(dbase_dict: dict,
+                      path_to_file_dbase=None,
+                      mark_print=None,
+                      compression=None,
+                      differential=False,
+                      processes=None) -> pathlib.Path:
+    """stream contacts to json backup, differential backup has only contacts changed since last backup;
+    records of shards of contacts are prepared by process pool when processes > 1"""
+    path_to_file_dbase = (get_path_to_file('contact-book.backup') if path_to_file_dbase is None
+                          else pathlib.Path(path_to_file_dbase))
+    path_to_file_manifest = pathlib.Path(f'{path_to_file_dbase}.manifest')
+
+    if compression is None:
+        compression = get_tuning_value('backup_compression')
+
+    manifest = read_backup_manifest(path_to_file_manifest=path_to_file_manifest) if differential else None
+    if manifest is None:
+        path_to_file_backup = pathlib.Path(f'{path_to_file_dbase}{BACKUP_COMPRESSIONS[compression]}')
+        manifest = {'backups': [], 'checksums': {}}
+        last_checksums = None
+    else:
+        path_to_file_backup = pathlib.Path(f'{path_to_file_dbase}.{datetime.datetime.now():%Y%m%d%H%M%S%f}.diff'
+                                           f'{BACKUP_COMPRESSIONS[compression]}')
+        last_checksums = manifest['checksums']
+
+    checksums: dict = {}
     cnt_rows = 0
     len_dbase_dict = len(dbase_dict)
     if mark_print is None:
-        mark_print = get_mark_print(len_obj=len_dbase_dict)
-
-    for _, contact in dbase_dict.items():
-        dict2json = {**dict2json, **contact.dict}
-        cnt_rows += 1
-        if (len_dbase_dict // mark_print) >= 2 and cnt_rows % mark_print == 0:
-            print(f'prepared {cnt_rows} rows...')
+        mark_print = max(len_dbase_dict // get_tuning_value('num_of_lines'), 1)  # progress by every 10%
+    if processes is None:
+        processes = get_tuning_value('dbase_processes')
+
+    executor = create_process_pool(processes=processes)
+    if executor is None:
+        results = ((backup_records(contacts=dbase_dict.values(), last_checksums=last_checksums, checksums=checksums),
+                    {}),)
+    else:
+        shards = get_tuning_value('dbase_shards') or processes
+        jobs = [([], None if last_checksums is None else {}) for _ in range(shards)]
+        for phone_number, contact in dbase_dict.items():
+            jobs[shard_of_phone(phone_number, shards)][0].append(contact)
+        for phone_number, checksum in (last_checksums or {}).items():
+            jobs[shard_of_phone(phone_number, shards)][1][phone_number] = checksum
+        results = executor.map(backup_shard, jobs)
+
+    path_to_file_tmp = pathlib.Path(f'{path_to_file_backup}.tmp')
+    try:
+        with open_backup(path_to_file_backup=path_to_file_tmp, mode='w', compression=compression) as fb:
+            sep = '{'
+            for records, shard_checksums in results:
+                checksums.update(shard_checksums)
+                for rec in records:
+                    fb.write(f'{sep}\n    {rec}')
+                    sep = ','
+                    cnt_rows += 1
+                    if (len_dbase_dict // mark_print) >= 2 and cnt_rows % mark_print == 0:
+                        print(f'prepared {cnt_rows} rows...')
+
+            fb.write('{\n}\n' if sep == '{' else '\n}\n')
+
+        with open(path_to_file_tmp, 'rb+') as fb:
+            os.fsync(fb.fileno())
+    except OSError:
+        if path_to_file_tmp.exists():
+            path_to_file_tmp.unlink()
+        raise FileBaseNotCreated
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    replace_file(path_to_file_tmp=path_to_file_tmp, path_to_file=path_to_file_backup)
+
+    manifest['backups'].append(path_to_file_backup.name)
+    manifest['checksums'] = checksums
+    write_backup_manifest(manifest=manifest, path_to_file_manifest=path_to_file_manifest)
 
     if cnt_rows > 0:
         print(f'total prepared {cnt_rows} rows...')
 
-    with open(path_to_file_dbase, 'w') as fb:
-        json.dump(dict2json, fb, indent=4)
+    return path_to_file_backup
+
+
+def iter_json_object(stream, read_size: int = None):
+    """incremental parser of json object from text stream, yields pairs of key and value"""
+    if read_size is None:
+        read_size = get_tuning_value('read_buffer_size')
+
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def skip_whitespace() -> str:
+        """next significant symbol of stream, empty string at end of stream"""
+        nonlocal buffer, pos, eof
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos:pos + 1]
+            buffer, pos = stream.read(read_size), 0
+            eof = not buffer
+
+    def decode():
+        nonlocal buffer, pos, eof
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise FileBaseCorrupted('backup is not valid json')
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+    if skip_whitespace() != '{':
+        raise FileBaseCorrupted('backup is not json object')
+    pos += 1
+
+    if skip_whitespace() == '}':
+        return
+
+    while True:
+        key = decode()
+        if skip_whitespace() != ':':
+            raise FileBaseCorrupted('backup is not valid json')
+        pos += 1
+        skip_whitespace()
+        yield key, decode()
+
+        match skip_whitespace():
+            case ',':
+                pos += 1
+                skip_whitespace()
+            case '}':
+                return
+            case _:
+                raise FileBaseCorrupted('backup is not valid json')
+
+
+def iter_backup_records(path_to_file_backup: pathlib.Path):
+    """stream pairs of phone number and record (None for removed contact) from backup file"""
+    path_to_file_backup = pathlib.Path(path_to_file_backup)
+    compression = {suffix: compression for compression, suffix in BACKUP_COMPRESSIONS.items()
+                   if suffix}.get(path_to_file_backup.suffix)
+
+    with open_backup(path_to_file_backup=path_to_file_backup, mode='r', compression=compression) as fb:
+        yield from iter_json_object(fb)
+
+
+def validate_backup_records(records: list) -> tuple:
+    """check batch of backup records, returns valid rows (phone, name, date time or None) and rejected phones"""
+    rows: list = []
+    rejects: list = []
+
+    for phone_number, record in records:
+        if record is None:
+            rows.append((normalize_phone_number(phone_number), None, None))
+            continue
+
+        try:
+            contact_name = record['contact_name']
+            if (record['phone_number'] != phone_number
+                    or not Contact.validate_phone_number(phone_number=phone_number, raise_error=False)
+                    or not Contact.validate_contact_name(contact_name=contact_name, raise_error=False)):
+                raise ValueError
+            rows.append((normalize_phone_number(phone_number), contact_name,
+                         parse_date_time_creation(record['date_time_creation_contact'])))
+        except (KeyError, TypeError, ValueError):
+            rejects.append(phone_number)
+
+    return rows, rejects
+
+
+def iter_backup_batches(path_to_file_backup: pathlib.Path, batch_size: int):
+    batch: list = []
+    for record in iter_backup_records(path_to_file_backup=path_to_file_backup):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def restore_dbase(paths_to_file_backup: list,
+                  processes: int = None,
+                  batch_size: int = None) -> dict:
+    """contacts from full backup with chain of differential backups applied in order"""
+    if processes is None:
+        processes = get_tuning_value('restore_processes')
+    if batch_size is None:
+        batch_size = get_tuning_value('restore_batch_size')
+
+    contacts: dict = {}
+    cnt_rows: int = 0
+    cnt_rejects: int = 0
+
+    executor = create_process_pool(processes=processes)
+    try:
+        for path_to_file_backup in paths_to_file_backup:
+            batches = iter_backup_batches(path_to_file_backup=path_to_file_backup, batch_size=batch_size)
+            results = map_in_pool(executor, validate_backup_records, batches, window=2 * processes)
+
+            for rows, rejects in results:
+                for phone_number, contact_name, date_time_creation in rows:
+                    if contact_name is None:
+                        contacts.pop(phone_number, None)
+                    else:
+                        contacts[phone_number] = Contact(phone_number=phone_number,
+                                                         contact_name=contact_name,
+                                                         date_time_creation_contact=date_time_creation,
+                                                         validate=False)
+                cnt_rows += len(rows)
+                cnt_rejects += len(rejects)
+                if rejects:
+                    print(f'rejected records of {path_to_file_backup}: {", ".join(rejects[:10])}')
+
+            print(f'restore {cnt_rows} rows from {path_to_file_backup}')
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if cnt_rejects > 0:
+        print(f'total rejected {cnt_rejects} records')
+
+    return contacts
+
+
+def chain_of_backups(path_to_file_manifest: pathlib.Path) -> list:
+    """paths of full backup and differential backups after it from manifest"""
+    path_to_file_manifest = pathlib.Path(path_to_file_manifest)
+    manifest = read_backup_manifest(path_to_file_manifest=path_to_file_manifest)
+    if manifest is None:
+        raise FileBaseNotFound(f'manifest of backups {path_to_file_manifest} not found')
 
-    return path_to_file_dbase
+    return [path_to_file_manifest.parent / name for name in manifest['backups']]
+
+
+IMPORT_HEADERS = {'name': 'name', 'contact_name': 'name', 'contact name': 'name', 'full name': 'name',
+                  'имя': 'name', 'phone': 'phone', 'phone_number': 'phone', 'phone number': 'phone',
+                  'telephone': 'phone', 'mobile': 'phone', 'телефон': 'phone'}
+
+
+def iter_csv_rows(path_to_file_import: pathlib.Path):
+    """rows (number of row, contact name, phone number) of csv file, columns are found by header or by values"""
+    with open(path_to_file_import, 'r', encoding='utf-8-sig', newline='') as fi:
+        sample = fi.read(1 << 16)
+        fi.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+
+        reader = csv.reader(fi, dialect)
+        first_row = next(reader, None)
+        if first_row is None:
+            return
+
+        columns = {IMPORT_HEADERS.get(value.strip().lower()): i for i, value in enumerate(first_row)}
+        if 'name' in columns and 'phone' in columns:
+            column_name, column_phone = columns['name'], columns['phone']
+            rows = reader
+        else:
+            phone_first = bool(first_row) and first_row[0].translate(PHONE_SEPARATORS_TABLE).lstrip('+').isdigit()
+            column_name, column_phone = (1, 0) if phone_first else (0, 1)
+            rows = itertools.chain((first_row,), reader)
+
+        for num_row, row in enumerate(rows, start=1):
+            if len(row) > max(column_name, column_phone):
+                yield num_row, row[column_name], row[column_phone]
+            else:
+                yield num_row, '', ''
+
+
+def iter_vcard_rows(path_to_file_import: pathlib.Path):
+    """rows (number of card, contact name, phone number) of vcard file, one row for every TEL of card"""
+    with open(path_to_file_import, 'r', encoding='utf-8-sig') as fi:
+        num_card = 0
+        contact_name, phones = '', []
+        lines = iter(fi)
+        line = next(lines, None)
+        while line is not None:
+            line = line.rstrip('\r\n')
+            next_line = next(lines, None)
+            while next_line is not None and next_line[:1] in (' ', '\t'):  # folded line
+                line += next_line.rstrip('\r\n')[1:]
+                next_line = next(lines, None)
+
+            name, _, value = line.partition(':')
+            name = name.split(';')[0].upper()
+            if name == 'BEGIN':
+                num_card += 1
+                contact_name, phones = '', []
+            elif name == 'FN':
+                contact_name = value.replace('\\,', ',').replace('\\;', ';')
+            elif name == 'TEL':
+                phones.append(value.removeprefix('tel:'))
+            elif name == 'END':
+                for phone_number in phones or ('',):
+                    yield num_card, contact_name, phone_number
+
+            line = next_line
+
+
+def validate_import_chunk(chunk: list) -> tuple:
+    """check chunk of imported rows, returns valid (name, phone) and rejected (row, name, phone, reason)"""
+    rows: list = []
+    rejects: list = []
+    for num_row, contact_name, phone_number in chunk:
+        contact_name = contact_name.strip()
+        phone_number = normalize_phone_number(phone_number)
+        if not Contact.validate_contact_name(contact_name=contact_name, raise_error=False):
+            rejects.append((num_row, contact_name, phone_number, 'not valid contact name'))
+        elif not Contact.validate_phone_number(phone_number=phone_number, raise_error=False):
+            rejects.append((num_row, contact_name, phone_number, 'not valid phone number'))
+        else:
+            rows.append((num_row, contact_name, phone_number))
+    return rows, rejects
+
+
+def iter_import_chunks(path_to_file_import: pathlib.Path, chunk_size: int):
+    path_to_file_import = pathlib.Path(path_to_file_import)
+    if path_to_file_import.suffix.lower() in ('.vcf', '.vcard'):
+        rows = iter_vcard_rows(path_to_file_import=path_to_file_import)
+    else:
+        rows = iter_csv_rows(path_to_file_import=path_to_file_import)
+
+    chunk: list = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@decorator_metrics('import')
+def import_contacts(storage,
+                    path_to_file_import: pathlib.Path,
+                    path_to_file_rejects: pathlib.Path = None,
+                    processes: int = None,
+                    chunk_size: int = None) -> tuple:
+    """import contacts from csv or vcard file to storage, returns count of added, duplicated and rejected rows"""
+    if processes is None:
+        processes = get_tuning_value('import_processes')
+    if chunk_size is None:
+        chunk_size = get_tuning_value('import_chunk_size')
+    if path_to_file_rejects is None:
+        path_to_file_rejects = pathlib.Path(f'{path_to_file_import}.rejects.csv')
+
+    cnt_added = cnt_duplicates = cnt_rejects = 0
+    date_time_creation_contact = datetime.datetime.now().replace(microsecond=0)
+
+    executor = create_process_pool(processes=processes)
+    try:
+        with open(path_to_file_rejects, 'w', encoding='utf-8', newline='') as fr:
+            writer = csv.writer(fr)
+            writer.writerow(('row', 'contact_name', 'phone_number', 'reason'))
+
+            chunks = iter_import_chunks(path_to_file_import=path_to_file_import, chunk_size=chunk_size)
+            results = map_in_pool(executor, validate_import_chunk, chunks, window=2 * processes)
+
+            for rows, rejects in results:
+                cnt_rejects += len(rejects)
+                for num_row, contact_name, phone_number in rows:
+                    if storage.get(phone_number) is not None:
+                        rejects.append((num_row, contact_name, phone_number, 'duplicate phone number'))
+                        cnt_duplicates += 1
+                        continue
+
+                    storage.add(Contact(phone_number=phone_number,
+                                        contact_name=contact_name,
+                                        date_time_creation_contact=date_time_creation_contact,
+                                        validate=False))
+                    cnt_added += 1
+
+                writer.writerows(rejects)
+                print(f'import {cnt_added} rows...')
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    METRICS.inc('contacts.imported', cnt_added)
+    print(f'total import {cnt_added} rows, duplicates {cnt_duplicates}, rejected {cnt_rejects}, '
+          f'see {path_to_file_rejects}')
+    return cnt_added, cnt_duplicates, cnt_rejects
+
+
+class DuplicateFinder(object):
+    """pairs of probably the same contacts: contacts are compared only inside blocks with the same
+    ending of phone, the same folded name or the same trigram of name, blocks bigger than max_block
+    are skipped (too common trigram or name tells nothing), so count of comparisons is near-linear;
+    matched pairs are joined to groups by union-find"""
+    __slots__ = ('__dict_contacts', '__threshold', '__max_block', '__phone_digits',
+                 '__keys', '__parent', '__scores',
+                 'count_compared', 'count_skipped_blocks')
+
+    def __init__(self,
+                 dict_contacts,
+                 threshold: float = None,
+                 max_block: int = None,
+                 phone_digits: int = None):
+        self.__dict_contacts = dict_contacts
+        self.__threshold = get_tuning_value('dedupe_threshold') if threshold is None else threshold
+        self.__max_block = get_tuning_value('dedupe_max_block') if max_block is None else max_block
+        self.__phone_digits = get_tuning_value('dedupe_phone_digits') if phone_digits is None else phone_digits
+        self.__keys: dict = {}  # digits, name key and trigrams by phone number of compared contacts
+        self.__parent: dict = {}  # union-find of matched phones, roots are not in it
+        self.__scores: dict = {}  # the lowest score of pair joined to group by root of group
+        self.count_compared: int = 0
+        self.count_skipped_blocks: int = 0
+
+    @staticmethod
+    def name_key(contact: Contact) -> str:
+        """folded name with sorted words, "Petrov Ivan" is the same as "ivan  petrov" """
+        return ' '.join(sorted(contact.search_key.split()))
+
+    @staticmethod
+    def trigrams(name_key: str) -> frozenset:
+        name_key = f' {name_key} '
+        return frozenset(name_key[i:i + 3] for i in range(len(name_key) - 2))
+
+    @staticmethod
+    def digits(phone_number: str) -> str:
+        return ''.join(filter(str.isdigit, phone_number))
+
+    def __key(self, phone_number: str) -> tuple:
+        keys = self.__keys.get(phone_number)
+        if keys is None:
+            name_key = DuplicateFinder.name_key(self.__dict_contacts[phone_number])
+            keys = self.__keys[phone_number] = (DuplicateFinder.digits(phone_number),
+                                                name_key,
+                                                DuplicateFinder.trigrams(name_key))
+        return keys
+
+    def score(self, phone_number1: str, phone_number2: str) -> float:
+        """mean of similarity of phones and of names from 0 to 1: phones are equal by digits,
+        one is ending of another (number without code) or only their last digits are equal;
+        names are equal after folding or similar by trigrams (Jaccard)"""
+        digits1, name_key1, trigrams1 = self.__key(phone_number1)
+        digits2, name_key2, trigrams2 = self.__key(phone_number2)
+        if digits1 == digits2:
+            phone_score = 1.0
+        elif digits1.endswith(digits2) or digits2.endswith(digits1):
+            phone_score = 0.9
+        elif digits1[-self.__phone_digits:] == digits2[-self.__phone_digits:]:
+            phone_score = 0.6
+        else:
+            phone_score = 0.0
+
+        if name_key1 == name_key2:
+            name_score = 1.0
+        else:
+            name_score = len(trigrams1 & trigrams2) / len(trigrams1 | trigrams2)
+
+        return round((phone_score + name_score) / 2, 3)
+
+    def blocks(self):
+        """phones of contacts with the same blocking key, only blocks of 2..max_block contacts;
+        score of contacts with different endings of phones is not more than 0.5, so blocks by name
+        are not needed when threshold is higher"""
+        by_names = self.__threshold <= 0.5
+        blocks: dict = {}
+        for phone_number in self.__dict_contacts:
+            keys = []
+            digits = DuplicateFinder.digits(phone_number)
+            if len(digits) >= self.__phone_digits:
+                keys.append(f'p:{digits[-self.__phone_digits:]}')
+            if by_names:
+                _, name_key, trigrams = self.__key(phone_number)
+                keys.append(f'n:{name_key}')
+                keys.extend(f't:{trigram}' for trigram in trigrams)
+            for key in keys:
+                block = blocks.get(key, ())
+                if block is None:  # overflowed, it is not kept
+                    continue
+                if len(block) >= self.__max_block:
+                    blocks[key] = None
+                    self.count_skipped_blocks += 1
+                    continue
+                if not block:
+                    block = blocks[key] = []
+                block.append(phone_number)
+
+        for block in blocks.values():
+            if block is not None and len(block) > 1:
+                yield block
+
+    def find(self, phone_number: str) -> str:
+        """root of group of phone number"""
+        parent = self.__parent
+        while phone_number in parent:
+            grandparent = parent.get(parent[phone_number])
+            if grandparent is not None:  # path halving
+                parent[phone_number] = grandparent
+            phone_number = parent[phone_number]
+        return phone_number
+
+    def __union(self, root1: str, root2: str, score: float) -> None:
+        self.__parent[root2] = root1
+        self.__scores[root1] = min(score,
+                                   self.__scores.get(root1, score),
+                                   self.__scores.pop(root2, score))
+
+    def pairs(self):
+        """matched pairs (score, phone_number1, phone_number2) while blocks are compared,
+        pairs already in one group are not compared again"""
+        for block in self.blocks():
+            for i, phone_number1 in enumerate(block):
+                for phone_number2 in block[i + 1:]:
+                    root1, root2 = self.find(phone_number1), self.find(phone_number2)
+                    if root1 == root2:
+                        continue
+                    self.count_compared += 1
+                    score = self.score(phone_number1, phone_number2)
+                    if score >= self.__threshold:
+                        self.__union(root1, root2, score)
+                        yield score, phone_number1, phone_number2
+
+    def groups(self) -> list:
+        """(score, phones) of groups of duplicates after all pairs are taken, score is the lowest score
+        of pairs of group, the most sure groups are first"""
+        groups: dict = {}
+        for phone_number in self.__parent:
+            root = self.find(phone_number)
+            groups.setdefault(root, [root]).append(phone_number)
+        return sorted(((self.__scores[root], tuple(phones)) for root, phones in groups.items()),
+                      key=lambda group: (-group[0], group[1]))
+
+
+MIXED_SCRIPT_PATTERN = re.compile(r'[a-z][а-яё]|[а-яё][a-z]', re.IGNORECASE)
+
+
+def merge_contacts(contacts) -> Contact:
+    """one contact of group of duplicates: phone of contact with the fullest phone in international form,
+    its name unless it mixes latin and cyrillic letters in a word, date of creation of the first of them"""
+    survivor = max(contacts, key=lambda contact: (contact.phone_number[:1] == '+',
+                                                  len(contact.phone_number),
+                                                  -datetime2epoch(contact.date_time_creation_contact)))
+    name_contact = max(contacts, key=lambda contact: (MIXED_SCRIPT_PATTERN.search(contact.contact_name) is None,
+                                                      contact is survivor))
+    return Contact(phone_number=survivor.phone_number,
+                   contact_name=name_contact.contact_name,
+                   date_time_creation_contact=min(contact.date_time_creation_contact for contact in contacts),
+                   validate=False)
+
+
+@decorator_metrics('dedupe')
+def dedupe_contacts(storage,
+                    path_to_file_report: pathlib.Path = None,
+                    decide=None,
+                    threshold: float = None) -> tuple:
+    """find groups of duplicates of storage and merge groups accepted by decide(score, contacts, merged):
+    True - merge, False - skip, None - stop merging; without decide groups are only reported.
+    Every group is written to csv report, returns count of groups and count of merged groups"""
+    if path_to_file_report is None:
+        path_to_file_report = get_path_to_file('contact-book.dedupe.csv')
+
+    finder = DuplicateFinder(dict_contacts=storage.contacts(), threshold=threshold)
+    cnt_pairs = 0
+    for _ in finder.pairs():
+        cnt_pairs += 1
+        if cnt_pairs % 1000 == 0:
+            print(f'found {cnt_pairs} pairs of duplicates...')
+    groups = finder.groups()
+    METRICS.gauge('dedupe.compared', finder.count_compared)
+    METRICS.gauge('dedupe.skipped_blocks', finder.count_skipped_blocks)
+    print(f'compared {finder.count_compared} pairs, found {len(groups)} groups of duplicates')
+
+    cnt_merged = 0
+    with open(path_to_file_report, 'w', encoding='utf-8', newline='') as fr:
+        writer = csv.writer(fr)
+        writer.writerow(('group', 'score', 'action', 'contact_name', 'phone_number', 'date_time_creation'))
+
+        for num_group, (score, phone_numbers) in enumerate(groups, 1):
+            contacts = tuple(storage.get(phone_number) for phone_number in phone_numbers)
+            merged = merge_contacts(contacts)
+            answer = None if decide is None else decide(score, contacts, merged)
+            if answer:
+                for contact in contacts:
+                    if contact.phone_number != merged.phone_number:
+                        storage.remove(contact)
+                storage.edit(merged)
+                cnt_merged += 1
+                METRICS.inc('contacts.merged', len(contacts) - 1)
+
+            for contact in contacts:
+                if not answer:
+                    action = 'found'
+                elif contact.phone_number == merged.phone_number:
+                    action = 'kept'
+                else:
+                    action = 'merged'
+                writer.writerow((num_group, score, action, contact.contact_name, contact.phone_number,
+                                 contact.str_date_time_creation_contact))
+            if answer is None and decide is not None:
+                decide = None  # stop merging, the rest of groups is only reported
+
+    print(f'total {len(groups)} groups of duplicates, merged {cnt_merged}, see {path_to_file_report}')
+    return len(groups), cnt_merged
+
+
+class StorageContactBook(abc.ABC):
+    """interface of storage of contact book, implementations are registered in STORAGES"""
+    suffix = None
+
+    def __init__(self, path_to_file_dbase: pathlib.Path):
+        self.__path_to_file_dbase = pathlib.Path(path_to_file_dbase)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.__path_to_file_dbase})'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @classmethod
+    def lookup(cls, path_to_file_dbase: pathlib.Path, phone_number: str) -> None | Contact:
+        """contact by phone number without keeping storage open, storage may override it by a scan"""
+        with cls(path_to_file_dbase=path_to_file_dbase) as storage:
+            return find_contact_by_phone(dict_contacts=storage, phone_number=phone_number)
+
+    @property
+    def path_to_file_dbase(self) -> pathlib.Path:
+        return self.__path_to_file_dbase
+
+    @abc.abstractmethod
+    def __len__(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get(self, phone_number: str) -> None | Contact:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def find_by_name(self, contact_name: str) -> tuple:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def find_by_phone_part(self, phone_part: str) -> tuple:
+        """contacts by beginning or ending of phone number, see PhoneIndex.find"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def page_of_contacts(self, start: int, count: int) -> tuple:
+        """contacts from position start in order of names"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def find_by_filter(self, contact_filter: ContactFilter):
+        """iterator of contacts matched all predicates of filter, see ContactFilter.filter"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def memory_parts(self) -> dict:
+        """structures of storage in memory by name for memory_report, None is not built structure"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add(self, contact: Contact) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def edit(self, contact: Contact) -> None:
+        """replace contact with the same phone number"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def remove(self, contact: Contact) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def contacts(self) -> dict:
+        """all contacts of book by phone number"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def refresh(self) -> int:
+        """apply changes of book saved by other processes, returns count of applied changes"""
+        return 0
+
+    def restore(self, dict_contacts: dict) -> None:
+        """replace all contacts of book by contacts from backup"""
+        for contact in tuple(self.contacts().values()):
+            if contact.phone_number not in dict_contacts:
+                self.remove(contact)
+
+        for contact in dict_contacts.values():
+            if self.get(contact.phone_number) is None:
+                self.add(contact)
+            else:
+                self.edit(contact)
+
+
+class TextStorage(StorageContactBook):
+    """text file dbase loaded to dict with journal of changes, changes of other processes are taken
+    from new records of journal or by reload after compaction of file dbase; contacts and indexes
+    are taken from snapshot when it is valid for file dbase"""
+    suffix = '.dbase'
+
+    def __init__(self, path_to_file_dbase: pathlib.Path):
+        super().__init__(path_to_file_dbase=path_to_file_dbase)
+        self.__journal = DBaseJournal.for_dbase(path_to_file_dbase=self.path_to_file_dbase)
+        self.__snapshot = None
+        self.__snapshot_key = None
+        if get_tuning_value('snapshot_enabled') and get_tuning_value('contacts_store') != 'lazy':
+            self.__snapshot = DBaseSnapshot(path_to_file_dbase=self.path_to_file_dbase)
+        with lock_dbase(path_to_file_dbase=self.path_to_file_dbase, shared=True):
+            self.__load()
+
+    def __load(self) -> None:
+        snapshot = None if self.__snapshot is None else self.__snapshot.load()
+        if snapshot is None:
+            self.__contacts, _ = full_download_dbase(path_to_file_dbase=self.path_to_file_dbase)
+            self.__names = None
+            self.__phones = None
+            self.__sorted = None
+            self.__created = None
+            self.__journal.seek(size=0, count_records=0)
+        else:
+            self.__snapshot_key, state = snapshot
+            self.__contacts = state['contacts']
+            self.__names = state['names']
+            self.__phones = state['phones']
+            self.__sorted = state['sorted']
+            self.__created = state['created']
+            self.__journal.seek(size=self.__snapshot_key['journal_size'],
+                                count_records=self.__snapshot_key['journal_records'])
+            print(f'total download {len(self.__contacts)} contacts from snapshot')
+        self.__version_dbase = stat_file(self.path_to_file_dbase)
+
+        cnt_rows: int = 0
+        for _, phone_number, contact in self.__journal.records(offset=self.__journal.size):
+            self.__apply(phone_number, contact)
+            cnt_rows += 1
+        if cnt_rows > 0:
+            print(f'total replay {cnt_rows} changes from journal')
+
+    def __len__(self):
+        return len(self.__contacts)
+
+    @classmethod
+    def lookup(cls, path_to_file_dbase: pathlib.Path, phone_number: str) -> None | Contact:
+        return scan_dbase_for_phone(path_to_file_dbase=path_to_file_dbase, phone_number=phone_number)
+
+    def get(self, phone_number: str) -> None | Contact:
+        return self.__contacts.get(phone_number)
+
+    def find_by_name(self, contact_name: str) -> tuple:
+        if self.__names is None:
+            self.__names = NameIndex(dict_contacts=self.__contacts)
+        return self.__names.find(contact_name=contact_name)
+
+    def find_by_phone_part(self, phone_part: str) -> tuple:
+        if self.__phones is None:
+            self.__phones = PhoneIndex(phone_numbers=self.__contacts)
+        return tuple(self.__contacts[phone_number] for phone_number in self.__phones.find(phone_part=phone_part))
+
+    def page_of_contacts(self, start: int, count: int) -> tuple:
+        if self.__sorted is None:
+            self.__sorted = SortedContacts(dict_contacts=self.__contacts)
+        return tuple(self.__contacts[phone_number] for phone_number in self.__sorted.page(start, count))
+
+    def memory_parts(self) -> dict:
+        return {'contacts': self.__contacts,
+                'index.names': self.__names,
+                'index.phones': self.__phones,
+                'index.sorted': self.__sorted,
+                'index.created': self.__created,
+                'journal': self.__journal}
+
+    def find_by_filter(self, contact_filter: ContactFilter):
+        if contact_filter.search_key is not None and self.__names is None:
+            self.__names = NameIndex(dict_contacts=self.__contacts)
+        if contact_filter.phone_prefix is not None and self.__phones is None:
+            self.__phones = PhoneIndex(phone_numbers=self.__contacts)
+        if contact_filter.dated and self.__created is None:
+            self.__created = CreationIndex(dict_contacts=self.__contacts)
+        return contact_filter.filter(dict_contacts=self.__contacts,
+                                     names=self.__names,
+                                     phones=self.__phones,
+                                     created=self.__created)
+
+    def __apply(self, phone_number: str, contact: None | Contact) -> None:
+        """change contacts and built indexes, contact is None for removed"""
+        old_contact = self.__contacts.get(phone_number)
+        if old_contact is not None:
+            if self.__names is not None:
+                self.__names.remove(old_contact)
+            if self.__phones is not None:
+                self.__phones.remove(phone_number)
+            if self.__sorted is not None:
+                self.__sorted.remove(old_contact)
+            if self.__created is not None:
+                self.__created.remove(old_contact)
+
+        if contact is None:
+            self.__contacts.pop(phone_number, None)
+            return
+
+        self.__contacts[phone_number] = contact
+        if self.__names is not None:
+            self.__names.add(contact)
+        if self.__phones is not None:
+            self.__phones.add(phone_number)
+        if self.__sorted is not None:
+            self.__sorted.add(contact)
+        if self.__created is not None:
+            self.__created.add(contact)
+
+    def add(self, contact: Contact) -> None:
+        self.__apply(contact.phone_number, contact)
+        self.__journal.add(contact)
+
+    def edit(self, contact: Contact) -> None:
+        self.__apply(contact.phone_number, contact)
+        self.__journal.edit(contact)
+
+    def remove(self, contact: Contact) -> None:
+        self.__apply(contact.phone_number, None)
+        self.__journal.delete(contact)
+
+    def contacts(self) -> dict:
+        return self.__contacts
+
+    def __changed_outside(self) -> bool:
+        version_journal = stat_file(self.__journal.path_to_file_journal)
+        return (stat_file(self.path_to_file_dbase) != self.__version_dbase
+                or (0 if version_journal is None else version_journal[1]) != self.__journal.size)
+
+    def __refresh(self) -> int:
+        """apply new records of journal, or reload all contacts when file dbase was compacted by other process;
+        changes of this process which are not saved yet are applied over them"""
+        pending = {phone_number: contact for _, phone_number, contact in self.__journal.pending_records()}
+        version_journal = stat_file(self.__journal.path_to_file_journal)
+
+        if (stat_file(self.path_to_file_dbase) != self.__version_dbase
+                or (0 if version_journal is None else version_journal[1]) < self.__journal.size):
+            self.__load()
+            for phone_number, contact in pending.items():
+                self.__apply(phone_number, contact)
+            METRICS.inc('storage.reload.full')
+            print(f'total reload {len(self.__contacts)} contacts changed by other process')
+            return len(self.__contacts)
+
+        cnt_rows: int = 0
+        for _, phone_number, contact in self.__journal.records(offset=self.__journal.size):
+            if phone_number not in pending:  # change of this process is later
+                self.__apply(phone_number, contact)
+                cnt_rows += 1
+
+        METRICS.inc('storage.reload.delta', cnt_rows)
+        if cnt_rows > 0:
+            print(f'total reload {cnt_rows} changes of other process from journal')
+        return cnt_rows
+
+    def refresh(self) -> int:
+        if not self.__changed_outside():
+            return 0
+        with lock_dbase(path_to_file_dbase=self.path_to_file_dbase, shared=True):
+            return self.__refresh()
+
+    def save(self) -> None:
+        with lock_dbase(path_to_file_dbase=self.path_to_file_dbase):
+            if self.__changed_outside():
+                self.__refresh()
+            save_dbase(dbase_dict=self.__contacts, path_to_file_dbase=self.path_to_file_dbase, journal=self.__journal)
+            self.__version_dbase = stat_file(self.path_to_file_dbase)
+
+    def __snapshot_stale(self) -> bool:
+        """snapshot is rewritten when file dbase was compacted after it or indexes are built which are not in it"""
+        key = self.__snapshot_key
+        return (key is None
+                or (key['dbase_size'], key['dbase_mtime_ns']) != self.__version_dbase[1:]
+                or any(index is not None and name not in key['indexes']
+                       for name, index in (('names', self.__names),
+                                           ('phones', self.__phones),
+                                           ('sorted', self.__sorted),
+                                           ('created', self.__created))))
+
+    def close(self) -> None:
+        """write snapshot when it is stale, only without unsaved changes because snapshot is state of files"""
+        if self.__snapshot is None or self.__journal.pending or not self.__snapshot_stale():
+            return
+
+        with lock_dbase(path_to_file_dbase=self.path_to_file_dbase, shared=True):
+            if not self.__changed_outside():
+                self.__snapshot_key = self.__snapshot.save(state={'contacts': self.__contacts,
+                                                                  'names': self.__names,
+                                                                  'phones': self.__phones,
+                                                                  'sorted': self.__sorted,
+                                                                  'created': self.__created},
+                                                           journal_size=self.__journal.size,
+                                                           journal_records=self.__journal.count_records)
+
+
+class BinaryStorage(StorageContactBook):
+    """memory-mapped binary dbase with changes kept in memory until save, file dbase rewritten
+    by other process is reopened and changes of this process are kept over it"""
+    suffix = '.dbin'
+
+    def __init__(self, path_to_file_dbase: pathlib.Path):
+        super().__init__(path_to_file_dbase=path_to_file_dbase)
+        with lock_dbase(path_to_file_dbase=self.path_to_file_dbase):
+            if not self.path_to_file_dbase.exists():
+                path_to_file_text = self.path_to_file_dbase.with_suffix(TextStorage.suffix)
+                if path_to_file_text.exists():
+                    convert_text_to_binary(path_to_file_dbase=path_to_file_text,
+                                           path_to_file_binary=self.path_to_file_dbase)
+                else:
+                    write_binary_dbase(dbase_dict={}, path_to_file_binary=self.path_to_file_dbase)
+
+        self.__binary_dbase = None
+        self.__changes: dict = {}  # phone number -> contact or None for removed, until save
+        self.__open()
+
+    def __open(self) -> None:
+        if self.__binary_dbase is not None:
+            self.__binary_dbase.close()
+        self.__binary_dbase = BinaryDBase(path_to_file_binary=self.path_to_file_dbase)
+        self.__version_dbase = stat_file(self.path_to_file_dbase)
+        self.__contacts = None  # all contacts after full materialization
+        self.__names = None
+        self.__phones = None
+        self.__sorted = None
+        self.__created = None
+
+    def __len__(self):
+        """count of contacts of file dbase adjusted by changes, contacts are not materialized for it"""
+        if self.__contacts is not None:
+            return len(self.__contacts)
+        binary_dbase = self.__binary_dbase
+        return len(binary_dbase) + sum((contact is not None) - (phone_number in binary_dbase)
+                                       for phone_number, contact in self.__changes.items())
+
+    def get(self, phone_number: str) -> None | Contact:
+        if self.__contacts is not None:
+            return self.__contacts.get(phone_number)
+        if phone_number in self.__changes:
+            return self.__changes[phone_number]
+        return self.__binary_dbase.get(phone_number)
+
+    def find_by_name(self, contact_name: str) -> tuple:
+        if self.__names is None:
+            self.__names = NameIndex(dict_contacts=self.contacts())
+        return self.__names.find(contact_name=contact_name)
+
+    def __phone_numbers(self):
+        if self.__contacts is not None:
+            return iter(self.__contacts)
+        return itertools.chain((phone_number for phone_number in self.__binary_dbase
+                                if phone_number not in self.__changes),
+                               (phone_number for phone_number, contact in self.__changes.items()
+                                if contact is not None))
+
+    def find_by_phone_part(self, phone_part: str) -> tuple:
+        if self.__phones is None:
+            self.__phones = PhoneIndex(phone_numbers=self.__phone_numbers())
+        return tuple(self.get(phone_number) for phone_number in self.__phones.find(phone_part=phone_part))
+
+    def page_of_contacts(self, start: int, count: int) -> tuple:
+        if self.__sorted is None:
+            self.__sorted = SortedContacts(dict_contacts=self.contacts())
+        return tuple(self.get(phone_number) for phone_number in self.__sorted.page(start, count))
+
+    def memory_parts(self) -> dict:
+        return {'contacts': self.__contacts,
+                'changes': self.__changes,
+                'index.names': self.__names,
+                'index.phones': self.__phones,
+                'index.sorted': self.__sorted,
+                'index.created': self.__created,
+                'binary_dbase': self.__binary_dbase}
+
+    def find_by_filter(self, contact_filter: ContactFilter):
+        if contact_filter.search_key is not None and self.__names is None:
+            self.__names = NameIndex(dict_contacts=self.contacts())
+        if contact_filter.phone_prefix is not None and self.__phones is None:
+            self.__phones = PhoneIndex(phone_numbers=self.__phone_numbers())
+        if contact_filter.dated and self.__created is None:
+            self.__created = CreationIndex(dict_contacts=self.contacts())
+        return contact_filter.filter(dict_contacts=self.contacts(),
+                                     names=self.__names,
+                                     phones=self.__phones,
+                                     created=self.__created)
+
+    def __change(self, phone_number: str, contact: None | Contact) -> None:
+        self.__changes[phone_number] = contact
+        if self.__contacts is not None:
+            if contact is None:
+                del self.__contacts[phone_number]
+            else:
+                self.__contacts[phone_number] = contact
+
+    def add(self, contact: Contact) -> None:
+        self.__change(contact.phone_number, contact)
+        if self.__names is not None:
+            self.__names.add(contact)
+        if self.__phones is not None:
+            self.__phones.add(contact.phone_number)
+        if self.__sorted is not None:
+            self.__sorted.add(contact)
+        if self.__created is not None:
+            self.__created.add(contact)
+
+    def edit(self, contact: Contact) -> None:
+        old_contact = self.get(contact.phone_number)
+        self.__change(contact.phone_number, contact)
+        if self.__names is not None:
+            self.__names.remove(old_contact)
+            self.__names.add(contact)
+        if self.__sorted is not None:
+            self.__sorted.remove(old_contact)
+            self.__sorted.add(contact)
+        if self.__created is not None:
+            self.__created.remove(old_contact)
+            self.__created.add(contact)
+
+    def remove(self, contact: Contact) -> None:
+        self.__change(contact.phone_number, None)
+        if self.__names is not None:
+            self.__names.remove(contact)
+        if self.__phones is not None:
+            self.__phones.remove(contact.phone_number)
+        if self.__sorted is not None:
+            self.__sorted.remove(contact)
+        if self.__created is not None:
+            self.__created.remove(contact)
+
+    def contacts(self) -> dict:
+        if self.__contacts is None:
+            contacts = dict(self.__binary_dbase.items())
+            for phone_number, contact in self.__changes.items():
+                if contact is None:
+                    contacts.pop(phone_number, None)
+                else:
+                    contacts[phone_number] = contact
+            self.__contacts = contacts
+        return self.__contacts
+
+    def refresh(self) -> int:
+        if stat_file(self.path_to_file_dbase) == self.__version_dbase:
+            return 0
+
+        with lock_dbase(path_to_file_dbase=self.path_to_file_dbase, shared=True):
+            self.__open()
+        METRICS.inc('storage.reload.full')
+        print(f'reopen file dbase {self.path_to_file_dbase} changed by other process')
+        return len(self.__binary_dbase)
+
+    def save(self) -> None:
+        with lock_dbase(path_to_file_dbase=self.path_to_file_dbase):
+            if stat_file(self.path_to_file_dbase) != self.__version_dbase:
+                self.__open()
+            contacts = self.contacts()
+            self.__binary_dbase.close()
+            write_binary_dbase(dbase_dict=contacts, path_to_file_binary=self.path_to_file_dbase)
+            self.__binary_dbase = BinaryDBase(path_to_file_binary=self.path_to_file_dbase)
+            self.__version_dbase = stat_file(self.path_to_file_dbase)
+            self.__changes.clear()
+        print(f'total upload {len(contacts)} rows...')
+
+    def close(self) -> None:
+        self.__binary_dbase.close()
+
+
+class SqliteStorage(StorageContactBook):
+    """sqlite3 database in WAL mode, changes are written by one transaction on save"""
+    suffix = '.sqlite3'
+    schema = ('CREATE TABLE IF NOT EXISTS contacts ('
+              'phone_number TEXT PRIMARY KEY, '
+              'contact_name TEXT NOT NULL, '
+              'search_key TEXT NOT NULL, '
+              'date_time_creation INTEGER NOT NULL);'
+              'CREATE INDEX IF NOT EXISTS contacts_search_key ON contacts (search_key);'
+              'CREATE INDEX IF NOT EXISTS contacts_date_time_creation ON contacts (date_time_creation);'
+              'CREATE INDEX IF NOT EXISTS contacts_order ON contacts (search_key, phone_number);')
+    # trigrams of search keys for search by part of name, they are kept by triggers
+    fts_schema = ("CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(search_key, content='contacts', "
+                  "content_rowid='rowid', tokenize='trigram case_sensitive 1');"
+                  'CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts BEGIN '
+                  'INSERT INTO contacts_fts(rowid, search_key) VALUES (new.rowid, new.search_key); END;'
+                  'CREATE TRIGGER IF NOT EXISTS contacts_fts_delete AFTER DELETE ON contacts BEGIN '
+                  "INSERT INTO contacts_fts(contacts_fts, rowid, search_key) VALUES ('delete', old.rowid, "
+                  'old.search_key); END;'
+                  'CREATE TRIGGER IF NOT EXISTS contacts_fts_update AFTER UPDATE OF search_key ON contacts BEGIN '
+                  "INSERT INTO contacts_fts(contacts_fts, rowid, search_key) VALUES ('delete', old.rowid, "
+                  'old.search_key); '
+                  'INSERT INTO contacts_fts(rowid, search_key) VALUES (new.rowid, new.search_key); END;')
+    gram_size = 3  # shorter parts of name are not in trigrams, they are searched by scan
+    columns = 'phone_number, contact_name, date_time_creation'
+
+    def __init__(self, path_to_file_dbase: pathlib.Path):
+        super().__init__(path_to_file_dbase=path_to_file_dbase)
+        exists = self.path_to_file_dbase.exists()
+
+        # calls of storage are serialized by caller, save may be called from thread of http server
+        self.__connection = sqlite3.connect(self.path_to_file_dbase, isolation_level=None, check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.executescript(SqliteStorage.schema)
+        self.__fts = self.__create_fts()
+        self.__phones = None
+        self.__data_version = self.__connection.execute('PRAGMA data_version').fetchone()[0]
+
+        path_to_file_text = self.path_to_file_dbase.with_suffix(TextStorage.suffix)
+        if not exists and path_to_file_text.exists():
+            contacts, _ = full_download_dbase(path_to_file_dbase=path_to_file_text)
+            DBaseJournal.for_dbase(path_to_file_dbase=path_to_file_text).replay(dict_contacts=contacts)
+            self.__begin()
+            self.__connection.executemany('INSERT OR REPLACE INTO contacts VALUES (?, ?, ?, ?)',
+                                          map(SqliteStorage.__row, contacts.values()))
+            self.save()
+
+    def __create_fts(self) -> bool:
+        """trigram index of names, it is built for database of previous version; False when sqlite
+        has no fts5 or trigram tokenizer (before 3.34), then names are searched by scan"""
+        exists = self.__connection.execute('SELECT count(*) FROM sqlite_master '
+                                           "WHERE name = 'contacts_fts'").fetchone()[0]
+        try:
+            self.__connection.executescript(SqliteStorage.fts_schema)
+        except sqlite3.OperationalError:
+            return False
+        if not exists:
+            self.__connection.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+        return True
+
+    def __name_condition(self, search_key: str) -> tuple:
+        """condition of query and its parameter for contacts with part of name"""
+        if self.__fts and len(search_key) >= SqliteStorage.gram_size:
+            return ('rowid IN (SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?)',
+                    '"{}"'.format(search_key.replace('"', '""')))  # phrase of trigrams is part of key
+        return 'instr(search_key, ?) > 0', search_key
+
+    @staticmethod
+    def __row(contact: Contact) -> tuple:
+        return (contact.phone_number, contact.contact_name, contact.search_key,
+                datetime2epoch(contact.date_time_creation_contact))
+
+    @staticmethod
+    def __contact(row: tuple) -> Contact:
+        return Contact(phone_number=row[0],
+                       contact_name=row[1],
+                       date_time_creation_contact=epoch2datetime(row[2]),
+                       validate=False)
+
+    def __begin(self) -> None:
+        if not self.__connection.in_transaction:
+            self.__connection.execute('BEGIN')
+
+    def __len__(self):
+        return self.__connection.execute('SELECT count(*) FROM contacts').fetchone()[0]
+
+    def get(self, phone_number: str) -> None | Contact:
+        row = self.__connection.execute(f'SELECT {SqliteStorage.columns} FROM contacts WHERE phone_number = ?',
+                                        (phone_number,)).fetchone()
+        return None if row is None else SqliteStorage.__contact(row)
+
+    def find_by_name(self, contact_name: str) -> tuple:
+        search_key = get_search_key(contact_name)
+        if not search_key:
+            return ()
+        condition, parameter = self.__name_condition(search_key)
+        rows = self.__connection.execute(f'SELECT {SqliteStorage.columns} FROM contacts WHERE {condition}',
+                                         (parameter,))
+        return tuple(map(SqliteStorage.__contact, rows))
+
+    def find_by_phone_part(self, phone_part: str) -> tuple:
+        if self.__phones is None:
+            self.__phones = PhoneIndex(phone_numbers=(row[0] for row in self.__connection.execute(
+                'SELECT phone_number FROM contacts')))
+        return tuple(self.get(phone_number) for phone_number in self.__phones.find(phone_part=phone_part))
+
+    def page_of_contacts(self, start: int, count: int) -> tuple:
+        rows = self.__connection.execute(f'SELECT {SqliteStorage.columns} FROM contacts '
+                                         f'ORDER BY search_key, phone_number LIMIT ? OFFSET ?', (count, start))
+        return tuple(map(SqliteStorage.__contact, rows))
+
+    def memory_parts(self) -> dict:
+        """contacts and their indexes are in pages of sqlite, they are not walked"""
+        return {'index.phones': self.__phones}
+
+    def find_by_filter(self, contact_filter: ContactFilter):
+        """predicates are conditions of query, index is chosen by planner of sqlite,
+        phone numbers are compared by range, so primary key is used for their beginning"""
+        conditions: list = []
+        parameters: list = []
+        if contact_filter.search_key is not None:
+            condition, parameter = self.__name_condition(contact_filter.search_key)
+            conditions.append(condition)
+            parameters.append(parameter)
+        if contact_filter.phone_prefix is not None:
+            conditions.append('(phone_number >= ? AND phone_number < ? OR phone_number >= ? AND phone_number < ?)')
+            prefix = contact_filter.phone_prefix
+            parameters.extend((f'+{prefix}', f'+{prefix}:', prefix, f'{prefix}:'))
+        if contact_filter.date_from is not None:
+            conditions.append('date_time_creation >= ?')
+            parameters.append(datetime2epoch(contact_filter.date_from))
+        if contact_filter.date_to is not None:
+            conditions.append('date_time_creation < ?')
+            parameters.append(datetime2epoch(contact_filter.date_to))
+
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        rows = self.__connection.execute(f'SELECT {SqliteStorage.columns} FROM contacts{where}', parameters)
+        return map(SqliteStorage.__contact, rows)
+
+    def add(self, contact: Contact) -> None:
+        self.__begin()
+        self.__connection.execute('INSERT INTO contacts VALUES (?, ?, ?, ?)', SqliteStorage.__row(contact))
+        if self.__phones is not None:
+            self.__phones.add(contact.phone_number)
+
+    def edit(self, contact: Contact) -> None:
+        self.__begin()
+        self.__connection.execute('UPDATE contacts SET contact_name = ?, search_key = ?, date_time_creation = ? '
+                                  'WHERE phone_number = ?', SqliteStorage.__row(contact)[1:] + (contact.phone_number,))
+
+    def remove(self, contact: Contact) -> None:
+        self.__begin()
+        self.__connection.execute('DELETE FROM contacts WHERE phone_number = ?', (contact.phone_number,))
+        if self.__phones is not None:
+            self.__phones.remove(contact.phone_number)
+
+    def contacts(self) -> dict:
+        rows = self.__connection.execute(f'SELECT {SqliteStorage.columns} FROM contacts')
+        return {contact.phone_number: contact for contact in map(SqliteStorage.__contact, rows)}
+
+    def refresh(self) -> int:
+        """sqlite shows commits of other connections itself, only index of phones is dropped when data_version
+        is changed by commit of other connection; returns 1 when book was changed"""
+        data_version = self.__connection.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self.__data_version:
+            return 0
+        self.__data_version = data_version
+        self.__phones = None
+        METRICS.inc('storage.reload.delta')
+        return 1
+
+    def save(self) -> None:
+        if self.__connection.in_transaction:
+            self.__connection.execute('COMMIT')
+
+    def close(self) -> None:
+        if self.__connection.in_transaction:
+            self.__connection.execute('ROLLBACK')
+        self.__connection.close()
+
+
+STORAGES = {'text': TextStorage,
+            'binary': BinaryStorage,
+            'sqlite': SqliteStorage}
+
+
+def get_storage(storage: str = None, path_to_file_dbase: pathlib.Path = None) -> tuple:
+    """class of storage by its name from tuning and path to its dbase"""
+    storage_class = STORAGES[storage or get_tuning_value('storage')]
+
+    if path_to_file_dbase is None:
+        path_to_file_dbase = get_path_to_file(get_tuning_value('name_dbase') + storage_class.suffix)
+
+    LogWriter.locate(path_to_file_dbase=path_to_file_dbase)
+    return storage_class, pathlib.Path(path_to_file_dbase)
+
+
+def open_storage(storage: str = None, path_to_file_dbase: pathlib.Path = None) -> StorageContactBook:
+    """open storage of contact book by its name from tuning"""
+    storage_class, path_to_file_dbase = get_storage(storage=storage, path_to_file_dbase=path_to_file_dbase)
+    return storage_class(path_to_file_dbase=path_to_file_dbase)
 
 
 def main():
@@ -563,16 +4203,17 @@ def main():
                  '5. Edit contact',
                  '6. Backup contact book',
                  '7. Save contact book to disk',
-                 '8. Exit',)
+                 '8. Restore contact book from backup',
+                 '9. Show statistics and memory',
+                 '10. Import contacts from CSV/vCard',
+                 '11. Find and merge duplicates',
+                 '12. Exit',)
 
     menu_text = '\n'.join(menu_text)
 
     print(welcome_text)
 
-    contacts, cur_path_to_file_dbase = full_download_dbase()
-    names = {}
-
-    assert cur_path_to_file_dbase  # check file db
+    storage = open_storage()
 
     contacts_change = False
 
@@ -582,14 +4223,16 @@ def main():
 
         try:
             action = int(input('Select action and press the key Enter>> '))
-            if action not in (range(1, 9)):
+            if action not in (range(1, 13)):
                 raise UnknownAction
 
-            if action == 8:
+            storage.refresh()  # changes saved by other processes
+
+            if action == 12:
                 if contacts_change:
                     if not input('You have made changes. Save to disk? '
                                  '("Y" - Press any key / "N" - exit without saving)>> ').upper() == 'N':
-                        full_upload_dbase(dbase_dict=contacts, path_to_file_dbase=cur_path_to_file_dbase)
+                        storage.save()
                 break
 
             while True:
@@ -597,11 +4240,12 @@ def main():
                     try:
                         contact = create_contact()
 
-                        find_contact = find_contact_by_phone(dict_contacts=contacts,
+                        find_contact = find_contact_by_phone(dict_contacts=storage,
                                                              phone_number=contact.phone_number)
 
                         if find_contact is None:
-                            contacts[contact.phone_number] = contact
+                            storage.add(contact)
+                            METRICS.inc('contacts.added')
                             contacts_change = True
                             raise ExitInMainMenu
                         else:
@@ -619,33 +4263,43 @@ def main():
 
                 if action == 2:
                     try:
-                        search_type = int(input('1 - find by phone, 2 - find by contact name>> '))
+                        search_type = int(input('1 - find by phone, 2 - find by contact name, '
+                                                '3 - find by part of phone, 4 - find by filter '
+                                                '(name, beginning of phone, dates of creation)>> '))
 
-                        if search_type not in range(1, 3):
+                        if search_type not in range(1, 5):
                             raise UnknownAction
 
                         match search_type:
                             case 1:
-                                contact = (find_contact_by_phone(dict_contacts=contacts,
-                                                                 phone_number=input('Enter phone for search>> ')),)
+                                contact = find_contact_by_phone(dict_contacts=storage,
+                                                                phone_number=input('Enter phone for search>> '))
+                                contact = () if contact is None else (contact,)
                             case 2:
-                                if not names:
-                                    names = create_cash_names(dict_contacts=contacts)
-
-                                contact = find_contact_by_name_(names_dict=names,
-                                                                dict_contacts=contacts,
+                                contact = find_contact_by_name_(storage=storage,
                                                                 contact_name=input('Enter name for search>> '))
+                            case 3:
+                                contact = find_contact_by_phone_part(
+                                    storage=storage,
+                                    phone_part=input('Enter last digits of phone (6789) '
+                                                     'or its beginning with "*" (+7912*) for search>> '))
+                            case 4:
+                                contact = None
+                                if not print_stream_of_contacts(
+                                        find_contact_by_filter(storage=storage,
+                                                               contact_filter=input_contact_filter())):
+                                    raise ContactNotFound
                             case _:
                                 contact = None
 
-                        if contact is None:
-                            raise ContactNotFound
-                        else:
+                        if contact is not None:
+                            if not contact:
+                                raise ContactNotFound
                             contact = {i.phone_number: i for i in contact}
-                            print_contacts(contact)
+                            print_contacts(dict_contacts=contact)
 
-                            if input('Repeat find? ("Y" - Press any key / "N" - return main menu)>> ').upper() == 'N':
-                                break
+                        if input('Repeat find? ("Y" - Press any key / "N" - return main menu)>> ').upper() == 'N':
+                            break
                     except ContactNotFound:
                         if input('Sorry, contact is not found. Repeat?'
                                  '("Y" - Press any key / "N" - return main menu)>> ').upper() == 'N':
@@ -657,18 +4311,19 @@ def main():
                             break
 
                 if action == 3:
-                    print_contacts(contacts)
+                    print_contacts(storage=storage)
                     break
 
                 if action == 4:
                     try:
-                        contact = find_contact_by_phone(dict_contacts=contacts,
+                        contact = find_contact_by_phone(dict_contacts=storage,
                                                         phone_number=input('Enter phone number for remove>> '))
                         if contact is None:
                             raise ContactNotFound
                         else:
                             print(f'This contact {str(contact)} will be deleted!')
-                            del contacts[contact.phone_number]
+                            storage.remove(contact)
+                            METRICS.inc('contacts.removed')
                             contacts_change = True
                             if input('Repeat remove? ("Y" - Press any key / "N" - return main menu)>> ').upper() == 'N':
                                 break
@@ -679,13 +4334,13 @@ def main():
 
                 if action == 5:
                     try:
-                        contact = find_contact_by_phone(dict_contacts=contacts,
+                        contact = find_contact_by_phone(dict_contacts=storage,
                                                         phone_number=input('Enter phone number for edit>> '))
                         if contact is None:
                             raise ContactNotFound
                         else:
-                            contact = edit_contact(contact=contact)
-                            contacts[contact.phone_number] = contact
+                            storage.edit(edit_contact(contact=contact))
+                            METRICS.inc('contacts.edited')
                             contacts_change = True
 
                             if input('Repeat edit? ("Y" - Press any key / "N" - return main menu)>> ').upper() == 'N':
@@ -697,15 +4352,14 @@ def main():
                             break
 
                 if action == 6:
-                    path_to_file = full_backup_dbase(dbase_dict=contacts)
+                    differential = input('1 - full backup, 2 - differential backup>> ') == '2'
+                    path_to_file = full_backup_dbase(dbase_dict=storage.contacts(), differential=differential)
                     input(f'Backup done... create file: {path_to_file}')
                     break
 
                 if action == 7:
                     if contacts_change:
-                        full_upload_dbase(dbase_dict=contacts,
-                                          path_to_file_dbase=cur_path_to_file_dbase
-                                          )
+                        storage.save()
                         contacts_change = False
                     else:
                         print('There were no changes!')
@@ -713,11 +4367,506 @@ def main():
                     input('Press any key to continue...')
                     break
 
+                if action == 8:
+                    try:
+                        path_to_file = input('Enter path to backup file (empty - last chain of backups)>> ')
+                        if path_to_file:
+                            paths_to_file_backup = [pathlib.Path(path_to_file)]
+                        else:
+                            paths_to_file_backup = chain_of_backups(
+                                path_to_file_manifest=get_path_to_file('contact-book.backup.manifest'))
+
+                        storage.restore(restore_dbase(paths_to_file_backup=paths_to_file_backup))
+                        contacts_change = True
+                        input('Restore done... Press any key to continue...')
+                    except (FileBaseNotFound, FileBaseCorrupted, OSError) as error:
+                        input(f'Sorry, backup is not restored: {error}. Press any key to continue...')
+                    break
+
+                if action == 9:
+                    print(METRICS.report())
+                    print(format_memory_report(memory_report(storage=storage)))
+                    path_to_file = input('Enter path to dump statistics (.prom - prometheus, other - json) '
+                                         'or press key Enter to continue>> ')
+                    if path_to_file:
+                        input(f'Statistics done... create file: {METRICS.dump(path_to_file=path_to_file)}')
+                    break
+
+                if action == 10:
+                    try:
+                        cnt_added, *_ = import_contacts(storage=storage,
+                                                        path_to_file_import=pathlib.Path(
+                                                            input('Enter path to CSV or vCard file>> ')))
+                        contacts_change = contacts_change or cnt_added > 0
+                        input('Import done... Press any key to continue...')
+                    except (OSError, csv.Error, UnicodeDecodeError) as error:
+                        input(f'Sorry, contacts are not imported: {error}. Press any key to continue...')
+                    break
+
+                if action == 11:
+                    _, cnt_merged = dedupe_contacts(storage=storage, decide=input_merge_of_duplicates)
+                    contacts_change = contacts_change or cnt_merged > 0
+                    input('Dedupe done... Press any key to continue...')
+                    break
+
         except (UnknownAction, ValueError):
             if input('Sorry, you select unknown action. Repeat?'
                      '("Y" - Press any key / "N" - exit)>> ').upper() == 'N':
                 break
 
+    storage.close()
+
+
+class ContactBookServer(object):
+    """http/json service over one open storage: reads are served from memory by event loop, writes are
+    serialized by lock and saved to disk by batches, response to write is sent after its batch is saved;
+    save runs in thread and may reload contacts changed by other process, so reads wait for its end;
+    asyncio is imported on demand because its import is longer than start of application"""
+
+    def __init__(self,
+                 storage: StorageContactBook,
+                 flush_interval: float = get_tuning_value('server_flush_interval')):
+        import asyncio
+
+        self.__storage = storage
+        self.__flush_interval = flush_interval
+        self.__lock = asyncio.Lock()
+        self.__readable = asyncio.Event()  # it is cleared while storage is saved by thread
+        self.__readable.set()
+        self.__batch = None  # future of next save of changes to disk
+        self.__tasks: set = set()
+        self.__count_requests: int = 0
+        self.__refreshed: float = 0.0
+
+    @property
+    def count_requests(self) -> int:
+        return self.__count_requests
+
+    @staticmethod
+    def contact_json(contact: Contact) -> dict:
+        return contact.dict[contact.phone_number]
+
+    async def __save_batch(self) -> None:
+        import asyncio
+
+        await asyncio.sleep(self.__flush_interval)  # writes of this time are saved together
+        batch, self.__batch = self.__batch, None
+        async with self.__lock:
+            start = time.perf_counter_ns()
+            try:
+                self.__storage.refresh()  # changes of other processes are applied by event loop, not by thread
+                self.__readable.clear()
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self.__storage.save)
+                finally:
+                    self.__readable.set()
+            except Exception as error:
+                batch.set_exception(error)
+            else:
+                batch.set_result(None)
+            METRICS.observe('server.save', time.perf_counter_ns() - start)
+
+    async def __saved(self) -> None:
+        """wait until changes made before are saved to disk"""
+        import asyncio
+
+        if self.__batch is None:
+            loop = asyncio.get_running_loop()
+            self.__batch = loop.create_future()
+            task = loop.create_task(self.__save_batch())
+            self.__tasks.add(task)
+            task.add_done_callback(self.__tasks.discard)
+        await asyncio.shield(self.__batch)
+
+    async def __add(self, body: dict) -> tuple:
+        contact = Contact(phone_number=normalize_phone_number(str(body.get('phone_number', ''))),
+                          contact_name=str(body.get('contact_name', '')))
+        async with self.__lock:
+            if find_contact_by_phone(dict_contacts=self.__storage, phone_number=contact.phone_number) is not None:
+                return 409, {'error': 'ContactExistInFileDBase', 'phone_number': contact.phone_number}
+            self.__storage.add(contact)
+            METRICS.inc('contacts.added')
+        await self.__saved()
+        return 201, ContactBookServer.contact_json(contact)
+
+    async def __edit(self, phone_number: str, body: dict) -> tuple:
+        async with self.__lock:
+            contact = find_contact_by_phone(dict_contacts=self.__storage, phone_number=phone_number)
+            if contact is None:
+                return 404, {'error': 'ContactNotFound', 'phone_number': phone_number}
+            contact = Contact(phone_number=contact.phone_number, contact_name=str(body.get('contact_name', '')),
+                              date_time_creation_contact=contact.date_time_creation_contact)
+            self.__storage.edit(contact)
+            METRICS.inc('contacts.edited')
+        await self.__saved()
+        return 200, ContactBookServer.contact_json(contact)
+
+    async def __remove(self, phone_number: str) -> tuple:
+        async with self.__lock:
+            contact = find_contact_by_phone(dict_contacts=self.__storage, phone_number=phone_number)
+            if contact is None:
+                return 404, {'error': 'ContactNotFound', 'phone_number': phone_number}
+            self.__storage.remove(contact)
+            METRICS.inc('contacts.removed')
+        await self.__saved()
+        return 200, ContactBookServer.contact_json(contact)
+
+    def __find(self, query: dict) -> tuple:
+        """found contacts or page of all contacts, only first count of them in order of names are returned,
+        because json of thousands of contacts blocks event loop for all clients"""
+        count = int(query.get('count', get_tuning_value('num_of_lines')))
+        if 'name' in query:
+            contacts = find_contact_by_name_(storage=self.__storage, contact_name=query['name'])
+        elif 'phone_part' in query:
+            contacts = find_contact_by_phone_part(storage=self.__storage, phone_part=query['phone_part'])
+        else:
+            contacts = self.__storage.page_of_contacts(start=int(query.get('start', 0)), count=count)
+            return 200, {'total': len(self.__storage),
+                         'contacts': list(map(ContactBookServer.contact_json, contacts))}
+
+        return 200, {'total': len(contacts),
+                     'contacts': list(map(ContactBookServer.contact_json,
+                                          heapq.nsmallest(count, contacts, key=SortedContacts.key)))}
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> tuple:
+        """status and json result of request:
+        GET /contacts/<phone>, GET /contacts?name=|phone_part=|start=[&count=], POST /contacts,
+        PUT /contacts/<phone>, DELETE /contacts/<phone>, GET /metrics"""
+        import urllib.parse
+
+        url = urllib.parse.urlsplit(target)
+        path = [urllib.parse.unquote(i) for i in url.path.strip('/').split('/')]
+        query = {name: value for name, value in urllib.parse.parse_qsl(url.query)}
+        try:
+            await self.__readable.wait()  # storage is not changed by thread of save while it is read
+            now = time.monotonic()
+            if now - self.__refreshed >= self.__flush_interval and not self.__lock.locked():
+                self.__refreshed = now
+                self.__storage.refresh()  # changes saved by other processes
+
+            body = json.loads(body) if body else {}
+            if not isinstance(body, dict):
+                raise ValueError('body is not json object')
+
+            match method, path:
+                case 'GET', ['contacts', phone_number]:
+                    contact = find_contact_by_phone(dict_contacts=self.__storage, phone_number=phone_number)
+                    if contact is None:
+                        return 404, {'error': 'ContactNotFound', 'phone_number': phone_number}
+                    return 200, ContactBookServer.contact_json(contact)
+                case 'GET', ['contacts']:
+                    return self.__find(query)
+                case 'POST', ['contacts']:
+                    return await self.__add(body)
+                case 'PUT', ['contacts', phone_number]:
+                    return await self.__edit(phone_number, body)
+                case 'DELETE', ['contacts', phone_number]:
+                    return await self.__remove(phone_number)
+                case 'GET', ['metrics']:
+                    return 200, METRICS.dict
+                case _, ['contacts'] | ['contacts', _] | ['metrics']:
+                    return 405, {'error': 'MethodNotAllowed'}
+                case _:
+                    return 404, {'error': 'NotFound'}
+        except ExceptionContactBook as error:
+            return 400, {'error': type(error).__name__, 'message': str(error)}
+        except ValueError as error:  # json and numbers of query
+            return 400, {'error': 'BadRequest', 'message': str(error)}
+        except Exception as error:
+            return 500, {'error': type(error).__name__, 'message': str(error)}
+
+    async def handle(self, reader, writer) -> None:
+        """http/1.1 connection with keep-alive, requests of connection are served in order"""
+        import asyncio
+        import http
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+
+                headers: dict = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+
+                start = time.perf_counter_ns()
+                status, result = await self.dispatch(method=method, target=target, body=body)
+                METRICS.observe(f'server.{method.lower()}', time.perf_counter_ns() - start)
+                self.__count_requests += 1
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                payload = json.dumps(result, ensure_ascii=False).encode('utf-8')
+                writer.write(f'HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n'
+                             f'Content-Type: application/json; charset=utf-8\r\n'
+                             f'Content-Length: {len(payload)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1')
+                             + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # broken connection or request, it is closed
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = None, port: int = None) -> None:
+        """serve until SIGTERM or cancel, changes which are not saved yet are saved by caller"""
+        import asyncio
+        import signal
+
+        host = get_tuning_value('server_host') if host is None else host
+        port = get_tuning_value('server_port') if port is None else port
+
+        stop = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, AttributeError):  # signals of event loop are not supported on Windows
+            pass
+
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f'serve contact book {self.__storage} on http://{host}:{port}')
+        async with server:
+            await stop.wait()
+        if self.__tasks:
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+
+
+def cli_contacts(contacts) -> list:
+    return [contact.dict[contact.phone_number] for contact in contacts]
+
+
+def cli_add(args) -> tuple:
+    contact = Contact(phone_number=normalize_phone_number(args.phone_number), contact_name=args.contact_name)
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        if find_contact_by_phone(dict_contacts=storage, phone_number=contact.phone_number) is not None:
+            raise ContactExistInFileDBase(f'contact with phone {contact.phone_number} exists')
+        storage.add(contact)
+        storage.save()
+    return 0, cli_contacts((contact,))
+
+
+def cli_find_phone(args) -> tuple:
+    if args.part:
+        with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+            contacts = sorted(find_contact_by_phone_part(storage=storage, phone_part=args.phone_number),
+                              key=SortedContacts.key)
+    else:
+        storage_class, path_to_file_dbase = get_storage(storage=args.storage, path_to_file_dbase=args.dbase)
+        contact = storage_class.lookup(path_to_file_dbase=path_to_file_dbase, phone_number=args.phone_number)
+        contacts = () if contact is None else (contact,)
+    return (0 if contacts else 1), cli_contacts(contacts)
+
+
+def cli_find_name(args) -> tuple:
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        contacts = sorted(find_contact_by_name_(storage=storage, contact_name=args.contact_name),
+                          key=SortedContacts.key)
+    return (0 if contacts else 1), cli_contacts(contacts)
+
+
+def cli_list(args) -> tuple:
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        count = len(storage) if args.count is None else args.count
+        return 0, cli_contacts(storage.page_of_contacts(start=args.start, count=count))
+
+
+def cli_remove(args) -> tuple:
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        contact = find_contact_by_phone(dict_contacts=storage, phone_number=args.phone_number)
+        if contact is None:
+            raise ContactNotFound(f'contact with phone {args.phone_number} is not found')
+        storage.remove(contact)
+        storage.save()
+    return 0, cli_contacts((contact,))
+
+
+def cli_edit(args) -> tuple:
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        contact = find_contact_by_phone(dict_contacts=storage, phone_number=args.phone_number)
+        if contact is None:
+            raise ContactNotFound(f'contact with phone {args.phone_number} is not found')
+        contact = Contact(phone_number=contact.phone_number, contact_name=args.contact_name,
+                          date_time_creation_contact=contact.date_time_creation_contact)
+        storage.edit(contact)
+        storage.save()
+    return 0, cli_contacts((contact,))
+
+
+def cli_backup(args) -> tuple:
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        path_to_file = full_backup_dbase(dbase_dict=storage.contacts(),
+                                         path_to_file_dbase=args.output,
+                                         compression=args.compression,
+                                         differential=args.differential)
+    return 0, {'path': str(path_to_file)}
+
+
+def cli_import(args) -> tuple:
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        cnt_added, cnt_duplicates, cnt_rejects = import_contacts(storage=storage,
+                                                                 path_to_file_import=args.path,
+                                                                 processes=args.processes)
+        if cnt_added > 0:
+            storage.save()
+    return 0, {'added': cnt_added, 'duplicates': cnt_duplicates, 'rejects': cnt_rejects}
+
+
+def cli_dedupe(args) -> tuple:
+    """groups of duplicates to report, with --apply groups with score not less than tuning dedupe_auto_merge
+    are merged"""
+    auto_merge = get_tuning_value('dedupe_auto_merge')
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        cnt_groups, cnt_merged = dedupe_contacts(storage=storage,
+                                                 path_to_file_report=args.report,
+                                                 decide=(lambda score, contacts, merged: score >= auto_merge)
+                                                 if args.apply else None,
+                                                 threshold=args.threshold)
+        if cnt_merged > 0:
+            storage.save()
+    return 0, {'groups': cnt_groups, 'merged': cnt_merged}
+
+
+def cli_memory(args) -> tuple:
+    """memory report of storage, with --indexes after build of indexes by searches,
+    with --tracemalloc allocations are traced from open of storage"""
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        if args.indexes:
+            storage.find_by_name(contact_name='a')
+            storage.find_by_phone_part(phone_part='1')
+            storage.page_of_contacts(start=0, count=1)
+        return 0, memory_report(storage=storage, top=args.top)
+
+
+def cli_export(args) -> tuple:
+    """contacts in order of names to csv file, which can be imported back, or to json file by suffix"""
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        contacts = storage.page_of_contacts(start=0, count=len(storage))
+
+    path_to_file_tmp = pathlib.Path(f'{args.path}.tmp')
+    with open(path_to_file_tmp, 'w', encoding='utf-8', newline='') as fe:
+        if args.path.suffix.lower() == '.json':
+            json.dump(cli_contacts(contacts), fe, ensure_ascii=False, indent=4)
+        else:
+            writer = csv.writer(fe)
+            writer.writerow(('name', 'phone', 'date_time_creation'))
+            writer.writerows((contact.contact_name, contact.phone_number, contact.str_date_time_creation_contact)
+                             for contact in contacts)
+        fe.flush()
+        os.fsync(fe.fileno())
+    replace_file(path_to_file_tmp=path_to_file_tmp, path_to_file=args.path)
+    return 0, {'path': str(args.path), 'contacts': len(contacts)}
+
+
+def cli_serve(args) -> tuple:
+    import asyncio
+
+    with open_storage(storage=args.storage, path_to_file_dbase=args.dbase) as storage:
+        server = ContactBookServer(storage=storage)
+        try:
+            asyncio.run(server.serve(host=args.host, port=args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            storage.save()
+    return 0, {'requests': server.count_requests}
+
+
+def cli(argv: list = None) -> int:
+    """non-interactive commands of contact book, result is printed as json to stdout, messages to stderr;
+    exit code is 0 on success, 1 when contact is not found or command is failed, 2 on wrong arguments"""
+    parser = argparse.ArgumentParser(prog='ContactBook.py', description=cli.__doc__)
+    parser.add_argument('--storage', choices=sorted(STORAGES), help='storage of contact book, default from tuning')
+    parser.add_argument('--dbase', type=pathlib.Path, help='path to dbase, default in directory of contact book')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('add', help='add contact')
+    command.add_argument('phone_number')
+    command.add_argument('contact_name')
+    command.set_defaults(func=cli_add)
+
+    command = commands.add_parser('find-phone', help='find contact by phone without load of all contacts')
+    command.add_argument('phone_number')
+    command.add_argument('--part', action='store_true',
+                         help='phone_number is last digits (6789) or beginning with "*" (+7912*)')
+    command.set_defaults(func=cli_find_phone)
+
+    command = commands.add_parser('find-name', help='find contacts by part of name')
+    command.add_argument('contact_name')
+    command.set_defaults(func=cli_find_name)
+
+    command = commands.add_parser('list', help='contacts in order of names')
+    command.add_argument('--start', type=int, default=0)
+    command.add_argument('--count', type=int)
+    command.set_defaults(func=cli_list)
+
+    command = commands.add_parser('remove', help='remove contact by phone')
+    command.add_argument('phone_number')
+    command.set_defaults(func=cli_remove)
+
+    command = commands.add_parser('edit', help='change name of contact by phone')
+    command.add_argument('phone_number')
+    command.add_argument('contact_name')
+    command.set_defaults(func=cli_edit)
+
+    command = commands.add_parser('backup', help='backup contact book to json')
+    command.add_argument('--output', type=pathlib.Path, help='path to backup, default in directory of contact book')
+    command.add_argument('--compression', choices=[i for i in BACKUP_COMPRESSIONS if i is not None])
+    command.add_argument('--differential', action='store_true')
+    command.set_defaults(func=cli_backup)
+
+    command = commands.add_parser('import', help='import contacts from csv or vcard file')
+    command.add_argument('path', type=pathlib.Path)
+    command.add_argument('--processes', type=int)
+    command.set_defaults(func=cli_import)
+
+    command = commands.add_parser('dedupe', help='find duplicates of contacts and report them to csv file')
+    command.add_argument('--report', type=pathlib.Path, help='path to report, default in directory of contact book')
+    command.add_argument('--threshold', type=float, help='the lowest score of pair of duplicates from 0 to 1')
+    command.add_argument('--apply', action='store_true', help='merge groups with score of tuning dedupe_auto_merge')
+    command.set_defaults(func=cli_dedupe)
+
+    command = commands.add_parser('memory', help='bytes of contacts and indexes in memory')
+    command.add_argument('--indexes', action='store_true', help='build indexes by searches before report')
+    command.add_argument('--tracemalloc', action='store_true', help='trace allocations from open of storage')
+    command.add_argument('--top', type=int, default=10, help='count of the biggest types and lines of code')
+    command.set_defaults(func=cli_memory)
+
+    command = commands.add_parser('export', help='export contacts to csv file or to json file by suffix .json')
+    command.add_argument('path', type=pathlib.Path)
+    command.set_defaults(func=cli_export)
+
+    command = commands.add_parser('serve', help='http/json service over contact book, see ContactBookServer')
+    command.add_argument('--host')
+    command.add_argument('--port', type=int)
+    command.set_defaults(func=cli_serve)
+
+    args = parser.parse_args(argv)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):  # progress and messages are not mixed with result
+            code, result = args.func(args)
+    except (ExceptionContactBook, OSError, csv.Error, UnicodeDecodeError) as error:
+        print(json.dumps({'error': type(error).__name__, 'message': str(error)}, ensure_ascii=False),
+              file=sys.stderr)
+        return 1
+
+    print(json.dumps(result, ensure_ascii=False))
+    return code
+
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sys.exit(cli())
     main()
@@ -0,0 +1,7 @@
+"""benchmarks of hot paths of contact book, run them by: python -m benchmarks --help"""
+import pathlib
+import sys
+
+ROOT = str(pathlib.Path(__file__).resolve().parent.parent)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
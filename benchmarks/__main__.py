@@ -0,0 +1,67 @@
+"""runner of benchmarks: every benchmark runs in own process, results are written as json"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import pathlib
+import platform
+import sys
+
+from benchmarks import suite
+
+
+def run_isolated(name: str, size: int, use_tracemalloc: bool) -> dict:
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(suite.run_benchmark, (name, size, use_tracemalloc))
+
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """results slower than baseline more than threshold"""
+    base = {(i['benchmark'], i['size']): i for i in baseline['results']}
+    regressions = []
+    for result in results:
+        old = base.get((result['benchmark'], result['size']))
+        if old is not None and result['seconds'] > old['seconds'] * (1 + threshold):
+            regressions.append({**result, 'baseline_seconds': old['seconds']})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                        help='counts of contacts, from 10k to 10M')
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(suite.BENCHMARKS), default=sorted(suite.BENCHMARKS))
+    parser.add_argument('--output', type=pathlib.Path, default=pathlib.Path('bench-results.json'))
+    parser.add_argument('--compare', type=pathlib.Path, help='json results of previous run')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown against previous run')
+    parser.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for name in args.benchmarks:
+            result = run_isolated(name, size, args.tracemalloc)
+            results.append(result)
+            print(f'{name:>24} {size:>10}: {result["seconds"]:9.3f} s, {result["ops_per_sec"]:>12,.0f} ops/sec, '
+                  f'rss {(result["setup_rss_bytes"] or 0) / 2 ** 20:8.1f} MiB '
+                  f'+{(result["peak_rss_increase_bytes"] or 0) / 2 ** 20:8.1f} MiB by run')
+
+    with open(args.output, 'w') as fr:
+        json.dump({'meta': {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                            'python': platform.python_version(),
+                            'platform': platform.platform(),
+                            'sizes': args.sizes},
+                   'results': results}, fr, indent=4)
+    print(f'results: {args.output}')
+
+    if args.compare is not None:
+        with open(args.compare) as fb:
+            regressions = compare(results, json.load(fb), args.threshold)
+        for i in regressions:
+            print(f'REGRESSION {i["benchmark"]} {i["size"]}: {i["seconds"]:.3f} s, was {i["baseline_seconds"]:.3f} s')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
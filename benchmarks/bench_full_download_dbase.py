@@ -0,0 +1,74 @@
+"""benchmark of full_download_dbase: rows/sec of current loader against the legacy two-pass loader"""
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import ContactBook  # noqa: E402
+from benchmarks import generator  # noqa: E402
+
+
+def legacy_full_download_dbase(path_to_file_dbase: pathlib.Path) -> dict:
+    """loader as it was before the single-pass streaming loader"""
+    base_dict: dict = {}
+    mask = ContactBook.Contact.mask_date_time_creation()
+
+    with open(path_to_file_dbase, 'r') as fb:
+        len_fb = sum(1 for _ in fb)
+        mark_print = ContactBook.get_mark_print(len_fb)
+
+    cnt_rows = 0
+    with open(path_to_file_dbase, 'r') as fb:
+        for rec in fb:
+            contact = rec.rstrip('\n').split(ContactBook.get_tuning_value('sep_in_dbase'))
+            base_dict[contact[0]] = ContactBook.Contact(phone_number=contact[0],
+                                                        contact_name=contact[1],
+                                                        date_time_creation_contact=datetime.datetime.strptime(
+                                                            contact[2], mask),
+                                                        validate=False)
+            cnt_rows += 1
+            if (len_fb // mark_print) >= 2 and cnt_rows % mark_print == 0:
+                print(f'download {cnt_rows} rows')
+
+    return base_dict
+
+
+def measure(func, path_to_file_dbase: pathlib.Path) -> float:
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        func(path_to_file_dbase)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path_to_file_dbase = pathlib.Path(tmp_dir) / 'contact-book.dbase'
+        generator.write_dbase(path_to_file_dbase, count=args.rows, legacy=True)
+        print(f'rows: {args.rows}, size: {os.path.getsize(path_to_file_dbase)} bytes')
+
+        loaders = (('legacy', legacy_full_download_dbase),
+                   ('streaming', lambda path: ContactBook.full_download_dbase(path_to_file_dbase=path)))
+
+        results = {}
+        for name, func in loaders:
+            best = min(measure(func, path_to_file_dbase) for _ in range(args.repeat))
+            results[name] = args.rows / best
+            print(f'{name:>10}: {best:.3f} s, {results[name]:,.0f} rows/sec')
+
+        print(f'gain: {results["streaming"] / results["legacy"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""deterministic generator of synthetic contacts for benchmarks"""
+import datetime
+import pathlib
+import random
+
+import ContactBook
+
+FIRST_NAMES = ('Ivan', 'Anna', 'Maria', 'Petr', 'Olga', 'Sergey', 'Elena', 'Dmitry', 'Natalia', 'Alexey',
+               'Иван', 'Анна', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена', 'Дмитрий', 'Наталья', 'Алексей')
+LAST_NAMES = ('Ivanov', 'Smirnov', 'Kuznetsov', 'Popov', 'Vasiliev', 'Sokolov', 'Mikhailov', 'Novikov',
+              'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов', 'Михайлов', 'Новиков')
+PHONE_FORMATS = ('+7{}', '8{}', '{}', '+44{}', '+1{}')
+START = datetime.datetime(2010, 1, 1)
+SPREAD_SECONDS = 16 * 365 * 24 * 3600
+
+
+def homoglyph(name: str, rnd: random.Random) -> str:
+    """sometimes replace cyrillic symbol of name by latin look-alike, like people do on wrong keyboard"""
+    look_alike = {'а': 'a', 'е': 'e', 'о': 'o', 'р': 'p', 'с': 'c', 'А': 'A', 'Е': 'E', 'О': 'O'}
+    if rnd.random() < 0.1:
+        return ''.join(look_alike.get(i, i) if rnd.random() < 0.5 else i for i in name)
+    return name
+
+
+def generate_rows(count: int, seed: int = 0):
+    """rows (phone number, contact name, date time creation) with unique phone numbers"""
+    rnd = random.Random(seed)
+    for i in range(count):
+        number = (i * 7_919_633 + 104_729) % 10 ** 10  # permutation of numbers, so phones are unique
+        phone_number = PHONE_FORMATS[i % len(PHONE_FORMATS)].format(f'{number:010d}')
+        contact_name = f'{homoglyph(rnd.choice(FIRST_NAMES), rnd)} {homoglyph(rnd.choice(LAST_NAMES), rnd)}'
+        if rnd.random() < 0.3:
+            contact_name += f' {rnd.randrange(1000)}'
+        yield phone_number, contact_name, START + datetime.timedelta(seconds=rnd.randrange(SPREAD_SECONDS))
+
+
+def generate_contacts(count: int, seed: int = 0) -> dict:
+    return {phone_number: ContactBook.Contact(phone_number=phone_number,
+                                              contact_name=contact_name,
+                                              date_time_creation_contact=date_time_creation,
+                                              validate=False)
+            for phone_number, contact_name, date_time_creation in generate_rows(count=count, seed=seed)}
+
+
+def write_dbase(path_to_file_dbase: pathlib.Path, count: int, seed: int = 0, legacy=False) -> pathlib.Path:
+    """stream synthetic contacts to text dbase, legacy dbase has not header and checksums"""
+    encoding = ContactBook.get_tuning_value('encoding_dbase')
+    with open(path_to_file_dbase, 'wb') as fb:
+        if not legacy:
+            fb.write(ContactBook.header_dbase(version=ContactBook.get_tuning_value('version_dbase'),
+                                              encoding=encoding))
+        for phone_number, contact_name, date_time_creation in generate_rows(count=count, seed=seed):
+            rec = (f'{phone_number};{ContactBook.escape_field(contact_name)};'
+                   f'{date_time_creation.strftime(ContactBook.Contact.mask_date_time_creation())}')
+            fb.write(f'{rec}\n'.encode(encoding) if legacy
+                     else ContactBook.checksum_record_dbase(rec, encoding=encoding))
+
+    return pathlib.Path(path_to_file_dbase)
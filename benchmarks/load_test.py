@@ -0,0 +1,161 @@
+"""load test of http service of contact book: requests/sec and latency percentiles by kind of request,
+run it by: python -m benchmarks.load_test --help"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+import ContactBook
+from benchmarks import generator
+
+KINDS = ('lookup', 'search', 'page', 'write')
+
+
+async def request(reader, writer, method: str, target: str, body: dict = None) -> tuple:
+    """status and json of response on keep-alive connection"""
+    target = urllib.parse.quote(target, safe='/?=&')
+    payload = b'' if body is None else json.dumps(body).encode('utf-8')
+    writer.write(f'{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n\r\n'
+                 .encode('latin-1') + payload)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def worker(host: str, port: int, deadline: float, mix: list, phones: list, histograms: dict,
+                 errors: dict, seed: int) -> None:
+    rnd = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind = rnd.choices(KINDS, weights=mix)[0]
+            start = time.perf_counter_ns()
+            if kind == 'lookup':
+                status, _ = await request(reader, writer, 'GET', f'/contacts/{rnd.choice(phones)}')
+            elif kind == 'search':
+                name = rnd.choice(generator.FIRST_NAMES + generator.LAST_NAMES)[:rnd.randrange(3, 7)]
+                status, _ = await request(reader, writer, 'GET', f'/contacts?name={name}')
+            elif kind == 'page':
+                status, _ = await request(reader, writer, 'GET', f'/contacts?start={rnd.randrange(len(phones))}')
+            else:  # add and remove of new contact, both are waiting for save to disk
+                phone_number = f'+999{rnd.randrange(10 ** 9):09d}'
+                status, _ = await request(reader, writer, 'POST', '/contacts',
+                                          {'phone_number': phone_number, 'contact_name': 'Load Test'})
+                if status == 201:
+                    status, _ = await request(reader, writer, 'DELETE', f'/contacts/{phone_number}')
+            histograms[kind].record(time.perf_counter_ns() - start)
+            if status >= 400:
+                errors[kind] = errors.get(kind, 0) + 1
+    finally:
+        writer.close()
+
+
+async def load(host: str, port: int, connections: int, seconds: float, mix: list) -> tuple:
+    reader, writer = await asyncio.open_connection(host, port)
+    status, result = await request(reader, writer, 'GET', '/contacts?start=0&count=10000')
+    writer.close()
+    phones = [contact['phone_number'] for contact in result['contacts']]
+    if not phones:
+        raise SystemExit('contact book of service is empty')
+
+    histograms = {kind: ContactBook.Histogram() for kind in KINDS}
+    errors: dict = {}
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(worker(host, port, deadline, mix, phones, histograms, errors, seed)
+                           for seed in range(connections)))
+    return time.perf_counter() - start, histograms, errors
+
+
+def free_port() -> int:
+    with contextlib.closing(socket.socket()) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def spawn_server(size: int, storage: str):
+    """service in new process over generated contact book in temporary directory"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path_to_file_dbase = generator.write_dbase(pathlib.Path(tmp_dir) / 'contact-book.dbase', count=size)
+        if storage != 'text':
+            path_to_file_dbase = path_to_file_dbase.with_suffix(ContactBook.STORAGES[storage].suffix)
+        port = free_port()
+        process = subprocess.Popen([sys.executable, ContactBook.__file__, '--storage', storage,
+                                    '--dbase', str(path_to_file_dbase), 'serve', '--port', str(port)],
+                                   env={**os.environ, 'HOME': tmp_dir},
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.perf_counter() + 120
+            while True:
+                with contextlib.suppress(OSError), socket.create_connection(('127.0.0.1', port), timeout=1):
+                    break
+                if process.poll() is not None or time.perf_counter() > deadline:
+                    raise SystemExit(f'service is not started, exit code {process.returncode}')
+                time.sleep(0.1)
+            yield '127.0.0.1', port
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load_test', description=__doc__)
+    parser.add_argument('--url', help='host:port of running service, by default service is started '
+                                      'over generated contact book')
+    parser.add_argument('--size', type=int, default=100_000, help='count of contacts of started service')
+    parser.add_argument('--storage', choices=sorted(ContactBook.STORAGES), default='text')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--mix', type=int, nargs=4, default=[80, 10, 5, 5],
+                        metavar=('LOOKUP', 'SEARCH', 'PAGE', 'WRITE'), help='weights of kinds of requests')
+    parser.add_argument('--output', type=pathlib.Path, help='json results')
+    args = parser.parse_args()
+
+    if args.url:
+        host, _, port = args.url.rpartition(':')
+        server = contextlib.nullcontext((host, int(port)))
+    else:
+        server = spawn_server(size=args.size, storage=args.storage)
+
+    with server as (host, port):
+        seconds, histograms, errors = asyncio.run(load(host, port, args.connections, args.seconds, args.mix))
+
+    total = sum(histogram.count for histogram in histograms.values())
+    print(f'{total} requests in {seconds:.1f} s by {args.connections} connections: '
+          f'{total / seconds:,.0f} requests/sec')
+    for kind, histogram in histograms.items():
+        if histogram.count:
+            print(f'{kind:>8}: {histogram.count:>9} requests, errors {errors.get(kind, 0)}, '
+                  f'p50 {histogram.percentile(50) / 1e6:8.2f} ms, p90 {histogram.percentile(90) / 1e6:8.2f} ms, '
+                  f'p99 {histogram.percentile(99) / 1e6:8.2f} ms, max {histogram.max / 1e6:8.2f} ms')
+
+    if args.output is not None:
+        with open(args.output, 'w') as fr:
+            json.dump({'seconds': seconds,
+                       'connections': args.connections,
+                       'requests_per_sec': total / seconds,
+                       'errors': errors,
+                       'latency_ns': {kind: histogram.dict for kind, histogram in histograms.items()}}, fr, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""benchmarks of hot paths: each returns count of operations, setup is done before timer is started"""
+import contextlib
+import datetime
+import io
+import pathlib
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import ContactBook
+from benchmarks import generator
+
+QUERIES = 10_000
+COLD_STARTS = 10
+
+
+def bench_full_download_dbase(size: int, tmp_dir: pathlib.Path):
+    path_to_file_dbase = generator.write_dbase(tmp_dir / 'contact-book.dbase', count=size)
+    return lambda: len(ContactBook.full_download_dbase(path_to_file_dbase=path_to_file_dbase)[0])
+
+
+def bench_full_upload_dbase(size: int, tmp_dir: pathlib.Path):
+    contacts = generator.generate_contacts(count=size)
+
+    def run():
+        ContactBook.full_upload_dbase(dbase_dict=contacts, path_to_file_dbase=tmp_dir / 'contact-book.dbase')
+        return size
+    return run
+
+
+def bench_full_download_sharded(size: int, tmp_dir: pathlib.Path):
+    """load of dbase of 16 shards by process pool of all cores"""
+    path_to_file_dbase = tmp_dir / 'contact-book.dbase'
+    ContactBook.full_upload_dbase(dbase_dict=generator.generate_contacts(count=size),
+                                  path_to_file_dbase=path_to_file_dbase, shards=16)
+    return lambda: len(ContactBook.full_download_dbase(path_to_file_dbase=path_to_file_dbase,
+                                                       processes=os.cpu_count())[0])
+
+
+def bench_save_dirty_shards(size: int, tmp_dir: pathlib.Path):
+    """rewrite of dbase of 64 shards after change of 10 contacts, only their shards are written"""
+    path_to_file_dbase = tmp_dir / 'contact-book.dbase'
+    contacts = generator.generate_contacts(count=size)
+    ContactBook.full_upload_dbase(dbase_dict=contacts, path_to_file_dbase=path_to_file_dbase, shards=64)
+    changed_phone_numbers = set(random.Random(1).sample(list(contacts), k=10))
+
+    def run():
+        ContactBook.full_upload_dbase(dbase_dict=contacts, path_to_file_dbase=path_to_file_dbase, shards=64,
+                                      changed_phone_numbers=changed_phone_numbers)
+        return size
+    return run
+
+
+def bench_full_backup_dbase(size: int, tmp_dir: pathlib.Path):
+    contacts = generator.generate_contacts(count=size)
+
+    def run():
+        ContactBook.full_backup_dbase(dbase_dict=contacts, path_to_file_dbase=tmp_dir / 'contact-book.backup')
+        return size
+    return run
+
+
+def bench_name_index(size: int, tmp_dir: pathlib.Path):
+    """build of name index, it replaced create_cash_names"""
+    contacts = generator.generate_contacts(count=size)
+
+    def run():
+        ContactBook.NameIndex(dict_contacts=contacts)
+        return size
+    return run
+
+
+def bench_find_contact_by_name_(size: int, tmp_dir: pathlib.Path):
+    path_to_file_dbase = generator.write_dbase(tmp_dir / 'contact-book.dbase', count=size)
+    storage = ContactBook.TextStorage(path_to_file_dbase=path_to_file_dbase)
+    rnd = random.Random(1)
+    queries = [rnd.choice(generator.FIRST_NAMES + generator.LAST_NAMES)[:rnd.randrange(2, 7)]
+               for _ in range(QUERIES)]
+    storage.find_by_name(queries[0])  # build of index is measured by bench_name_index
+
+    def run():
+        for query in queries:
+            ContactBook.find_contact_by_name_(storage=storage, contact_name=query)
+        return len(queries)
+    return run
+
+
+def bench_find_by_name_budget(size: int, tmp_dir: pathlib.Path):
+    """search by name when budget of indexes is a quarter of name index, cold segments are evicted
+    and rebuilt on demand"""
+    path_to_file_dbase = generator.write_dbase(tmp_dir / 'contact-book.dbase', count=size)
+    storage = ContactBook.TextStorage(path_to_file_dbase=path_to_file_dbase)
+    rnd = random.Random(1)
+    queries = [rnd.choice(generator.FIRST_NAMES + generator.LAST_NAMES)[:rnd.randrange(2, 7)]
+               for _ in range(QUERIES // 10)]
+    storage.find_by_name(queries[0])
+    quarter = ContactBook.INDEX_BUDGET.used // 4
+
+    def run():
+        budget, ContactBook.INDEX_BUDGET.budget = ContactBook.INDEX_BUDGET.budget, quarter
+        try:
+            for query in queries:
+                ContactBook.find_contact_by_name_(storage=storage, contact_name=query)
+        finally:
+            ContactBook.INDEX_BUDGET.budget = budget
+        return len(queries)
+    return run
+
+
+def bench_find_by_filter(size: int, tmp_dir: pathlib.Path):
+    """filter by part of name and month of creation, planner starts from the most selective index"""
+    path_to_file_dbase = generator.write_dbase(tmp_dir / 'contact-book.dbase', count=size)
+    storage = ContactBook.TextStorage(path_to_file_dbase=path_to_file_dbase)
+    dates = sorted(contact.date_time_creation_contact for contact in storage.contacts().values())
+    rnd = random.Random(1)
+    filters = []
+    for _ in range(QUERIES // 10):
+        date_from = rnd.choice(dates)
+        filters.append(ContactBook.ContactFilter(
+            contact_name=rnd.choice(generator.FIRST_NAMES + generator.LAST_NAMES)[:rnd.randrange(2, 7)],
+            date_from=date_from,
+            date_to=date_from + datetime.timedelta(days=30)))
+    list(storage.find_by_filter(filters[0]))  # build of indexes is not measured
+
+    def run():
+        for contact_filter in filters:
+            for _ in ContactBook.find_contact_by_filter(storage=storage, contact_filter=contact_filter):
+                pass
+        return len(filters)
+    return run
+
+
+def bench_find_duplicates(size: int, tmp_dir: pathlib.Path):
+    """pairs of duplicates by blocks of phones, names and trigrams of names, threshold 0.5 takes
+    blocks by names into account"""
+    contacts = generator.generate_contacts(count=size)
+
+    def run():
+        finder = ContactBook.DuplicateFinder(dict_contacts=contacts, threshold=0.5)
+        for _ in finder.pairs():
+            pass
+        return len(finder.groups())
+    return run
+
+
+def bench_find_contact_by_phone(size: int, tmp_dir: pathlib.Path):
+    contacts = generator.generate_contacts(count=size)
+    rnd = random.Random(1)
+    phones = rnd.choices(list(contacts), k=QUERIES)
+
+    def run():
+        for phone_number in phones:
+            ContactBook.find_contact_by_phone(dict_contacts=contacts, phone_number=phone_number)
+        return len(phones)
+    return run
+
+
+def bench_cold_find_phone(size: int, tmp_dir: pathlib.Path):
+    """start of new process for find-phone command, target is to be near start of bare interpreter"""
+    path_to_file_dbase = generator.write_dbase(tmp_dir / 'contact-book.dbase', count=size)
+    contacts = generator.generate_contacts(count=size)
+    rnd = random.Random(1)
+    phones = rnd.choices(list(contacts), k=COLD_STARTS)
+    env = {**os.environ, 'HOME': str(tmp_dir)}
+
+    def run():
+        for phone_number in phones:
+            subprocess.run([sys.executable, ContactBook.__file__, '--dbase', str(path_to_file_dbase),
+                            'find-phone', phone_number], env=env, check=True, capture_output=True)
+        return len(phones)
+    return run
+
+
+def bench_sorted_contacts(size: int, tmp_dir: pathlib.Path):
+    """build of sorted order of contacts, it replaced sorted_dict_contacts"""
+    contacts = generator.generate_contacts(count=size)
+    return lambda: len(ContactBook.SortedContacts(dict_contacts=contacts))
+
+
+def bench_page_of_contacts(size: int, tmp_dir: pathlib.Path):
+    """random pages of listing with add and remove of contact between them"""
+    path_to_file_dbase = generator.write_dbase(tmp_dir / 'contact-book.dbase', count=size)
+    storage = ContactBook.TextStorage(path_to_file_dbase=path_to_file_dbase)
+    rnd = random.Random(1)
+    starts = [rnd.randrange(size) for _ in range(QUERIES)]
+    contacts = [contact for contact in generator.generate_contacts(count=QUERIES, seed=1).values()
+                if storage.get(contact.phone_number) is None]
+    storage.page_of_contacts(start=0, count=10)  # build of sorted order is measured by bench_sorted_contacts
+
+    def run():
+        for start, contact in zip(starts, contacts):
+            storage.add(contact)
+            storage.page_of_contacts(start=start, count=10)
+            storage.remove(contact)
+        return len(starts)
+    return run
+
+
+def bench_warm_start(size: int, tmp_dir: pathlib.Path):
+    """open of text storage and first search by name when snapshot of previous run is valid"""
+    path_to_file_dbase = generator.write_dbase(tmp_dir / 'contact-book.dbase', count=size)
+    with ContactBook.TextStorage(path_to_file_dbase=path_to_file_dbase) as storage:
+        storage.find_by_name('a')  # name index is written to snapshot on close
+
+    def run():
+        with ContactBook.TextStorage(path_to_file_dbase=path_to_file_dbase) as storage:
+            storage.find_by_name('a')
+        return size
+    return run
+
+
+def bench_contact(size: int, tmp_dir: pathlib.Path):
+    rows = list(generator.generate_rows(count=size))
+
+    def run():
+        for phone_number, contact_name, date_time_creation in rows:
+            ContactBook.Contact(phone_number=phone_number,
+                                contact_name=contact_name,
+                                date_time_creation_contact=date_time_creation,
+                                validate=False)
+        return len(rows)
+    return run
+
+
+BENCHMARKS = {name[len('bench_'):]: func for name, func in globals().items() if name.startswith('bench_')}
+
+
+def reset_peak_rss() -> bool:
+    """peak RSS of process is reset to current RSS, it is possible only on linux"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fc:
+            fc.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_bytes() -> None | int:
+    """peak RSS of process, on linux since last reset_peak_rss"""
+    try:
+        with open('/proc/self/status') as fs:
+            for row in fs:
+                if row.startswith('VmHWM:'):
+                    return int(row.split()[1]) * 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024  # linux reports kilobytes
+
+
+def run_benchmark(name: str, size: int, use_tracemalloc: bool) -> dict:
+    """time of benchmark, RSS after setup and increase of it by run to its peak, and peak of python allocations
+    by tracemalloc; peak RSS of setup is not counted on linux, elsewhere increase is counted above it"""
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(io.StringIO()):
+        run = BENCHMARKS[name](size, pathlib.Path(tmp_dir))
+
+        reset_peak_rss()
+        setup_rss = peak_rss_bytes()
+        start = time.perf_counter()
+        operations = run()
+        seconds = time.perf_counter() - start
+        peak_rss = peak_rss_bytes()
+
+        tracemalloc_peak = None
+        if use_tracemalloc:
+            tracemalloc.start()
+            run()
+            tracemalloc_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return {'benchmark': name,
+            'size': size,
+            'seconds': seconds,
+            'operations': operations,
+            'ops_per_sec': operations / seconds if seconds else None,
+            'setup_rss_bytes': setup_rss,
+            'peak_rss_increase_bytes': (None if peak_rss is None or setup_rss is None
+                                        else max(peak_rss - setup_rss, 0)),
+            'tracemalloc_peak_bytes': tracemalloc_peak}
@@ -0,0 +1,1493 @@
+"""tests of contact book, its files are on temporary directory"""
+import csv
+import datetime
+import io
+import itertools
+import json
+import math
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+import ContactBook
+
+CREATED = datetime.datetime(2020, 1, 2, 3, 4, 5)
+
+
+def tuning(**values):
+    """patch of tuning values for test, other values are default"""
+    get_tuning_value = ContactBook.get_tuning_value
+    return unittest.mock.patch.object(ContactBook, 'get_tuning_value',
+                                      lambda name: values[name] if name in values else get_tuning_value(name))
+
+
+def contact(phone_number: str, contact_name: str) -> ContactBook.Contact:
+    return ContactBook.Contact(phone_number=phone_number, contact_name=contact_name,
+                               date_time_creation_contact=CREATED)
+
+
+class TestDBase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        home = unittest.mock.patch.dict(os.environ, {'HOME': self.tmp_dir.name})
+        home.start()
+        self.addCleanup(home.stop)
+        log = unittest.mock.patch.multiple(ContactBook.LogWriter, _LogWriter__instance=None,
+                                           _LogWriter__path_to_file_log=None)  # log of test is in its directory
+        log.start()
+        self.addCleanup(log.stop)
+        self.addCleanup(ContactBook.LogWriter.shutdown)
+        self.path_to_file_dbase = pathlib.Path(self.tmp_dir.name) / 'contact-book.dbase'
+        self.path_to_file_journal = self.path_to_file_dbase.with_suffix('.journal')
+
+    def storage(self) -> ContactBook.TextStorage:
+        storage = ContactBook.TextStorage(path_to_file_dbase=self.path_to_file_dbase)
+        self.addCleanup(storage.close)
+        return storage
+
+    def download(self, skip_bad_records=True) -> dict:
+        return ContactBook.full_download_dbase(path_to_file_dbase=self.path_to_file_dbase,
+                                               skip_bad_records=skip_bad_records)[0]
+
+    def upload(self, *contacts) -> None:
+        ContactBook.full_upload_dbase(dbase_dict={i.phone_number: i for i in contacts},
+                                      path_to_file_dbase=self.path_to_file_dbase, shards=0)
+
+    def fill(self, count: int = 20) -> tuple:
+        """file dbase of other contacts, so few changes are kept in journal without compaction"""
+        contacts = tuple(contact(f'+7495{i:07d}', f'Other {i}') for i in range(count))
+        self.upload(*contacts)
+        return contacts
+
+
+class TestLoader(TestDBase):
+
+    def test_records_across_read_blocks(self):
+        contacts = tuple(contact(f'+7495{i:07d}', 'Name ' + 'x' * (i * 7 % 40)) for i in range(50))
+        self.upload(*contacts)
+        with open(self.path_to_file_dbase, 'ab') as fb:  # the last record without end of line
+            fb.write(ContactBook.checksum_record_dbase(contact('+79120000001', 'Last').format_to_dbase,
+                                                       encoding='utf-8')[:-1])
+        expected = {i.phone_number: i for i in contacts + (contact('+79120000001', 'Last'),)}
+        for read_buffer_size in 1, 2, 7, 16, 61, 1 << 16:
+            for contacts_store in 'dict', 'columnar', 'lazy':
+                with self.subTest(read_buffer_size=read_buffer_size, contacts_store=contacts_store), \
+                        tuning(read_buffer_size=read_buffer_size, contacts_store=contacts_store), \
+                        unittest.mock.patch('sys.stdout', io.StringIO()):
+                    dict_contacts = self.download()
+                    self.assertEqual(dict(dict_contacts.items()), expected)
+                    self.assertEqual([i.contact_name for i in dict_contacts.values()],
+                                     [i.contact_name for i in expected.values()])
+
+    def test_progress(self):
+        self.fill(count=200)
+        size = self.path_to_file_dbase.stat().st_size
+        with tuning(read_buffer_size=100), unittest.mock.patch('sys.stdout', io.StringIO()) as stdout:
+            ContactBook.full_download_dbase(path_to_file_dbase=self.path_to_file_dbase, mark_print=10, processes=0)
+        marks = [line for line in stdout.getvalue().splitlines() if line.endswith('%)')]
+        percents = [int(line.rpartition('(')[2][:-2]) for line in marks]
+        rows = [int(line.split()[1]) for line in marks]
+        self.assertGreaterEqual(len(marks), 9)
+        self.assertLessEqual(len(marks), 10)
+        self.assertEqual(percents, sorted(percents))
+        self.assertEqual(rows, sorted(rows))
+        self.assertTrue(all(0 < i <= 100 for i in percents))
+        self.assertIn('total download 200 rows', stdout.getvalue())
+
+        with tuning(read_buffer_size=2 * size), unittest.mock.patch('sys.stdout', io.StringIO()) as stdout:
+            ContactBook.full_download_dbase(path_to_file_dbase=self.path_to_file_dbase, mark_print=10, processes=0)
+        self.assertNotIn('%)', stdout.getvalue())  # file is read by one block
+
+
+class TestNgramNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        budget = unittest.mock.patch.object(ContactBook, 'INDEX_BUDGET', ContactBook.MemoryBudget())
+        budget.start()
+        self.addCleanup(budget.stop)
+        self.contacts = {i.phone_number: i for i in (contact('+79120000001', 'Vano Novak'),
+                                                     contact('+79120000002', 'Ivan Vanov'),
+                                                     contact('+79120000003', 'Anna'),
+                                                     contact('+79120000004', 'Novikov'))}
+
+    def find(self, index: ContactBook.NameIndex, contact_name: str) -> list:
+        return sorted(i.phone_number for i in index.find(contact_name))
+
+    def test_grams_of_long_query_are_intersected(self):
+        index = ContactBook.NameIndex(dict_contacts=self.contacts, gram_size=3)
+        self.assertEqual(self.find(index, 'VANOV'), ['+79120000002'])  # grams of it are in 'Vano Novak' too
+        self.assertEqual(self.find(index, 'nova'), ['+79120000001'])
+        self.assertEqual(self.find(index, 'an'), ['+79120000001', '+79120000002', '+79120000003'])
+        self.assertEqual(self.find(index, 'ivanova'), [])
+        self.assertEqual(self.find(index, 'q'), [])
+        self.assertEqual(self.find(index, ''), [])
+
+        for new_contact in contact('+79120000005', 'Ivanova'), contact('+79120000006', 'Petrov'):
+            self.contacts[new_contact.phone_number] = new_contact
+            index.add(new_contact)
+        self.assertEqual(self.find(index, 'vanov'), ['+79120000002', '+79120000005'])
+        self.assertEqual(self.find(index, 'anova'), ['+79120000005'])
+
+        for phone_number in '+79120000002', '+79120000005':
+            index.remove(self.contacts.pop(phone_number))
+        self.assertEqual(self.find(index, 'vanov'), [])
+        self.assertEqual(self.find(index, 'ivan'), [])
+        self.assertEqual(self.find(index, 'van'), ['+79120000001'])
+
+    def test_all_sizes_of_grams(self):
+        queries = {name[i:j] for name in ('vano novak', 'ivan vanov', 'anna', 'novikov')
+                   for i in range(len(name)) for j in range(i + 1, len(name) + 1)}
+        queries |= {'vanova', 'kova', 'annan', 'oo', 'x'}
+        for gram_size in range(1, 5):
+            index = ContactBook.NameIndex(dict_contacts=self.contacts, gram_size=gram_size)
+            for query in sorted(queries):
+                with self.subTest(gram_size=gram_size, query=query):
+                    self.assertEqual(self.find(index, query),
+                                     sorted(phone_number for phone_number, i in self.contacts.items()
+                                            if query in i.contact_name.lower()))
+
+
+class TestSearchKey(TestDBase):
+
+    def test_search_key(self):
+        self.assertEqual(ContactBook.get_search_key('Ёлка'), 'елка')
+        self.assertEqual(ContactBook.get_search_key('AHHA Opлова'), 'анна орлова')
+        self.assertEqual(contact('+79120000001', 'Anna Orlova').search_key, ContactBook.get_search_key('Anna Orlova'))
+        self.assertTrue(ContactBook.get_eq('AHHA', 'Анна'))
+        self.assertTrue(ContactBook.get_eq('Сосна', 'cocha'))
+        self.assertFalse(ContactBook.get_eq('Anna', 'Анна'))  # latin n is not like cyrillic н
+
+    def test_latin_query_finds_cyrillic_name(self):
+        self.upload(contact('+79120000001', 'Анна Орлова'), contact('+79120000002', 'Anna Petrova'),
+                    contact('+79120000003', 'Ёжиков'), contact('+79120000004', 'Ivan'))
+        storage = self.storage()
+        for query, phone_numbers in (('ahha', ['+79120000001']),
+                                     ('AHHA', ['+79120000001']),
+                                     ('Анна', ['+79120000001']),
+                                     ('anna', ['+79120000002']),
+                                     ('PETROVA', ['+79120000002']),
+                                     ('opлoba', ['+79120000001']),
+                                     ('ежик', ['+79120000003']),
+                                     ('ivan', ['+79120000004']),
+                                     ('ahhy', [])):
+            with self.subTest(query=query):
+                self.assertEqual(sorted(i.phone_number for i in storage.find_by_name(contact_name=query)),
+                                 phone_numbers)
+
+
+class TestJournal(TestDBase):
+
+    def test_changes_are_appended_to_journal(self):
+        self.fill()
+        dbase = self.path_to_file_dbase.read_bytes()
+        storage = self.storage()
+        storage.add(contact('+79120000001', 'Ivan Petrov'))
+        storage.edit(contact('+74950000001', 'Other edited'))
+        storage.remove(storage.get('+74950000002'))
+        storage.save()
+
+        self.assertEqual(self.path_to_file_dbase.read_bytes(), dbase)
+        self.assertEqual([i[:1] for i in self.path_to_file_journal.read_bytes().splitlines()], [b'A', b'E', b'D'])
+        storage = self.storage()
+        self.assertEqual(len(storage), 20)
+        self.assertEqual(storage.get('+79120000001').contact_name, 'Ivan Petrov')
+        self.assertEqual(storage.get('+74950000001').contact_name, 'Other edited')
+        self.assertIsNone(storage.get('+74950000002'))
+
+    def test_compaction_by_count_of_records(self):
+        self.fill()
+        storage = self.storage()
+        for i in range(10):
+            storage.add(contact(f'+791200000{i:02d}', f'Ivan {i}'))
+        storage.save()
+        self.assertEqual(len(self.path_to_file_journal.read_bytes().splitlines()), 10)  # 10 <= 0.5 * 30
+
+        for i in range(10):
+            storage.remove(storage.get(f'+7495{i:07d}'))
+        storage.save()  # 20 > 0.5 * 20
+        self.assertEqual(self.path_to_file_journal.stat().st_size, 0)
+        self.assertEqual(sorted(self.download()), sorted(storage.contacts()))
+        self.assertEqual(len(self.storage()), 20)
+
+    def test_compaction_by_size_of_journal(self):
+        self.fill()
+        with tuning(journal_compact_size=100):
+            storage = self.storage()
+            storage.add(contact('+79120000001', 'Ivan Petrov'))
+            storage.save()
+            self.assertTrue(self.path_to_file_journal.stat().st_size)
+
+            storage.add(contact('+79120000002', 'Anna Ivanova'))
+            storage.save()
+            self.assertEqual(self.path_to_file_journal.stat().st_size, 0)
+        self.assertEqual(len(self.download()), 22)
+
+
+class TestRecordsDBase(TestDBase):
+    names = ('Semi;colon', 'Back\\slash', 'New\nline\r', 'Tail\\', '\\;\\n;')
+
+    def contacts(self) -> tuple:
+        return tuple(contact(f'+7912000000{i}', name) for i, name in enumerate(self.names))
+
+    def assertContacts(self, dict_contacts: dict, contacts: tuple):
+        self.assertEqual(sorted((i.phone_number, i.contact_name, i.date_time_creation_contact)
+                                for i in dict_contacts.values()),
+                         sorted((i.phone_number, i.contact_name, i.date_time_creation_contact) for i in contacts))
+
+    def test_round_trip_of_file_dbase(self):
+        self.upload(*self.contacts())
+        self.assertEqual(len(self.path_to_file_dbase.read_bytes().splitlines()), len(self.names) + 1)  # and header
+        self.assertContacts(self.download(skip_bad_records=False), self.contacts())
+
+    def test_round_trip_of_journal(self):
+        other_contacts = self.fill()
+        storage = self.storage()
+        for i in self.contacts():
+            storage.add(i)
+        storage.save()
+        self.assertEqual(len(self.path_to_file_journal.read_bytes().splitlines()), len(self.names))
+        self.assertContacts(self.storage().contacts(), self.contacts() + other_contacts)
+
+    def test_corrupted_record(self):
+        self.upload(contact('+79120000001', 'Ivan Petrov'),
+                    contact('+79120000002', 'Anna Ivanova'),
+                    contact('+79120000003', 'Petr Sidorov'))
+        self.path_to_file_dbase.write_bytes(self.path_to_file_dbase.read_bytes().replace(b'Anna', b'Anya'))
+
+        self.assertEqual(sorted(self.download()), ['+79120000001', '+79120000003'])
+        with self.assertRaises(ContactBook.FileBaseCorrupted):
+            self.download(skip_bad_records=False)
+
+    def test_legacy_file_without_header(self):
+        self.path_to_file_dbase.write_text('+79120000001;Ivan Petrov;02.01.2020 03:04:05\n'
+                                           '89120000002;Anna Ivanova;02.01.2020 03:04:05\n')
+
+        contacts = self.download(skip_bad_records=False)
+        self.assertEqual(sorted(contacts), ['+79120000001', '+79120000002'])
+        self.assertEqual(contacts['+79120000002'].contact_name, 'Anna Ivanova')
+        self.assertEqual(contacts['+79120000002'].date_time_creation_contact, CREATED)
+
+    def test_header_of_newer_version(self):
+        self.path_to_file_dbase.write_bytes(ContactBook.header_dbase(version=99, encoding='utf-8'))
+        with self.assertRaises(ContactBook.FileBaseVersionNotSupported):
+            self.download()
+
+    def test_torn_last_line_of_journal(self):
+        self.fill()
+        storage = self.storage()
+        storage.add(contact('+79120000001', 'Ivan Petrov'))
+        storage.save()
+        with open(self.path_to_file_journal, 'ab') as fj:  # writer is crashed in the middle of record
+            fj.write(ContactBook.checksum_record_dbase('A;+79120000002;Anna Ivanova;02.01.2020 03:04:05',
+                                                       encoding='utf-8')[:-10])
+
+        storage = self.storage()
+        self.assertIsNotNone(storage.get('+79120000001'))
+        self.assertIsNone(storage.get('+79120000002'))
+
+        storage.add(contact('+79120000003', 'Petr Sidorov'))  # torn record is cut before next records
+        storage.save()
+        self.assertEqual(len(self.path_to_file_journal.read_bytes().splitlines()), 2)
+        storage = self.storage()
+        self.assertEqual((len(storage), storage.get('+79120000003').contact_name), (22, 'Petr Sidorov'))
+
+
+class TestBinaryStorage(TestDBase):
+
+    def test_len_with_changes(self):
+        other_contacts = self.fill()
+        storage = ContactBook.BinaryStorage(path_to_file_dbase=self.path_to_file_dbase.with_suffix('.dbin'))
+        self.addCleanup(storage.close)
+        storage.add(contact('+79120000001', 'Ivan Petrov'))
+        storage.add(contact('+79120000002', 'Anna Ivanova'))
+        storage.remove(storage.get('+79120000002'))
+        storage.edit(contact('+74950000001', 'Other edited'))
+        storage.remove(other_contacts[2])
+
+        self.assertEqual(len(storage), 20)
+        self.assertIsNone(storage.memory_parts()['contacts'])  # contacts are not materialized by len
+        self.assertEqual(len(storage), len(storage.contacts()))
+
+        storage.save()
+        self.assertEqual(len(storage), 20)
+
+    def test_lookup_by_sorted_index(self):
+        path_to_file_binary = self.path_to_file_dbase.with_suffix('.dbin')
+        contacts = {i.phone_number: i for i in reversed(self.fill(count=50))}
+        ContactBook.write_binary_dbase(dbase_dict=contacts, path_to_file_binary=path_to_file_binary)
+        with ContactBook.BinaryDBase(path_to_file_binary=path_to_file_binary) as binary_dbase:
+            self.assertEqual(len(binary_dbase), 50)
+            self.assertEqual(sorted(binary_dbase), sorted(contacts))
+            for phone_number, i in contacts.items():
+                self.assertEqual((binary_dbase[phone_number].contact_name,
+                                  binary_dbase[phone_number].date_time_creation_contact), (i.contact_name, CREATED))
+            self.assertNotIn('+79120000001', binary_dbase)
+            self.assertIsNone(binary_dbase.get('+74950000050'))
+
+    def test_long_name(self):
+        path_to_file_binary = self.path_to_file_dbase.with_suffix('.dbin')
+        long_contact = contact('+79120000001', 'Иван' * 20000)  # 160000 bytes of utf-8
+        ContactBook.write_binary_dbase(dbase_dict={long_contact.phone_number: long_contact},
+                                       path_to_file_binary=path_to_file_binary)
+        with ContactBook.BinaryDBase(path_to_file_binary=path_to_file_binary) as binary_dbase:
+            self.assertEqual(binary_dbase['+79120000001'].contact_name, long_contact.contact_name)
+
+    def test_newer_version(self):
+        path_to_file_binary = self.path_to_file_dbase.with_suffix('.dbin')
+        with unittest.mock.patch.object(ContactBook.BinaryDBase, 'version', 2):
+            ContactBook.write_binary_dbase(dbase_dict={i.phone_number: i for i in self.fill()},
+                                           path_to_file_binary=path_to_file_binary)
+        with self.assertRaises(ContactBook.FileBaseVersionNotSupported):
+            ContactBook.BinaryDBase(path_to_file_binary=path_to_file_binary)
+
+
+class TestSqliteStorage(TestDBase):
+
+    def setUp(self):
+        super().setUp()
+        self.path_to_file_sqlite = self.path_to_file_dbase.with_suffix(ContactBook.SqliteStorage.suffix)
+
+    def sqlite(self) -> ContactBook.SqliteStorage:
+        storage = ContactBook.SqliteStorage(path_to_file_dbase=self.path_to_file_sqlite)
+        self.addCleanup(storage.close)
+        return storage
+
+    def assertFound(self, storage: ContactBook.SqliteStorage):
+        for query, phone_numbers in (('ivan', ['+79120000001', '+79120000003']),
+                                     ('AHHA', ['+79120000002']),
+                                     ('an', ['+79120000001', '+79120000003', '+79120000004']),
+                                     ('a', ['+79120000001', '+79120000002', '+79120000003', '+79120000004']),
+                                     ('n "q', ['+79120000004']),
+                                     ('petrov', ['+79120000001']),
+                                     ('nobody', [])):
+            with self.subTest(query=query):
+                self.assertEqual(sorted(i.phone_number for i in storage.find_by_name(contact_name=query)),
+                                 phone_numbers)
+                contact_filter = ContactBook.ContactFilter(contact_name=query, phone_prefix='+7912')
+                self.assertEqual(sorted(i.phone_number for i in storage.find_by_filter(contact_filter=contact_filter)),
+                                 phone_numbers)
+
+    def fill_sqlite(self, storage: ContactBook.SqliteStorage) -> None:
+        for new_contact in (contact('+79120000001', 'Ivan Petrov'), contact('+79120000002', 'Анна'),
+                            contact('+79120000003', 'Ivan'), contact('+79120000004', 'Jean "Quote" Smith'),
+                            contact('+79120000005', 'Removed Ivan')):
+            storage.add(new_contact)
+        storage.edit(contact('+79120000003', 'Ivanov Ivan'))
+        storage.remove(contact('+79120000005', 'Removed Ivan'))
+        storage.save()
+
+    def test_find_by_name(self):
+        with ContactBook.SqliteStorage(path_to_file_dbase=self.path_to_file_sqlite) as storage:
+            self.fill_sqlite(storage)
+            self.assertTrue(storage._SqliteStorage__fts)
+            self.assertFound(storage)
+        self.assertFound(self.sqlite())
+
+    def test_find_by_name_without_fts(self):
+        with unittest.mock.patch.object(ContactBook.SqliteStorage, 'fts_schema',
+                                        'CREATE VIRTUAL TABLE contacts_fts USING no_such_module(search_key);'):
+            storage = self.sqlite()
+            self.fill_sqlite(storage)
+            self.assertFound(storage)
+
+    def test_fts_of_database_of_previous_version(self):
+        with unittest.mock.patch.object(ContactBook.SqliteStorage, '_SqliteStorage__create_fts', return_value=False), \
+                ContactBook.SqliteStorage(path_to_file_dbase=self.path_to_file_sqlite) as storage:
+            self.fill_sqlite(storage)
+        self.assertFound(self.sqlite())  # trigrams are built by first open
+
+
+class BackupTestCase(TestDBase):
+
+    def setUp(self):
+        super().setUp()
+        self.path_to_file_backup = pathlib.Path(self.tmp_dir.name) / 'contact-book.backup'
+        self.contacts = {i.phone_number: i for i in self.fill(count=5)}
+
+    def backup(self, **kwargs) -> pathlib.Path:
+        with unittest.mock.patch('sys.stdout', io.StringIO()):
+            return ContactBook.full_backup_dbase(dbase_dict=self.contacts, path_to_file_dbase=self.path_to_file_backup,
+                                                 processes=0, **kwargs)
+
+    def full_and_differential(self, compression: str) -> tuple:
+        """full backup of contacts, then differential backup after edit, removal and addition"""
+        self.contacts = {i.phone_number: i for i in self.fill(count=5)}
+        full = self.backup(compression=compression)
+        self.contacts['+74950000001'] = contact('+74950000001', 'Edited')
+        del self.contacts['+74950000002']
+        self.contacts['+79120000001'] = contact('+79120000001', 'Added')
+        return full, self.backup(compression=compression, differential=True)
+
+    @staticmethod
+    def read(path_to_file_backup: pathlib.Path, compression: str) -> dict:
+        with ContactBook.open_backup(path_to_file_backup=path_to_file_backup, mode='r', compression=compression) as fb:
+            return json.load(fb)
+
+
+class TestBackup(BackupTestCase):
+
+    def test_full_and_differential(self):
+        for compression, suffix in (None, ''), ('gzip', '.gz'), ('lzma', '.xz'):
+            with self.subTest(compression=compression):
+                full, diff = self.full_and_differential(compression=compression)
+                self.assertEqual(full.name, f'contact-book.backup{suffix}')
+                self.assertTrue(diff.name.startswith('contact-book.backup.'))
+                self.assertTrue(diff.name.endswith(f'.diff{suffix}'))
+
+                self.assertEqual(self.read(full, compression=compression),
+                                 {f'+7495{i:07d}': contact(f'+7495{i:07d}', f'Other {i}').dict[f'+7495{i:07d}']
+                                  for i in range(5)})
+                self.assertEqual(self.read(diff, compression=compression),
+                                 {'+74950000001': self.contacts['+74950000001'].dict['+74950000001'],
+                                  '+79120000001': self.contacts['+79120000001'].dict['+79120000001'],
+                                  '+74950000002': None})
+
+                manifest = ContactBook.read_backup_manifest(f'{self.path_to_file_backup}.manifest')
+                self.assertEqual(manifest['backups'], [full.name, diff.name])
+                self.assertEqual(sorted(manifest['checksums']), sorted(self.contacts))
+
+    def test_empty_differential(self):
+        self.backup()
+        diff = self.backup(differential=True)
+        self.assertEqual(self.read(diff, compression=None), {})
+        self.assertEqual(len(ContactBook.read_backup_manifest(f'{self.path_to_file_backup}.manifest')['backups']), 2)
+        self.backup()  # full backup starts new chain
+        self.assertEqual(len(ContactBook.read_backup_manifest(f'{self.path_to_file_backup}.manifest')['backups']), 1)
+
+
+class TestRestore(BackupTestCase):
+
+    def restore(self, paths_to_file_backup: list) -> tuple:
+        """restored contacts as tuples and printed messages"""
+        with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout:
+            contacts = ContactBook.restore_dbase(paths_to_file_backup=paths_to_file_backup, processes=0, batch_size=2)
+        return {phone_number: i.tuple for phone_number, i in contacts.items()}, stdout.getvalue()
+
+    def test_chain_of_backups(self):
+        for compression in None, 'gzip', 'lzma':
+            with self.subTest(compression=compression):
+                full, diff = self.full_and_differential(compression=compression)
+                chain = ContactBook.chain_of_backups(f'{self.path_to_file_backup}.manifest')
+                self.assertEqual(chain, [full, diff])
+                self.assertEqual(self.restore(chain)[0],
+                                 {phone_number: i.tuple for phone_number, i in self.contacts.items()})
+
+    def test_by_processes(self):
+        full, diff = self.full_and_differential(compression='gzip')
+        with unittest.mock.patch('sys.stdout', io.StringIO()):
+            contacts = ContactBook.restore_dbase(paths_to_file_backup=[full, diff], processes=2, batch_size=2)
+        self.assertEqual({phone_number: i.tuple for phone_number, i in contacts.items()},
+                         {phone_number: i.tuple for phone_number, i in self.contacts.items()})
+
+    def test_iter_json_object(self):
+        text = ' {"+1": {"name": "a}\\\\\\"b, \\u0436", "list": [1, {"x": null}]},\n\t"+2" : null , "+3":"}"}  '
+        for read_size in range(1, 12):
+            with self.subTest(read_size=read_size):
+                self.assertEqual(list(ContactBook.iter_json_object(io.StringIO(text), read_size=read_size)),
+                                 list(json.loads(text).items()))
+        self.assertEqual(list(ContactBook.iter_json_object(io.StringIO('{\n}\n'), read_size=1)), [])
+        for text in '', '[]', '{"+1": 1', '{"+1" 1}', '{"+1": 1 "+2": 2}':
+            with self.subTest(text=text), self.assertRaises(ContactBook.FileBaseCorrupted):
+                list(ContactBook.iter_json_object(io.StringIO(text), read_size=2))
+
+    def test_invalid_records(self):
+        records = {'+74950000001': contact('+74950000001', 'Valid').dict['+74950000001'],
+                   '+74950000002': contact('+74950000003', 'Other phone').dict['+74950000003'],
+                   '+74950000004': {'phone_number': '+74950000004', 'contact_name': ''},
+                   '+74950000005': {'phone_number': '+74950000005', 'contact_name': 'No date'},
+                   '+7495000000x': {'phone_number': '+7495000000x', 'contact_name': 'Bad phone',
+                                    'date_time_creation_contact': '02.01.2020 03:04:05'},
+                   '+74950000006': 'not a record'}
+        self.path_to_file_backup.write_text(json.dumps(records), encoding='utf-8')
+        contacts, messages = self.restore([self.path_to_file_backup])
+        self.assertEqual(contacts, {'+74950000001': contact('+74950000001', 'Valid').tuple})
+        self.assertIn('+74950000002', messages)
+        self.assertIn('+7495000000x', messages)
+        self.assertIn('total rejected 5 records', messages)
+
+
+class TestLogWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path_to_file_log = pathlib.Path(self.tmp_dir.name) / 'contact-book.log'
+
+    def writer(self, **kwargs) -> ContactBook.LogWriter:
+        writer = ContactBook.LogWriter(path_to_file_log=self.path_to_file_log, **kwargs)
+        self.addCleanup(writer.close)
+        return writer
+
+    def records(self) -> list:
+        with open(self.path_to_file_log, encoding='utf-8') as fl:
+            return [json.loads(line) for line in fl]
+
+    def test_batches_are_written_on_close(self):
+        writer = self.writer(flush_interval=60, batch_size=3)
+        for i in range(10):
+            writer.write({'time_ns': 0, 'function': f'f{i}', 'duration_ns': i})
+        writer.write({'time_ns': 0, 'function': 'g', 'duration_ns': 1,
+                      'args': ('x' * 100, [1, 2]), 'kwargs': {'key': None}, 'result': {'a': 1}})
+        time.sleep(0.05)
+        self.assertEqual(self.path_to_file_log.stat().st_size, 0)  # records wait in buffer of file
+        writer.close()
+
+        records = self.records()
+        self.assertEqual([i['function'] for i in records], [f'f{i}' for i in range(10)] + ['g'])
+        self.assertEqual(records[3], {'time': datetime.datetime.fromtimestamp(0).isoformat(timespec='microseconds'),
+                                      'function': 'f3', 'duration_ns': 3})
+        self.assertEqual(records[-1]['args'], [repr('x' * 100)[:13] + '...' + repr('x' * 100)[-14:], '[1, 2]'])
+        self.assertEqual((records[-1]['kwargs'], records[-1]['result']), ({'key': 'None'}, "{'a': 1}"))
+
+    def test_flush_by_interval(self):
+        writer = self.writer(flush_interval=0.01, batch_size=100)
+        writer.write({'time_ns': 0, 'function': 'f', 'duration_ns': 1})
+        deadline = time.monotonic() + 5
+        while not self.path_to_file_log.stat().st_size and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([i['function'] for i in self.records()], ['f'])  # it is written without close
+
+    def test_decorators(self):
+        writer = self.writer(flush_interval=60, batch_size=100)
+        with unittest.mock.patch.object(ContactBook.LogWriter, 'instance', return_value=writer):
+            self.assertEqual(ContactBook.decorator_args_kwargs(lambda a, b=0: a + b)(1, b=2), 3)
+            self.assertEqual(ContactBook.decorator_time_lost(lambda: None)(), None)
+        writer.close()
+        records = self.records()
+        self.assertEqual([(i['function'], i.get('args'), i.get('result')) for i in records],
+                         [('<lambda>', ['1'], '3'), ('<lambda>', None, None)])
+        self.assertTrue(all(i['duration_ns'] >= 0 for i in records))
+
+    def test_decorators_on_error(self):
+        def fail(a):
+            raise KeyError(a)
+
+        writer = self.writer(flush_interval=60, batch_size=100)
+        with unittest.mock.patch.object(ContactBook.LogWriter, 'instance', return_value=writer):
+            for decorator in ContactBook.decorator_args_kwargs, ContactBook.decorator_time_lost:
+                with self.assertRaises(KeyError):
+                    decorator(fail)(1)
+        writer.close()
+        records = self.records()
+        self.assertEqual([(i['function'], i['error'], i.get('args'), 'result' in i) for i in records],
+                         [('fail', 'KeyError', ['1'], False), ('fail', 'KeyError', None, False)])
+
+    def test_log_next_to_dbase(self):
+        log = unittest.mock.patch.multiple(ContactBook.LogWriter, _LogWriter__instance=None,
+                                           _LogWriter__path_to_file_log=None)
+        log.start()
+        self.addCleanup(log.stop)
+        self.addCleanup(ContactBook.LogWriter.shutdown)
+        path_to_file_dbase = pathlib.Path(self.tmp_dir.name) / 'other.dbase'
+        ContactBook.open_storage(storage='text', path_to_file_dbase=path_to_file_dbase).close()
+        ContactBook.decorator_time_lost(lambda: None)()
+        ContactBook.LogWriter.shutdown()
+        self.assertEqual([i['function'] for i in self.records()], ['<lambda>'])
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        for value in itertools.chain(range(1000), (2 ** i + j for i in range(10, 40) for j in (-1, 0, 1))):
+            bucket = ContactBook.Histogram.bucket(value)
+            self.assertGreaterEqual(ContactBook.Histogram.bucket_value(bucket), value)
+            self.assertLessEqual(ContactBook.Histogram.bucket_value(bucket), value * 17 // 16 + 1)
+            if bucket:
+                self.assertLess(ContactBook.Histogram.bucket_value(bucket - 1), value)
+
+    def test_percentiles(self):
+        histogram = ContactBook.Histogram()
+        self.assertEqual(histogram.dict, {'count': 0, 'sum': 0, 'min': 0, 'p50': 0, 'p90': 0, 'p99': 0, 'max': 0})
+        randomizer = random.Random(1)
+        values = [int(10 ** randomizer.uniform(0, 9)) for _ in range(10000)]
+        for value in values:
+            histogram.record(value)
+        values.sort()
+        for percent in 1, 10, 50, 90, 99, 99.9, 100:
+            with self.subTest(percent=percent):
+                exact = values[max(math.ceil(len(values) * percent / 100), 1) - 1]
+                self.assertGreaterEqual(histogram.percentile(percent), exact)
+                self.assertLessEqual(histogram.percentile(percent), exact * (1 + 1 / 16))
+        self.assertEqual((histogram.count, histogram.total, histogram.min, histogram.max),
+                         (len(values), sum(values), values[0], values[-1]))
+
+
+class TestColumnarContacts(unittest.TestCase):
+
+    def setUp(self):
+        self.contacts = ContactBook.ColumnarContacts()
+
+    def assertStored(self, expected: dict):
+        self.assertEqual(len(self.contacts), len(expected))
+        self.assertEqual(list(self.contacts), list(expected))
+        for phone_number, contact_name in expected.items():
+            self.assertEqual(self.contacts[phone_number].contact_name, contact_name)
+            self.assertEqual(self.contacts[phone_number].date_time_creation_contact, CREATED)
+
+    def test_put_replace_delete(self):
+        self.contacts['+79120000001'] = contact('+79120000001', 'Ivan Petrov')
+        self.contacts['+79120000002'] = contact('+79120000002', 'Anna Ivanova')
+        self.contacts['+79120000001'] = contact('+79120000001', 'Ivan Petrovich')  # replaced in place
+        self.assertStored({'+79120000001': 'Ivan Petrovich', '+79120000002': 'Anna Ivanova'})
+
+        del self.contacts['+79120000001']
+        self.assertNotIn('+79120000001', self.contacts)
+        self.assertIsNone(self.contacts.get('+79120000001'))
+        with self.assertRaises(KeyError):
+            del self.contacts['+79120000001']
+        self.assertStored({'+79120000002': 'Anna Ivanova'})
+
+        self.contacts['+79120000001'] = contact('+79120000001', 'Ivan Again')  # new row at the end
+        self.assertStored({'+79120000002': 'Anna Ivanova', '+79120000001': 'Ivan Again'})
+
+    def test_packed_and_extra_phones(self):
+        phones = {'+79120000001': 'plus',
+                  '89120000001': 'trunk',
+                  '007': 'leading zeros',
+                  '+007': 'plus and leading zeros',
+                  '0': 'zero',
+                  '+12345678901234567': '17 digits',
+                  '+123456789012345678': '18 digits are not packed',
+                  '112': 'service',
+                  '*100#': 'not digits',
+                  '': 'empty'}
+        for phone_number, contact_name in phones.items():  # phones of legacy rows are not validated
+            self.contacts.put(phone_number, contact_name, ContactBook.datetime2epoch(CREATED))
+        self.assertStored(phones)
+        self.assertEqual(ContactBook.ColumnarContacts.pack_phone('007'), 10007)
+        self.assertEqual(ContactBook.ColumnarContacts.pack_phone('+007'), 11007)
+        self.assertEqual(ContactBook.ColumnarContacts.pack_phone('*100#'), 1)
+
+        for phone_number in ('*100#', '007', '+123456789012345678'):
+            del self.contacts[phone_number]
+            del phones[phone_number]
+        self.contacts.compact()  # rows of extra phones are moved
+        self.assertStored(phones)
+
+    def test_compact_and_resize(self):
+        expected = {}
+        for i in range(1000):  # hash index is resized many times
+            self.contacts[f'+7912{i:07d}'] = contact(f'+7912{i:07d}', f'Name {i}')
+            expected[f'+7912{i:07d}'] = f'Name {i}'
+        self.assertStored(expected)
+
+        for i in range(0, 1000, 10):  # names are replaced until their garbage is compacted
+            for j in range(5):
+                self.contacts[f'+7912{i:07d}'] = contact(f'+7912{i:07d}', f'Name {i} v{j}')
+            expected[f'+7912{i:07d}'] = f'Name {i} v4'
+        self.assertLess(len(self.contacts._ColumnarContacts__names), 2 * sum(len(i) for i in expected.values()))
+        self.assertStored(expected)
+
+        for i in range(1000):  # rows are compacted when most of them are removed
+            if i % 10:
+                del self.contacts[f'+7912{i:07d}']
+                del expected[f'+7912{i:07d}']
+        self.assertLess(len(self.contacts._ColumnarContacts__phones), 1000)
+        self.assertStored(expected)
+        self.assertEqual(list(self.contacts.values()), [self.contacts[i] for i in expected])
+
+    def test_dict_interface(self):
+        contacts = {i.phone_number: i for i in (contact(f'+7912{i:07d}', f'Name {i}') for i in range(20))}
+        self.contacts = ContactBook.ColumnarContacts(dict_contacts=contacts)
+        self.assertStored({phone_number: i.contact_name for phone_number, i in contacts.items()})
+        self.assertEqual([phone_number for phone_number, _ in self.contacts.items()], list(contacts))
+        self.assertEqual(self.contacts.pop('+79120000003').contact_name, 'Name 3')
+        self.assertEqual(len(self.contacts), 19)
+
+
+class TestLazyContacts(TestDBase):
+
+    def setUp(self):
+        super().setUp()
+        lazy = tuning(contacts_store='lazy')
+        lazy.start()
+        self.addCleanup(lazy.stop)
+        self.upload(contact('+79120000001', 'Ivan Petrov'),
+                    contact('+79120000002', 'Anna Ivanova'),
+                    contact('+79120000003', 'Petr Sidorov'))
+
+    def test_contacts_are_parsed_on_access(self):
+        contacts = self.download(skip_bad_records=False)
+        self.assertIsInstance(contacts, ContactBook.LazyContacts)
+        self.assertEqual(sorted(contacts), ['+79120000001', '+79120000002', '+79120000003'])
+        self.assertEqual(contacts['+79120000002'].contact_name, 'Anna Ivanova')
+        self.assertEqual(contacts['+79120000002'].date_time_creation_contact, CREATED)
+        self.assertEqual(sorted(i.contact_name for i in contacts.values()),
+                         ['Anna Ivanova', 'Ivan Petrov', 'Petr Sidorov'])
+
+    def test_bad_rows(self):
+        with open(self.path_to_file_dbase, 'ab') as fb:
+            fb.write(b'+7912\xff\xfe;Bad Phone;02.01.2020 03:04:05;00000000\n'
+                     b'no separator\n')
+        self.path_to_file_dbase.write_bytes(self.path_to_file_dbase.read_bytes().replace(b'Anna', b'Anya'))
+
+        with unittest.mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            contacts = self.download()
+        self.assertIn('found 2 bad rows', stdout.getvalue())  # rows are found by phone number on load
+        self.assertEqual(sorted(contacts), ['+79120000001', '+79120000002', '+79120000003'])
+
+        self.assertIsNone(contacts.get('+79120000002'))  # checksum is verified on access
+        self.assertEqual(contacts.bad_rows, 1)
+        self.assertEqual(len(contacts), 2)
+        with self.assertRaises(ContactBook.FileBaseCorrupted):
+            self.download(skip_bad_records=False)
+
+
+class TestImport(TestDBase):
+
+    def setUp(self):
+        super().setUp()
+        self.fill(count=1)
+        self.path_to_file_import = pathlib.Path(self.tmp_dir.name) / 'import.csv'
+
+    def rejects(self) -> list:
+        with open(f'{self.path_to_file_import}.rejects.csv', encoding='utf-8', newline='') as fr:
+            return list(csv.reader(fr))
+
+    def import_contacts(self, text: str, **kwargs) -> tuple:
+        self.path_to_file_import.write_text(text, encoding='utf-8')
+        self.imported = self.storage()
+        return ContactBook.import_contacts(storage=self.imported, path_to_file_import=self.path_to_file_import,
+                                           **kwargs)
+
+    def names(self) -> dict:
+        return {phone_number: i.contact_name for phone_number, i in self.imported.contacts().items()
+                if not phone_number.startswith('+7495')}
+
+    def test_columns_by_header(self):
+        self.assertEqual(self.import_contacts('\ufeffComment;Телефон;Имя\n'
+                                              'friend;8 (912) 000-00-01;Ivan Petrov\n'
+                                              ';+7 912 000 00 02;"Anna; Ivanova"\n'), (2, 0, 0))
+        self.assertEqual(self.names(), {'+79120000001': 'Ivan Petrov', '+79120000002': 'Anna; Ivanova'})
+
+    def test_columns_by_values(self):
+        self.assertEqual(self.import_contacts('+79120000001,Ivan Petrov\n'
+                                              '89120000002,Anna Ivanova\n'), (2, 0, 0))
+        self.assertEqual(self.names(), {'+79120000001': 'Ivan Petrov', '+79120000002': 'Anna Ivanova'})
+
+        self.path_to_file_import = self.path_to_file_import.with_name('import.tsv')
+        self.assertEqual(self.import_contacts('Petr Sidorov\t9120000003\n'
+                                              'Olga Smirnova\t0079120000004\n'), (2, 0, 0))
+        self.assertEqual(self.names(), {'+79120000003': 'Petr Sidorov', '+79120000004': 'Olga Smirnova'})
+
+    def test_vcard(self):
+        self.path_to_file_import = self.path_to_file_import.with_name('import.vcf')
+        self.assertEqual(self.import_contacts('BEGIN:VCARD\r\n'
+                                              'VERSION:3.0\r\n'
+                                              'FN:Ivan Pe\r\n'
+                                              ' trov\\, junior\r\n'
+                                              'TEL;TYPE=CELL:+7 912 000 00 01\r\n'
+                                              'TEL;TYPE=HOME:tel:8-912-000-00-02\r\n'
+                                              'END:VCARD\r\n'
+                                              'BEGIN:VCARD\r\n'
+                                              'FN:Nobody\r\n'
+                                              'END:VCARD\r\n'), (2, 0, 1))
+        self.assertEqual(self.names(), {'+79120000001': 'Ivan Petrov, junior',
+                                        '+79120000002': 'Ivan Petrov, junior'})
+        self.assertEqual(self.rejects()[1:], [['2', 'Nobody', '', 'not valid phone number']])
+
+    def test_duplicates_and_rejects(self):
+        self.assertEqual(self.import_contacts('name,phone\n'
+                                              'Other,+74950000000\n'
+                                              'Ivan Petrov,+79120000001\n'
+                                              'Ivan Again,8 912 000-00-01\n'
+                                              ',+79120000002\n'
+                                              'Anna Ivanova,912-000-00-0x\n'
+                                              'Petr Sidorov\n'), (1, 2, 3))
+        self.assertEqual(self.names(), {'+79120000001': 'Ivan Petrov'})
+        self.assertEqual(self.rejects(), [['row', 'contact_name', 'phone_number', 'reason'],
+                                          ['4', '', '+79120000002', 'not valid contact name'],
+                                          ['5', 'Anna Ivanova', '912000000x', 'not valid phone number'],
+                                          ['6', '', '', 'not valid contact name'],
+                                          ['1', 'Other', '+74950000000', 'duplicate phone number'],
+                                          ['3', 'Ivan Again', '+79120000001', 'duplicate phone number']])
+
+    def test_process_pool(self):
+        text = ''.join(f'Name {i},+7912{i:07d}\n' for i in range(20)) + 'Bad,x\n'
+        self.assertEqual(self.import_contacts(text, processes=2, chunk_size=3), (20, 0, 1))
+        names = self.names()
+        self.assertEqual(self.import_contacts(text, processes=0, chunk_size=3), (20, 0, 1))  # to new storage
+        self.assertEqual(self.names(), names)
+        self.assertEqual(list(names), [f'+7912{i:07d}' for i in range(20)])
+
+
+class TestPhoneNumbers(unittest.TestCase):
+
+    def test_normalize_phone_number(self):
+        for phone_number, normalized in (('+79123456789', '+79123456789'),
+                                         ('+7 (912) 345-67-89', '+79123456789'),
+                                         ('0079123456789', '+79123456789'),  # international call prefix
+                                         ('00 44 20 7946 0958', '+442079460958'),
+                                         ('89123456789', '+79123456789'),  # trunk prefix
+                                         ('8 912 345 67 89', '+79123456789'),
+                                         ('79123456789', '+79123456789'),
+                                         ('9123456789', '+79123456789'),  # national number
+                                         ('112', '112'),  # short service numbers are kept
+                                         ('0911', '0911'),
+                                         ('912345678', '912345678'),
+                                         ('99123456789', '99123456789'),
+                                         ('+7912x', '+7912x')):
+            with self.subTest(phone_number=phone_number):
+                self.assertEqual(ContactBook.normalize_phone_number(phone_number), normalized)
+
+    def test_phone_index(self):
+        index = ContactBook.PhoneIndex(['+79123456789', '+79120000001', '+74951234567', '112'])
+        self.assertEqual(index.find('+7912*'), ['+79120000001', '+79123456789'])
+        self.assertEqual(index.find('8912*'), ['+79120000001', '+79123456789'])
+        self.assertEqual(index.find('8 (912) 34*'), ['+79123456789'])
+        self.assertEqual(index.find('4567'), ['+74951234567'])
+        self.assertEqual(index.find('*6789'), ['+79123456789'])
+        self.assertEqual(index.find('112'), ['112'])
+        self.assertEqual(index.find('12x'), [])
+
+        index.add('+79993456789')
+        index.add('+79120000002')
+        self.assertEqual(index.find('6789'), ['+79123456789', '+79993456789'])
+        self.assertEqual(index.find('+7912*'), ['+79120000001', '+79120000002', '+79123456789'])
+        index.remove('+79123456789')
+        index.remove('+70000000000')  # not in index
+        self.assertEqual(index.find('6789'), ['+79993456789'])
+        self.assertEqual(index.find('+7912*'), ['+79120000001', '+79120000002'])
+        self.assertEqual(index.count_prefix('7912'), 2)
+        self.assertEqual(len(index), 5)
+
+
+class TestLegacyPhones(TestDBase):
+
+    def test_collisions_of_normalized_numbers(self):
+        self.upload(contact('89123456789', 'Legacy'), contact('+79123456789', 'Modern'),
+                    contact('84951234567', 'Other'), contact('9123456789', 'National'))
+        for contacts_store in 'dict', 'columnar', 'lazy':
+            with self.subTest(contacts_store=contacts_store), tuning(contacts_store=contacts_store):
+                collisions = ContactBook.METRICS.dict['counters'].get('load.collisions', 0)
+                with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout:
+                    contacts = self.download()
+                self.assertEqual(sorted(contacts), ['+74951234567', '+79123456789'])
+                self.assertEqual(contacts['+79123456789'].contact_name, 'National')
+                self.assertIn('found 2 rows in file', stdout.getvalue())
+                self.assertIn('first of them: 5', stdout.getvalue())  # row 5 is national number after header
+                self.assertEqual(ContactBook.METRICS.dict['counters']['load.collisions'], collisions + 2)
+
+        with self.assertRaises(ContactBook.FileBaseCorrupted):
+            self.download(skip_bad_records=False)
+
+
+class TestSortedContacts(unittest.TestCase):
+
+    def setUp(self):
+        self.contacts = {i.phone_number: i for i in (contact(f'+7912{i:07d}', f'Name {i * 7 % 10}')
+                                                     for i in range(10))}
+        self.sorted = ContactBook.SortedContacts(dict_contacts=self.contacts, block_size=2)
+
+    def expected(self) -> list:
+        return [i.phone_number for i in sorted(self.contacts.values(), key=ContactBook.SortedContacts.key)]
+
+    def sizes(self) -> list:
+        return [len(block) for block in self.sorted._SortedContacts__blocks]
+
+    def test_order_on_add_and_remove(self):
+        self.assertEqual(list(self.sorted), self.expected())
+        self.assertEqual(self.sizes(), [2] * 5)
+        for i in range(10, 40):
+            new_contact = contact(f'+7495{i:07d}', f'Name {i * 13 % 17}')
+            self.contacts[new_contact.phone_number] = new_contact
+            self.sorted.add(new_contact)
+            self.assertEqual(list(self.sorted), self.expected())
+            self.assertLessEqual(max(self.sizes()), 4)
+        self.assertEqual(len(self.sorted), 40)
+
+        for phone_number in list(self.contacts)[::3]:
+            self.sorted.remove(self.contacts.pop(phone_number))
+            self.assertEqual(list(self.sorted), self.expected())
+        self.sorted.remove(contact('+70000000000', 'Name 1'))  # not in order
+        self.assertEqual(len(self.sorted), len(self.contacts))
+        self.assertNotIn(0, self.sizes())  # empty blocks are dropped
+
+        for phone_number in list(self.contacts):
+            self.sorted.remove(self.contacts.pop(phone_number))
+        self.assertEqual((len(self.sorted), self.sizes()), (0, []))
+        self.sorted.add(contact('+79120000001', 'Anna'))
+        self.assertEqual(list(self.sorted), ['+79120000001'])
+
+    def test_split_of_block(self):
+        for i in range(2):  # all of them are after the last block
+            self.sorted.add(contact(f'+7495{i:07d}', f'Zoe {i}'))
+        self.assertEqual(self.sizes(), [2, 2, 2, 2, 4])
+        self.sorted.add(contact('+74950000002', 'Zoe 2'))  # block is split when it is over 2 sizes of block
+        self.assertEqual(self.sizes(), [2, 2, 2, 2, 2, 3])
+        self.assertEqual(list(self.sorted), self.expected() + [f'+7495{i:07d}' for i in range(3)])
+
+    def test_page(self):
+        for i in range(10, 25):
+            self.sorted.add(contact(f'+7495{i:07d}', f'Name {i * 13 % 17}'))
+        phone_numbers = list(self.sorted)
+        for start in range(len(phone_numbers) + 2):
+            for count in range(len(phone_numbers) + 2):
+                with self.subTest(start=start, count=count):
+                    self.assertEqual(self.sorted.page(start=start, count=count),
+                                     phone_numbers[start:start + count])
+
+
+class TestCli(TestDBase):
+
+    def cli(self, *argv) -> tuple:
+        """exit code, json result from stdout and messages of stderr of command"""
+        with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            code = ContactBook.cli(['--storage', 'text', '--dbase', str(self.path_to_file_dbase), *argv])
+        return code, json.loads(stdout.getvalue()) if stdout.getvalue() else None, stderr.getvalue()
+
+    @staticmethod
+    def record(phone_number: str, contact_name: str) -> dict:
+        return {'phone_number': phone_number, 'contact_name': contact_name,
+                'date_time_creation_contact': unittest.mock.ANY}
+
+    def test_commands(self):
+        self.fill(count=2)
+        code, result, _ = self.cli('add', '8 912 345-67-89', 'Ivan Petrov')
+        self.assertEqual((code, result), (0, [self.record('+79123456789', 'Ivan Petrov')]))
+        code, result, messages = self.cli('add', '+79123456789', 'Ivan Again')
+        self.assertEqual((code, result), (1, None))
+        self.assertEqual(json.loads(messages.splitlines()[-1])['error'], 'ContactExistInFileDBase')
+
+        self.assertEqual(self.cli('find-phone', '89123456789')[:2], (0, [self.record('+79123456789', 'Ivan Petrov')]))
+        self.assertEqual(self.cli('find-phone', '--part', '6789')[:2],
+                         (0, [self.record('+79123456789', 'Ivan Petrov')]))
+        self.assertEqual(self.cli('find-phone', '--part', '+7495*')[:2],
+                         (0, [self.record('+74950000000', 'Other 0'), self.record('+74950000001', 'Other 1')]))
+        self.assertEqual(self.cli('find-name', 'petr')[:2], (0, [self.record('+79123456789', 'Ivan Petrov')]))
+        self.assertEqual(self.cli('find-name', 'nobody')[:2], (1, []))
+        self.assertEqual([i['contact_name'] for i in self.cli('list', '--start', '1', '--count', '2')[1]],
+                         ['Other 0', 'Other 1'])
+
+        self.assertEqual(self.cli('edit', '+79123456789', 'Petr Ivanov')[:2],
+                         (0, [self.record('+79123456789', 'Petr Ivanov')]))
+        self.assertEqual(self.cli('remove', '89123456789')[:2], (0, [self.record('+79123456789', 'Petr Ivanov')]))
+        self.assertEqual(self.cli('find-phone', '+79123456789')[:2], (1, []))
+        code, result, messages = self.cli('remove', '+79123456789')
+        self.assertEqual((code, result), (1, None))
+        self.assertEqual(json.loads(messages.splitlines()[-1])['error'], 'ContactNotFound')
+        self.assertEqual(self.cli('add', '912-x', 'Nobody')[0], 1)  # not valid phone number
+
+    def test_wrong_arguments(self):
+        for argv in (), ('unknown',), ('add', '+79123456789'), ('list', '--count', 'x'):
+            with self.subTest(argv=argv), self.assertRaises(SystemExit) as raised:
+                self.cli(*argv)
+            self.assertEqual(raised.exception.code, 2)
+
+    def test_find_phone_scans_legacy_row_and_journal(self):
+        self.upload(*self.fill(count=20), contact('89123456789', 'Legacy'))
+        with unittest.mock.patch.object(ContactBook, 'full_download_dbase', side_effect=AssertionError):
+            self.assertEqual(self.cli('find-phone', '+7 912 345 67 89')[:2],
+                             (0, [self.record('+79123456789', 'Legacy')]))
+
+        with unittest.mock.patch('sys.stdout', io.StringIO()):
+            storage = self.storage()
+            storage.edit(contact('+79123456789', 'Edited'))
+            storage.save()
+        self.assertGreater(self.path_to_file_journal.stat().st_size, 0)  # the change is only in journal
+        with unittest.mock.patch.object(ContactBook, 'full_download_dbase', side_effect=AssertionError):
+            self.assertEqual(self.cli('find-phone', '89123456789')[:2], (0, [self.record('+79123456789', 'Edited')]))
+
+        with unittest.mock.patch('sys.stdout', io.StringIO()):
+            storage.remove(storage.get('+79123456789'))
+            storage.save()
+        self.assertEqual(self.cli('find-phone', '89123456789')[:2], (1, []))
+
+    def test_process(self):
+        self.fill(count=1)
+        argv = [sys.executable, ContactBook.__file__, '--dbase', str(self.path_to_file_dbase)]
+        process = subprocess.run(argv + ['list'], capture_output=True, text=True, encoding='utf-8')
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(json.loads(process.stdout), [self.record('+74950000000', 'Other 0')])
+        process = subprocess.run(argv + ['find-phone', '+79123456789'], capture_output=True, text=True)
+        self.assertEqual((process.returncode, process.stdout), (1, '[]\n'))
+        process = subprocess.run(argv + ['remove'], capture_output=True, text=True)
+        self.assertEqual((process.returncode, process.stdout), (2, ''))
+
+
+class TestReloadOfChanges(TestDBase):
+
+    def setUp(self):
+        super().setUp()
+        self.fill()
+        self.writer, self.reader = self.storage(), self.storage()  # storages of two processes
+
+    def test_delta_reload(self):
+        self.assertEqual(len(self.reader.find_by_name('ivan')), 0)  # index is built before change
+        self.writer.add(contact('+79120000001', 'Ivan Petrov'))
+        self.writer.remove(self.writer.get('+74950000001'))
+        self.assertEqual(self.reader.refresh(), 0)  # changes are not saved yet
+
+        self.writer.save()
+        self.assertEqual(self.reader.refresh(), 2)
+        self.assertEqual(self.reader.refresh(), 0)
+        self.assertEqual([i.phone_number for i in self.reader.find_by_name('ivan')], ['+79120000001'])
+        self.assertIsNone(self.reader.get('+74950000001'))
+        self.assertEqual(len(self.reader), 20)
+
+    def test_unsaved_change_is_kept_over_reload(self):
+        self.reader.edit(contact('+74950000001', 'Edited by reader'))
+        self.writer.edit(contact('+74950000001', 'Edited by writer'))
+        self.writer.add(contact('+79120000001', 'Ivan Petrov'))
+        self.writer.save()
+
+        self.reader.save()
+        self.assertEqual(self.reader.get('+79120000001').contact_name, 'Ivan Petrov')
+        self.assertEqual(self.reader.get('+74950000001').contact_name, 'Edited by reader')
+        self.assertEqual(self.storage().get('+74950000001').contact_name, 'Edited by reader')
+
+    def test_full_reload_after_compaction(self):
+        self.reader.add(contact('+79120000002', 'Anna Ivanova'))
+        with tuning(journal_compact_ratio=0):
+            self.writer.add(contact('+79120000001', 'Ivan Petrov'))
+            self.writer.save()
+        self.assertEqual(self.path_to_file_journal.stat().st_size, 0)
+
+        self.assertEqual(self.reader.refresh(), 22)  # file dbase is rewritten, so all contacts are reloaded
+        self.assertEqual(self.reader.get('+79120000001').contact_name, 'Ivan Petrov')
+        self.assertEqual(self.reader.get('+79120000002').contact_name, 'Anna Ivanova')
+        self.reader.save()
+        self.assertEqual(len(self.storage()), 22)
+
+
+class TestSnapshot(TestDBase):
+
+    def setUp(self):
+        super().setUp()
+        self.fill()
+        self.path_to_file_snapshot = self.path_to_file_dbase.with_suffix('.snapshot')
+        with ContactBook.TextStorage(path_to_file_dbase=self.path_to_file_dbase) as storage:
+            storage.add(contact('+79120000001', 'Ivan Petrov'))
+            storage.save()
+            storage.find_by_name('ivan')  # index is written to snapshot on close
+        self.assertTrue(self.path_to_file_snapshot.exists())
+
+    def loaded_from_snapshot(self) -> bool:
+        hits = ContactBook.METRICS.dict['counters'].get('snapshot.hit', 0)
+        self.loaded = self.storage()
+        return ContactBook.METRICS.dict['counters'].get('snapshot.hit', 0) > hits
+
+    def test_valid_snapshot(self):
+        self.assertTrue(self.loaded_from_snapshot())
+        self.assertEqual(len(self.loaded), 21)
+        self.assertEqual([i.phone_number for i in self.loaded.find_by_name('ivan')], ['+79120000001'])
+
+    def test_tail_of_journal_is_replayed_over_snapshot(self):
+        snapshot = self.path_to_file_snapshot.read_bytes()
+        with ContactBook.TextStorage(path_to_file_dbase=self.path_to_file_dbase) as storage:
+            storage.add(contact('+79120000002', 'Ivan Sidorov'))
+            storage.save()
+        self.assertEqual(self.path_to_file_snapshot.read_bytes(), snapshot)  # it is valid for head of journal
+
+        self.assertTrue(self.loaded_from_snapshot())
+        self.assertEqual(len(self.loaded.find_by_name('ivan')), 2)
+
+    def test_changed_file_dbase(self):
+        self.path_to_file_dbase.touch()
+        self.assertFalse(self.loaded_from_snapshot())
+
+    def test_changed_file_dbase_of_same_size_and_time(self):
+        stat = self.path_to_file_dbase.stat()
+        self.upload(*(contact(f'+7495{i:07d}', f'Rehto {i}') for i in range(20)))
+        os.utime(self.path_to_file_dbase, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.path_to_file_dbase.stat().st_size, stat.st_size)
+
+        self.assertFalse(self.loaded_from_snapshot())  # it is found by hash
+        self.assertEqual(self.loaded.get('+74950000001').contact_name, 'Rehto 1')
+
+    def test_rewritten_journal(self):
+        self.path_to_file_journal.write_bytes(ContactBook.checksum_record_dbase(
+            'A;+79120000001;Anna Ivanova;02.01.2020 03:04:05', encoding='utf-8'))
+        self.assertFalse(self.loaded_from_snapshot())
+        self.assertEqual(self.loaded.get('+79120000001').contact_name, 'Anna Ivanova')
+
+    def test_damaged_snapshot(self):
+        self.path_to_file_snapshot.write_bytes(self.path_to_file_snapshot.read_bytes()[:-100])
+        self.assertFalse(self.loaded_from_snapshot())
+        self.assertEqual(len(self.loaded), 21)
+        self.loaded.find_by_name('ivan')
+        self.loaded.close()  # snapshot is rebuilt
+        self.assertTrue(self.loaded_from_snapshot())
+
+    def test_other_store_of_contacts(self):
+        with tuning(contacts_store='columnar'):
+            self.assertFalse(self.loaded_from_snapshot())
+            self.assertEqual(self.loaded.get('+79120000001').contact_name, 'Ivan Petrov')
+
+    def test_columnar_store_in_process_of_other_hash_seed(self):
+        """hashes of str differ by processes, so hash index of columnar store is rebuilt on load of snapshot"""
+        script = (
+            'import sys, ContactBook\n'
+            'get_tuning_value = ContactBook.get_tuning_value\n'
+            'ContactBook.get_tuning_value = lambda name: (\'columnar\' if name == \'contacts_store\'\n'
+            '                                             else get_tuning_value(name))\n'
+            'with ContactBook.TextStorage(path_to_file_dbase=sys.argv[1]) as storage:\n'
+            '    contacts = storage.contacts()\n'
+            '    print(ContactBook.METRICS.dict[\'counters\'].get(\'snapshot.hit\', 0), len(contacts),\n'
+            '          sum(storage.get(i) is not None for i in contacts), end=\' \')\n'
+            '    if len(sys.argv) > 2:  # existing contact is replaced, not added as new row\n'
+            '        storage.edit(ContactBook.Contact(phone_number=\'+79120000001\', contact_name=\'Ivan Edited\'))\n'
+            '    print(len(contacts), sum(1 for _ in contacts))\n')
+
+        def run(seed: str, *args) -> list:
+            result = subprocess.run([sys.executable, '-c', script, str(self.path_to_file_dbase), *args],
+                                    cwd=os.path.dirname(os.path.abspath(ContactBook.__file__)),
+                                    env={**os.environ, 'PYTHONHASHSEED': seed},
+                                    check=True, capture_output=True, text=True)
+            return result.stdout.splitlines()[-1].split()
+
+        self.assertEqual(run('1'), ['0', '21', '21', '21', '21'])  # snapshot of columnar store is written on close
+        self.assertEqual(run('2', 'edit'), ['1', '21', '21', '21', '21'])
+
+
+class TestShards(TestDBase):
+
+    def setUp(self):
+        super().setUp()
+        self.contacts = {i.phone_number: i for i in self.fill(count=40)}
+
+    def upload_shards(self, shards: int, changed_phone_numbers=None) -> None:
+        with unittest.mock.patch('sys.stdout', io.StringIO()):
+            ContactBook.full_upload_dbase(dbase_dict=self.contacts, path_to_file_dbase=self.path_to_file_dbase,
+                                          shards=shards, changed_phone_numbers=changed_phone_numbers, processes=0)
+
+    def shard(self, num_shard: int) -> pathlib.Path:
+        return ContactBook.path_to_file_shard(path_to_file_dbase=self.path_to_file_dbase, num_shard=num_shard)
+
+    def shards(self) -> list:
+        """numbers of existing shard files"""
+        return sorted(int(i.suffix[1:])
+                      for i in self.path_to_file_dbase.parent.glob(f'{self.path_to_file_dbase.name}.0*'))
+
+    def test_manifest(self):
+        self.upload_shards(shards=4)
+        manifest = ContactBook.read_shards_manifest(path_to_file_dbase=self.path_to_file_dbase)
+        self.assertEqual(len(manifest['shards']), 4)
+        self.assertEqual(sum(entry['rows'] for entry in manifest['shards']), 40)
+        self.assertEqual(self.shards(), [0, 1, 2, 3])
+        for num_shard, entry in enumerate(manifest['shards']):
+            contacts = ContactBook.full_download_dbase(path_to_file_dbase=self.shard(num_shard), processes=0)[0]
+            self.assertEqual(len(contacts), entry['rows'])
+            self.assertEqual(entry['size'], self.shard(num_shard).stat().st_size)
+            self.assertTrue(all(ContactBook.shard_of_phone(i, 4) == num_shard for i in contacts))
+        self.assertEqual(self.download(), self.contacts)
+        self.assertIsNone(ContactBook.read_shards_manifest(path_to_file_dbase=self.shard(0)))
+
+    def test_only_dirty_shards_are_rewritten(self):
+        self.upload_shards(shards=4)
+        before = [self.shard(i).read_bytes() for i in range(4)]
+        phone_number = '+74950000007'
+        self.contacts[phone_number] = contact(phone_number, 'Edited')
+        self.upload_shards(shards=4, changed_phone_numbers={phone_number})
+
+        dirty = ContactBook.shard_of_phone(phone_number, 4)
+        self.assertEqual([self.shard(i).read_bytes() == before[i] for i in range(4)],
+                         [i != dirty for i in range(4)])
+        self.assertEqual(ContactBook.METRICS.dict['gauges']['save.dirty_shards'], 1)
+        self.assertEqual(self.download()[phone_number].contact_name, 'Edited')
+
+    def test_compaction_rewrites_shards_of_journal(self):
+        self.upload_shards(shards=4)
+        before = [self.shard(i).read_bytes() for i in range(4)]
+        with tuning(dbase_shards=4, journal_compact_size=0), unittest.mock.patch('sys.stdout', io.StringIO()):
+            storage = self.storage()
+            storage.remove(storage.get('+74950000003'))
+            storage.save()
+        dirty = ContactBook.shard_of_phone('+74950000003', 4)
+        self.assertEqual([self.shard(i).read_bytes() == before[i] for i in range(4)],
+                         [i != dirty for i in range(4)])
+        self.assertEqual(self.path_to_file_journal.stat().st_size, 0)
+        self.assertEqual(len(self.download()), 39)
+
+    def test_conversion_and_stale_shards(self):
+        self.upload_shards(shards=4)
+        with tuning(dbase_shards=2), unittest.mock.patch('sys.stdout', io.StringIO()):
+            storage = self.storage()
+            storage.save()  # number of shards is changed by tuning, journal is empty
+        self.assertEqual(len(ContactBook.read_shards_manifest(path_to_file_dbase=self.path_to_file_dbase)['shards']), 2)
+        self.assertEqual(self.shards(), [0, 1])
+        self.assertEqual(self.download(), self.contacts)
+
+        self.upload_shards(shards=0)
+        self.assertIsNone(ContactBook.read_shards_manifest(path_to_file_dbase=self.path_to_file_dbase))
+        self.assertEqual(self.shards(), [])
+        self.assertEqual(self.download(), self.contacts)
+
+    def test_scan_reads_only_one_shard(self):
+        self.upload_shards(shards=4)
+        phone_number = '+74950000011'
+        num_shard = ContactBook.shard_of_phone(phone_number, 4)
+        for i in range(4):
+            if i != num_shard:
+                self.shard(i).unlink()
+        found = ContactBook.scan_dbase_for_phone(path_to_file_dbase=self.path_to_file_dbase,
+                                                 phone_number='8 495 000-00-11')
+        self.assertEqual(found, self.contacts[phone_number])
+
+    def test_load_by_pool_and_sequential(self):
+        self.upload_shards(shards=4)
+        with unittest.mock.patch('sys.stdout', io.StringIO()):
+            sequential = ContactBook.full_download_dbase(path_to_file_dbase=self.path_to_file_dbase, processes=0)[0]
+            pool = ContactBook.full_download_dbase(path_to_file_dbase=self.path_to_file_dbase, processes=2)[0]
+        self.assertEqual(pool, sequential)
+        self.assertEqual(sequential, self.contacts)
+
+
+class TestContactFilter(TestDBase):
+
+    def setUp(self):
+        super().setUp()
+        self.contacts = {}
+        for i in range(30):
+            phone_number = f'+7912{i:07d}' if i < 10 else f'+7495{i:07d}'
+            self.contacts[phone_number] = ContactBook.Contact(
+                phone_number=phone_number, contact_name=f'Ivan {i}' if i % 3 else f'Anna {i}',
+                date_time_creation_contact=CREATED + datetime.timedelta(days=i // 2))  # two contacts by day
+
+    def day(self, days: int) -> datetime.datetime:
+        return CREATED + datetime.timedelta(days=days)
+
+    def indexes(self) -> dict:
+        return {'names': ContactBook.NameIndex(dict_contacts=self.contacts),
+                'phones': ContactBook.PhoneIndex(phone_numbers=self.contacts),
+                'created': ContactBook.CreationIndex(dict_contacts=self.contacts)}
+
+    def test_creation_index_bounds(self):
+        created = ContactBook.CreationIndex(dict_contacts=self.contacts)
+        self.assertEqual(created.count(), 30)
+        self.assertEqual(created.count(self.day(5), self.day(10)), 10)  # from is included, to is not
+        self.assertEqual(list(created.find(self.day(5), self.day(6))), ['+74950000010', '+74950000011'])
+        self.assertEqual(created.count(self.day(5), self.day(5)), 0)
+        self.assertEqual(created.count(self.day(10), self.day(5)), 0)
+        self.assertEqual(created.count(self.day(5) - datetime.timedelta(seconds=1), self.day(5)), 0)
+        self.assertEqual(created.count(self.day(5) + datetime.timedelta(seconds=1), self.day(6)), 0)
+        self.assertEqual(created.count(date_from=self.day(14)), 2)
+        self.assertEqual(created.count(date_from=self.day(15)), 0)
+        self.assertEqual(created.count(date_to=self.day(1)), 2)
+        self.assertEqual(created.count(date_to=self.day(-1)), 0)
+
+        created.remove(self.contacts['+74950000011'])
+        created.remove(ContactBook.Contact(phone_number='+74950000010', contact_name='Other',
+                                           date_time_creation_contact=self.day(6)))  # not at its date
+        self.assertEqual(list(created.find(self.day(5), self.day(6))), ['+74950000010'])
+        created.add(ContactBook.Contact(phone_number='+70000000000', contact_name='New',
+                                        date_time_creation_contact=self.day(5)))
+        self.assertEqual(list(created.find(self.day(5), self.day(6))), ['+74950000010', '+70000000000'])
+
+    def test_plan(self):
+        indexes = self.indexes()
+        for contact_filter, plan in ((ContactBook.ContactFilter(contact_name='ivan'), 'name'),
+                                     (ContactBook.ContactFilter(contact_name='ivan', phone_prefix='8912'), 'phone'),
+                                     (ContactBook.ContactFilter(contact_name='anna 2', phone_prefix='+7',
+                                                                date_from=self.day(5)), 'name'),
+                                     (ContactBook.ContactFilter(phone_prefix='+7', date_from=self.day(5),
+                                                                date_to=self.day(6)), 'created'),
+                                     (ContactBook.ContactFilter(), None)):
+            with self.subTest(contact_filter=contact_filter):
+                chosen = contact_filter.plan(**indexes)
+                self.assertEqual(None if chosen is None else chosen[0], plan)
+                counters = ContactBook.METRICS.dict['counters']
+                count = counters.get(f'filter.plan.{plan or "scan"}', 0)
+                list(contact_filter.filter(dict_contacts=self.contacts, **indexes))
+                self.assertEqual(ContactBook.METRICS.dict['counters'][f'filter.plan.{plan or "scan"}'], count + 1)
+
+        contact_filter = ContactBook.ContactFilter(contact_name='ivan', date_from=self.day(5))
+        self.assertIsNone(contact_filter.plan(phones=indexes['phones']))  # no index of its predicates
+        self.assertEqual(contact_filter.plan(names=indexes['names'])[0], 'name')
+        with self.assertRaises(ValueError):
+            ContactBook.ContactFilter(phone_prefix='x912')
+
+    def test_predicates(self):
+        indexes = self.indexes()
+        digits = {None: '', '+7912': '7912', '8 495 000 001': '7495000001', '7': '7'}  # by prefix of phone
+        for contact_name, phone_prefix, date_from, date_to in itertools.product(
+                (None, 'ivan', 'NNA 1', 'nobody'), digits,
+                (None, self.day(3), self.day(20)), (None, self.day(3), self.day(7))):
+            expected = [phone_number for phone_number, contact in self.contacts.items()
+                        if (contact_name is None or contact_name.lower() in contact.contact_name.lower())
+                        and phone_number[1:].startswith(digits[phone_prefix])
+                        and (date_from is None or contact.date_time_creation_contact >= date_from)
+                        and (date_to is None or contact.date_time_creation_contact < date_to)]
+            contact_filter = ContactBook.ContactFilter(contact_name=contact_name, phone_prefix=phone_prefix,
+                                                       date_from=date_from, date_to=date_to)
+            with self.subTest(contact_filter=contact_filter):
+                self.assertEqual(sorted(i.phone_number for i in
+                                        contact_filter.filter(dict_contacts=self.contacts, **indexes)),
+                                 sorted(expected))
+                self.assertEqual(sorted(i.phone_number for i in contact_filter.filter(dict_contacts=self.contacts)),
+                                 sorted(expected))
+
+    def test_upkeep_of_indexes(self):
+        self.upload(*self.contacts.values())
+        storage = self.storage()
+        contact_filter = ContactBook.ContactFilter(contact_name='ivan', phone_prefix='+7912', date_from=self.day(2))
+
+        def found() -> list:
+            return sorted(i.phone_number for i in storage.find_by_filter(contact_filter=contact_filter))
+
+        self.assertEqual(found(), ['+79120000004', '+79120000005', '+79120000007', '+79120000008'])
+        storage.add(ContactBook.Contact(phone_number='+79129999999', contact_name='Ivan New',
+                                        date_time_creation_contact=self.day(3)))
+        storage.edit(ContactBook.Contact(phone_number='+79120000004', contact_name='Anna 4',
+                                         date_time_creation_contact=self.day(2)))
+        storage.edit(ContactBook.Contact(phone_number='+79120000001', contact_name='Ivan 1',
+                                         date_time_creation_contact=self.day(9)))
+        storage.remove(storage.get('+79120000008'))
+        self.assertEqual(found(), ['+79120000001', '+79120000005', '+79120000007', '+79129999999'])
+        with unittest.mock.patch('sys.stdout', io.StringIO()):
+            storage.save()
+
+            other = ContactBook.TextStorage(path_to_file_dbase=self.path_to_file_dbase)
+            other.remove(other.get('+79120000005'))
+            other.add(ContactBook.Contact(phone_number='+79128888888', contact_name='Ivan Other',
+                                          date_time_creation_contact=self.day(30)))
+            other.save()
+            other.close()
+            self.assertEqual(storage.refresh(), 2)  # changes of other process are replayed from journal
+        self.assertEqual(found(), ['+79120000001', '+79120000007', '+79128888888', '+79129999999'])
+
+
+class TestDuplicates(TestDBase):
+
+    @staticmethod
+    def finder(*contacts, **kwargs) -> ContactBook.DuplicateFinder:
+        return ContactBook.DuplicateFinder(dict_contacts={i.phone_number: i for i in contacts}, **kwargs)
+
+    @staticmethod
+    def raw(phone_number: str, contact_name: str, year: int = 2020) -> ContactBook.Contact:
+        """contact of legacy dbase, its phone is not validated"""
+        return ContactBook.Contact(phone_number=phone_number, contact_name=contact_name,
+                                   date_time_creation_contact=CREATED.replace(year=year), validate=False)
+
+    def test_blocks_by_phone_digits(self):
+        contacts = [contact(f'+7912{i:07d}', f'Name {i}') for i in range(10)]
+        contacts += [contact('+74950000001', 'Anna'), contact('+78120000001', 'Olga')]
+        finder = self.finder(*contacts, threshold=0.8, phone_digits=7)
+        self.assertEqual(list(finder.blocks()), [['+79120000001', '+74950000001', '+78120000001']])
+        self.assertEqual(finder.groups(), [])
+        list(finder.pairs())
+        self.assertEqual(finder.count_compared, 3)
+
+    def test_blocks_by_names_only_at_low_threshold(self):
+        contacts = (contact('+79120000001', 'Ivan Petrov'), contact('+74950000002', 'petrov  ivan'))
+        finder = self.finder(*contacts, threshold=0.6)
+        self.assertEqual(list(finder.pairs()), [])
+        self.assertEqual(finder.count_compared, 0)
+
+        finder = self.finder(*contacts, threshold=0.5)
+        self.assertEqual(list(finder.pairs()), [(0.5, '+79120000001', '+74950000002')])
+        self.assertEqual(finder.count_compared, 1)
+
+    def test_max_block(self):
+        contacts = [contact(f'+7912{i:07d}', 'Ivan') for i in range(5)]
+        finder = self.finder(*contacts, threshold=0.5, max_block=3)
+        self.assertEqual(list(finder.pairs()), [])
+        self.assertGreater(finder.count_skipped_blocks, 0)
+
+        finder = self.finder(*contacts, threshold=0.5, max_block=10)
+        self.assertEqual(len(finder.groups()), 0)
+        self.assertEqual(len(list(finder.pairs())), 4)
+        self.assertEqual(finder.groups(), [(0.5, tuple(i.phone_number for i in contacts))])
+
+    def test_group_score_is_the_weakest_pair(self):
+        contacts = (self.raw('+79120000001', 'Ivan Petrov'),
+                    self.raw('79120000001', 'Petrov Ivan'),  # the same digits
+                    self.raw('9120000001', 'Ivan Petrov'),  # without code, phone score is 0.9
+                    self.raw('+74950000001', 'Anna'))
+        finder = self.finder(*contacts, threshold=0.9)
+        self.assertEqual(sorted(score for score, *_ in finder.pairs()), [0.95, 1.0])
+        score, phone_numbers = finder.groups()[0]
+        self.assertEqual((score, sorted(phone_numbers)), (0.95, ['+79120000001', '79120000001', '9120000001']))
+        self.assertEqual(len(finder.groups()), 1)
+        self.assertEqual(len({finder.find(i) for i in phone_numbers}), 1)
+        self.assertEqual(finder.find('+74950000001'), '+74950000001')
+
+    def test_merge_contacts(self):
+        merged = ContactBook.merge_contacts((self.raw('89120000001', 'Иван Петров', year=2019),
+                                             self.raw('+79120000001', 'Ивaн Петров', year=2020),  # latin a
+                                             self.raw('9120000001', 'Ivaн', year=2021)))
+        self.assertEqual(merged.phone_number, '+79120000001')
+        self.assertEqual(merged.contact_name, 'Иван Петров')
+        self.assertEqual(merged.date_time_creation_contact, CREATED.replace(year=2019))
+
+        merged = ContactBook.merge_contacts((self.raw('+9120000001', 'Ivan Petrov', year=2020),
+                                             self.raw('+79120000001', 'Ivan', year=2021)))
+        self.assertEqual((merged.phone_number, merged.contact_name), ('+79120000001', 'Ivan'))
+
+    def test_report_and_apply(self):
+        self.upload(self.raw('+9120000001', 'Ivan Petrov', year=2019),
+                    self.raw('+79120000001', 'Petrov Ivan', year=2021),  # score 0.95
+                    self.raw('+74950000002', 'Anna Ivanova'),
+                    self.raw('+4950000002', 'Anna Ivanovna'),  # score 0.807
+                    self.raw('+78120000003', 'Olga'))
+        path_to_file_report = pathlib.Path(self.tmp_dir.name) / 'report.csv'
+        argv = ['--storage', 'text', '--dbase', str(self.path_to_file_dbase),
+                'dedupe', '--threshold', '0.8', '--report', str(path_to_file_report)]
+
+        with tuning(dedupe_auto_merge=0.9), unittest.mock.patch('sys.stdout', io.StringIO()):
+            self.assertEqual(ContactBook.cli(argv), 0)
+            self.assertEqual(len(self.storage().contacts()), 5)
+            self.assertEqual(ContactBook.cli(argv + ['--apply']), 0)
+
+        with open(path_to_file_report, encoding='utf-8', newline='') as fr:
+            report = [row[:3] + row[4:5] for row in csv.reader(fr)]
+        self.assertEqual(report[0], ['group', 'score', 'action', 'phone_number'])
+        self.assertEqual(sorted(report[1:]), [['1', '0.95', 'kept', '+79120000001'],
+                                              ['1', '0.95', 'merged', '+9120000001'],
+                                              ['2', '0.807', 'found', '+4950000002'],
+                                              ['2', '0.807', 'found', '+74950000002']])
+        dbase = self.storage().contacts()  # with changes of journal
+        self.assertEqual(sorted(dbase), ['+4950000002', '+74950000002', '+78120000003', '+79120000001'])
+        self.assertEqual(dbase['+79120000001'].contact_name, 'Petrov Ivan')  # survivor keeps its name
+        self.assertEqual(dbase['+79120000001'].date_time_creation_contact, CREATED.replace(year=2019))
+
+
+class TestNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        budget = unittest.mock.patch.object(ContactBook, 'INDEX_BUDGET', ContactBook.MemoryBudget())
+        budget.start()
+        self.addCleanup(budget.stop)
+        self.contacts = {i.phone_number: i for i in (contact(f'+7495{i:07d}', f'Other {i}') for i in range(100))}
+        self.index = ContactBook.NameIndex(dict_contacts=self.contacts)
+
+    def charged(self) -> int:
+        return sum(map(ContactBook.NameIndex.sizeof, self.index.__getstate__()[2].values()))
+
+    def test_changed_segments_are_charged(self):
+        self.assertEqual(ContactBook.INDEX_BUDGET.used, self.charged())
+        for i in range(100):
+            new_contact = contact(f'+7912{i:07d}', f'Ivan Petrov {i} {"xyz" * i}')
+            self.contacts[new_contact.phone_number] = new_contact
+            self.index.add(new_contact)
+        self.assertGreater(ContactBook.INDEX_BUDGET.used, ContactBook.NameIndex.sizeof({}) * 100)
+        self.assertEqual(ContactBook.INDEX_BUDGET.used, self.charged())
+
+        for phone_number in list(self.contacts)[::2]:
+            self.index.remove(self.contacts.pop(phone_number))
+        self.assertEqual(ContactBook.INDEX_BUDGET.used, self.charged())
+        self.assertEqual(len(self.index.find('petrov')), 50)
+
+    def test_segments_over_budget_are_evicted_on_change(self):
+        ContactBook.INDEX_BUDGET.budget = ContactBook.INDEX_BUDGET.used
+        new_contact = contact('+79120000001', 'Ivan Petrov ' + 'qwertyuiop' * 100)
+        self.contacts[new_contact.phone_number] = new_contact
+        self.index.add(new_contact)
+
+        self.assertLessEqual(ContactBook.INDEX_BUDGET.used, ContactBook.INDEX_BUDGET.budget)
+        self.assertEqual(ContactBook.INDEX_BUDGET.used, self.charged())
+        self.assertGreater(ContactBook.INDEX_BUDGET.dict['evicted'], 0)
+        self.assertEqual([i.phone_number for i in self.index.find('ivan')], ['+79120000001'])
+
+
+if __name__ == '__main__':
+    unittest.main()
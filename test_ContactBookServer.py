@@ -0,0 +1,159 @@
+"""http/json service of contact book by local client on ephemeral port"""
+import asyncio
+import datetime
+import json
+import os
+import pathlib
+import tempfile
+import unittest
+import unittest.mock
+
+import ContactBook
+
+CREATED = datetime.datetime(2020, 1, 2, 3, 4, 5)
+
+
+async def request(reader, writer, method: str, target: str, body: bytes = b'') -> tuple:
+    """status and json of response on keep-alive connection"""
+    writer.write(f'{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'
+                 .encode('latin-1') + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+class TestContactBookServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        home = unittest.mock.patch.dict(os.environ, {'HOME': self.tmp_dir.name})
+        home.start()
+        self.addCleanup(home.stop)
+
+        self.path_to_file_dbase = pathlib.Path(self.tmp_dir.name) / 'contact-book.dbase'
+        self.storage = ContactBook.TextStorage(path_to_file_dbase=self.path_to_file_dbase)
+        for phone_number, contact_name in (('+79120000001', 'Ivan Petrov'),
+                                           ('+79120000002', 'Anna Ivanova'),
+                                           ('+74950000003', 'Petr Sidorov')):
+            self.storage.add(ContactBook.Contact(phone_number=phone_number, contact_name=contact_name,
+                                                 date_time_creation_contact=CREATED))
+        self.storage.save()
+
+        self.server = ContactBook.ContactBookServer(storage=self.storage, flush_interval=0.001)
+        self.listener = await asyncio.start_server(self.server.handle, '127.0.0.1', 0)
+        self.reader, self.writer = await asyncio.open_connection(*self.listener.sockets[0].getsockname()[:2])
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        await asyncio.sleep(0.01)  # handler of connection reads end of stream
+        self.listener.close()
+        await self.listener.wait_closed()
+        self.storage.close()
+
+    async def request(self, method: str, target: str, body=None) -> tuple:
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        return await request(self.reader, self.writer, method, target, body or b'')
+
+    def stored(self, phone_number: str):
+        """contact from disk by other storage"""
+        with ContactBook.TextStorage(path_to_file_dbase=self.path_to_file_dbase) as storage:
+            return storage.get(phone_number)
+
+    async def test_get_by_phone(self):
+        status, result = await self.request('GET', '/contacts/+79120000001')
+        self.assertEqual(status, 200)
+        self.assertEqual(result['phone_number'], '+79120000001')
+        self.assertEqual(result['contact_name'], 'Ivan Petrov')
+
+        status, result = await self.request('GET', '/contacts/89120000002')  # not normalized phone
+        self.assertEqual((status, result['contact_name']), (200, 'Anna Ivanova'))
+
+        status, result = await self.request('GET', '/contacts/+70000000000')
+        self.assertEqual((status, result['error']), (404, 'ContactNotFound'))
+
+    async def test_find(self):
+        status, result = await self.request('GET', '/contacts?name=petr')
+        self.assertEqual(status, 200)
+        self.assertEqual(result['total'], 2)
+        self.assertEqual([i['contact_name'] for i in result['contacts']], ['Ivan Petrov', 'Petr Sidorov'])
+
+        status, result = await self.request('GET', '/contacts?phone_part=0003')
+        self.assertEqual((status, result['total']), (200, 1))
+        self.assertEqual(result['contacts'][0]['phone_number'], '+74950000003')
+
+        status, result = await self.request('GET', '/contacts?start=1&count=1')
+        self.assertEqual((status, result['total']), (200, 3))
+        self.assertEqual([i['phone_number'] for i in result['contacts']],
+                         [i.phone_number for i in self.storage.page_of_contacts(start=1, count=1)])
+
+        status, result = await self.request('GET', '/contacts?start=x')
+        self.assertEqual((status, result['error']), (400, 'BadRequest'))
+
+    async def test_add(self):
+        body = {'phone_number': '8 912 000-00-04', 'contact_name': 'Olga Smirnova'}
+        status, result = await self.request('POST', '/contacts', body)
+        self.assertEqual(status, 201)
+        self.assertEqual((result['phone_number'], result['contact_name']), ('+79120000004', 'Olga Smirnova'))
+        self.assertEqual(self.stored('+79120000004').contact_name, 'Olga Smirnova')  # saved before response
+
+        status, result = await self.request('POST', '/contacts', body)
+        self.assertEqual((status, result['error']), (409, 'ContactExistInFileDBase'))
+
+        status, result = await self.request('POST', '/contacts', {'phone_number': 'abc', 'contact_name': 'X'})
+        self.assertEqual(status, 400)
+
+    async def test_edit(self):
+        status, result = await self.request('PUT', '/contacts/+79120000001', {'contact_name': 'Ivan Petrovich'})
+        self.assertEqual((status, result['contact_name']), (200, 'Ivan Petrovich'))
+        self.assertEqual(self.stored('+79120000001').contact_name, 'Ivan Petrovich')
+        self.assertEqual(self.stored('+79120000001').date_time_creation_contact, CREATED)  # it is kept by edit
+
+        status, result = await self.request('PUT', '/contacts/+70000000000', {'contact_name': 'Nobody'})
+        self.assertEqual((status, result['error']), (404, 'ContactNotFound'))
+
+        status, result = await self.request('GET', '/contacts/+79120000001')
+        self.assertEqual(result['contact_name'], 'Ivan Petrovich')
+
+    async def test_remove(self):
+        status, result = await self.request('DELETE', '/contacts/+79120000002')
+        self.assertEqual((status, result['contact_name']), (200, 'Anna Ivanova'))
+        self.assertIsNone(self.stored('+79120000002'))
+
+        status, _ = await self.request('GET', '/contacts/+79120000002')
+        self.assertEqual(status, 404)
+        status, _ = await self.request('DELETE', '/contacts/+79120000002')
+        self.assertEqual(status, 404)
+
+    async def test_errors(self):
+        status, result = await self.request('GET', '/unknown')
+        self.assertEqual((status, result['error']), (404, 'NotFound'))
+
+        status, result = await self.request('PATCH', '/contacts/+79120000001')
+        self.assertEqual((status, result['error']), (405, 'MethodNotAllowed'))
+        status, _ = await self.request('POST', '/contacts/+79120000001')
+        self.assertEqual(status, 405)
+
+        status, result = await self.request('POST', '/contacts', b'{"phone_number": ')
+        self.assertEqual((status, result['error']), (400, 'BadRequest'))
+        status, result = await self.request('POST', '/contacts', b'[1, 2]')
+        self.assertEqual((status, result['error']), (400, 'BadRequest'))
+
+        status, result = await self.request('GET', '/metrics')
+        self.assertEqual(status, 200)
+        self.assertIn('counters', result)
+
+
+if __name__ == '__main__':
+    unittest.main()